@@ -0,0 +1,246 @@
+import os
+import time
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from numpy_index import _normalize_rows
+
+logger = logging.getLogger(__name__)
+
+# —————— Config ——————
+# Index de recherche du catalogue : "exact" (produit matriciel complet), "ivf" ou "ivfpq"
+RECO_INDEX_BACKEND = os.getenv("RECO_INDEX_BACKEND", "exact")
+# Nombre de listes inversées (0 = 4·√n) et listes visitées par requête
+ANN_NLIST = int(os.getenv("ANN_NLIST", "0"))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+# Sous-quantificateurs du product quantization (octets par vecteur) ; la dimension doit être divisible
+ANN_PQ_M = int(os.getenv("ANN_PQ_M", "48"))
+# Candidats PQ re-scorés exactement (× k) quand les vecteurs complets sont disponibles ; 0 = aucun
+ANN_RERANK = int(os.getenv("ANN_RERANK", "10"))
+ANN_TRAIN_SAMPLE = int(os.getenv("ANN_TRAIN_SAMPLE", "50000"))
+ANN_KMEANS_ITERS = int(os.getenv("ANN_KMEANS_ITERS", "12"))
+
+ANN_FILE = "ann.npz"
+PQ_CENTROIDS = 256
+_ASSIGN_BLOCK = 8192
+
+
+# ---------- k-means ----------
+def _assign(x: np.ndarray, centroids: np.ndarray, spherical: bool) -> np.ndarray:
+    """Centroïde le plus proche de chaque ligne (par blocs pour borner la mémoire)."""
+    labels = np.empty(len(x), dtype=np.int32)
+    half_norms = None if spherical else 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    for start in range(0, len(x), _ASSIGN_BLOCK):
+        scores = x[start:start + _ASSIGN_BLOCK] @ centroids.T
+        if half_norms is not None:
+            scores -= half_norms  # argmin ||x - c||² = argmax (x·c - ||c||²/2)
+        labels[start:start + _ASSIGN_BLOCK] = np.argmax(scores, axis=1)
+    return labels
+
+
+def kmeans(x: np.ndarray, k: int, iters: int = ANN_KMEANS_ITERS, spherical: bool = False,
+           seed: int = 0) -> np.ndarray:
+    """
+    k-means de Lloyd en NumPy. `spherical=True` : affectation par produit scalaire et centroïdes
+    renormalisés (données normalisées, similarité cosinus). Les clusters vides sont réinitialisés
+    sur des points tirés au hasard.
+    """
+    rng = np.random.default_rng(seed)
+    x = np.asarray(x, dtype=np.float32)
+    k = min(k, len(x))
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(iters):
+        labels = _assign(x, centroids, spherical)
+        counts = np.bincount(labels, minlength=k)
+        # Sommes par cluster : tri par label puis réduction par segments contigus
+        order = np.argsort(labels, kind="stable")
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+        centroids = np.zeros_like(centroids)
+        centroids[filled] = np.add.reduceat(x[order], starts, axis=0) / counts[filled, None]
+        empty = counts == 0
+        if empty.any():
+            centroids[empty] = x[rng.choice(len(x), size=int(empty.sum()), replace=False)]
+        if spherical:
+            centroids = _normalize_rows(centroids)
+    return centroids.astype(np.float32)
+
+
+# ---------- index IVF ----------
+class IVFIndex:
+    """
+    Index IVF pour vecteurs normalisés (similarité cosinus) : centroïdes grossiers appris par
+    k-means sphérique, et une liste inversée par centroïde. Une requête ne visite que les
+    `nprobe` listes dont le centroïde est le plus proche.
+
+    Les listes ne contiennent que les indices des lignes du catalogue : sans PQ, les candidats
+    sont scorés sur la matrice du catalogue (`full_vectors`), sans seconde copie des vecteurs.
+    Avec `pq_m > 0`, le résidu (vecteur − centroïde) est quantifié par product quantization en
+    `pq_m` octets ; le score est approché par centroïde·q + Σ table[sous-espace, code] (tables
+    précalculées une fois par requête), puis éventuellement re-scoré sur `full_vectors`.
+    """
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, ids: np.ndarray,
+                 codes: Optional[np.ndarray] = None, codebooks: Optional[np.ndarray] = None):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.ids = ids
+        self.codes = codes
+        self.codebooks = codebooks
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def pq(self) -> bool:
+        return self.codes is not None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def nbytes(self) -> int:
+        arrays = (self.centroids, self.offsets, self.ids, self.codes, self.codebooks)
+        return int(sum(a.nbytes for a in arrays if a is not None))
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, nlist: int = ANN_NLIST, pq_m: int = 0,
+              train_sample: int = ANN_TRAIN_SAMPLE, iters: int = ANN_KMEANS_ITERS, seed: int = 0) -> "IVFIndex":
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n, dim = vectors.shape
+        if nlist <= 0:
+            nlist = max(1, int(4 * np.sqrt(n)))
+        rng = np.random.default_rng(seed)
+        sample = vectors[np.sort(rng.choice(n, size=min(n, max(train_sample, nlist)), replace=False))]
+        start = time.perf_counter()
+
+        centroids = kmeans(sample, nlist, iters=iters, spherical=True, seed=seed)
+        labels = _assign(vectors, centroids, spherical=True)
+        order = np.argsort(labels, kind="stable")
+        offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=len(centroids)), out=offsets[1:])
+        ids = order.astype(np.int32)
+
+        if pq_m <= 0:
+            index = cls(centroids, offsets, ids)
+        else:
+            if dim % pq_m:
+                raise ValueError(f"ANN_PQ_M={pq_m} doit diviser la dimension {dim}")
+            sub = dim // pq_m
+            residual_sample = sample - centroids[_assign(sample, centroids, spherical=True)]
+            codebooks = np.stack([
+                kmeans(residual_sample[:, m * sub:(m + 1) * sub], PQ_CENTROIDS, iters=iters, seed=seed + m)
+                for m in range(pq_m)
+            ])
+            codes = np.empty((n, pq_m), dtype=np.uint8)
+            for begin in range(0, n, _ASSIGN_BLOCK):
+                rows = order[begin:begin + _ASSIGN_BLOCK]
+                residuals = vectors[rows] - centroids[labels[rows]]
+                for m in range(pq_m):
+                    codes[begin:begin + len(rows), m] = _assign(
+                        residuals[:, m * sub:(m + 1) * sub], codebooks[m], spherical=False)
+            index = cls(centroids, offsets, ids, codes=codes, codebooks=codebooks)
+
+        logger.info(f"Index IVF{'-PQ' if pq_m > 0 else ''} entraîné : {n} vecteurs, {len(centroids)} listes, "
+                    f"{index.nbytes() / 1e6:.1f} Mo, {time.perf_counter() - start:.1f}s")
+        return index
+
+    def search(self, query: np.ndarray, k: int, nprobe: int = ANN_NPROBE,
+               full_vectors: Optional[np.ndarray] = None, rerank: int = ANN_RERANK) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k approché pour une requête normalisée : (indices dans le catalogue, scores) triés.
+        `full_vectors` : matrice du catalogue (obligatoire sans PQ). En mode PQ, si elle est fournie,
+        les `rerank × k` meilleurs candidats sont re-scorés exactement.
+        """
+        if not self.pq and full_vectors is None:
+            raise ValueError("L’index IVF sans PQ score les candidats sur la matrice du catalogue (full_vectors)")
+        coarse = self.centroids @ query
+        nprobe = min(max(nprobe, 1), self.nlist)
+        probed = np.argpartition(-coarse, nprobe - 1)[:nprobe] if nprobe < self.nlist else np.arange(self.nlist)
+        slices = [slice(self.offsets[c], self.offsets[c + 1]) for c in probed]
+        sizes = [s.stop - s.start for s in slices]
+        if not sum(sizes):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        ids = np.concatenate([self.ids[s] for s in slices])
+
+        if not self.pq:
+            ids = np.sort(ids)  # lecture séquentielle si full_vectors est un memmap
+            scores = np.asarray(full_vectors[ids] @ query)
+        else:
+            sub = self.codebooks.shape[2]
+            # tables[m, c] = codebook[m][c] · q_m
+            tables = np.einsum("mcd,md->mc", self.codebooks, query.reshape(len(self.codebooks), sub))
+            codes = np.concatenate([self.codes[s] for s in slices])
+            scores = tables[np.arange(codes.shape[1]), codes].sum(axis=1)
+            scores += np.repeat(coarse[probed], sizes)
+            if full_vectors is not None and rerank > 0:
+                keep = min(len(scores), rerank * k)
+                if keep < len(scores):
+                    best = np.argpartition(-scores, keep - 1)[:keep]
+                    ids, scores = ids[best], scores[best]
+                ids = np.sort(ids)  # lecture séquentielle si full_vectors est un memmap
+                scores = np.asarray(full_vectors[ids] @ query)
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return ids[top].astype(np.int64), scores[top].astype(np.float32)
+
+    # ---------- persistance ----------
+    def save(self, path: str, **meta) -> None:
+        arrays: Dict[str, np.ndarray] = {"centroids": self.centroids, "offsets": self.offsets, "ids": self.ids}
+        for name in ("codes", "codebooks"):
+            if getattr(self, name) is not None:
+                arrays[name] = getattr(self, name)
+        for key, value in meta.items():
+            arrays[f"meta_{key}"] = np.asarray(value)
+        tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Tuple["IVFIndex", Dict[str, object]]:
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        meta = {name[len("meta_"):]: arrays.pop(name).item() for name in list(arrays) if name.startswith("meta_")}
+        # Fichiers antérieurs : copie des vecteurs du catalogue, désormais relus depuis la matrice
+        arrays.pop("vectors", None)
+        return cls(**arrays), meta
+
+
+def build_ann_index(vectors: np.ndarray, index_dir: str, backend: str = RECO_INDEX_BACKEND,
+                    nlist: int = ANN_NLIST, pq_m: int = ANN_PQ_M, version: str = "") -> Optional[IVFIndex]:
+    """
+    Entraîne et enregistre l’index ANN du catalogue (`<index_dir>/ann.npz`) ; None en mode exact.
+    `version` : version du catalogue dont proviennent les vecteurs (voir recommendation_index.write_metadata).
+    """
+    path = os.path.join(index_dir, ANN_FILE)
+    if backend == "exact" or len(vectors) == 0:
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+    if backend not in ("ivf", "ivfpq"):
+        raise ValueError(f"RECO_INDEX_BACKEND inconnu : {backend}")
+    index = IVFIndex.train(vectors, nlist=nlist, pq_m=pq_m if backend == "ivfpq" else 0)
+    index.save(path, backend=backend, count=len(vectors), version=version or "")
+    return index
+
+
+def load_ann_index(index_dir: str, count: int, backend: str = RECO_INDEX_BACKEND,
+                   version: str = "") -> Optional[IVFIndex]:
+    """
+    Index ANN enregistré s’il correspond au backend demandé et au catalogue courant (même nombre
+    d’épisodes et même version du catalogue), sinon None.
+    """
+    path = os.path.join(index_dir, ANN_FILE)
+    if backend == "exact" or not os.path.exists(path):
+        return None
+    index, meta = IVFIndex.load(path)
+    if meta.get("backend") != backend or meta.get("count") != count or meta.get("version", "") != (version or ""):
+        logger.warning("Index ANN périmé (catalogue ou backend modifié) : recherche exacte en attendant "
+                       "une reconstruction (/build_index_podcasts)")
+        return None
+    return index
@@ -0,0 +1,198 @@
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# —————— Config ——————
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE", "1") != "0"
+# Similarité cosinus minimale entre deux questions pour réutiliser une réponse
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(24 * 3600)))
+# Réponses conservées par transcript, et nombre de transcripts suivis
+ANSWER_CACHE_MAX_ITEMS = int(os.getenv("ANSWER_CACHE_MAX_ITEMS", "256"))
+ANSWER_CACHE_MAX_TRANSCRIPTS = int(os.getenv("ANSWER_CACHE_MAX_TRANSCRIPTS", "64"))
+
+
+class SemanticAnswerCache:
+    """
+    Cache sémantique des réponses RAG d’un transcript.
+
+    Les embeddings (normalisés) des questions déjà traitées forment une petite matrice float32 ;
+    une nouvelle question est comparée à toutes en un produit matrice-vecteur, et la réponse
+    (avec ses sources) est réutilisée si la similarité dépasse `threshold`.
+    Éviction : entrées plus vieilles que `ttl` secondes, puis la moins récemment servie
+    au-delà de `max_items`.
+    """
+
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD, ttl: float = ANSWER_CACHE_TTL_SECONDS,
+                 max_items: int = ANSWER_CACHE_MAX_ITEMS):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._entries: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _remove(self, row: int) -> None:
+        # Retrait en O(1) : la dernière ligne prend la place de la ligne supprimée
+        last = len(self._entries) - 1
+        if row != last:
+            self._matrix[row] = self._matrix[last]
+            self._entries[row] = self._entries[last]
+        self._entries.pop()
+
+    def _expire(self, now: float) -> None:
+        for row in range(len(self._entries) - 1, -1, -1):
+            if now - self._entries[row]["created_at"] > self.ttl:
+                self._remove(row)
+
+    def lookup(self, query_vector) -> Optional[Dict[str, Any]]:
+        """Entrée {question, answer, docs, score} la plus proche au-dessus du seuil, ou None."""
+        q = self._normalize(query_vector)
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            n = len(self._entries)
+            if n == 0:
+                return None
+            scores = self._matrix[:n] @ q
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            entry = self._entries[best]
+            entry["last_used"] = now
+            return dict(entry, score=float(scores[best]))
+
+    def put(self, query_vector, question: str, answer: str, docs: List[Any]) -> None:
+        q = self._normalize(query_vector)
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            if len(self._entries) >= self.max_items:
+                lru = min(range(len(self._entries)), key=lambda r: self._entries[r]["last_used"])
+                self._remove(lru)
+            n = len(self._entries)
+            if self._matrix is None or self._matrix.shape[1] != q.shape[0]:
+                self._matrix = np.zeros((max(self.max_items, 1), q.shape[0]), dtype=np.float32)
+                self._entries.clear()
+                n = 0
+            self._matrix[n] = q
+            self._entries.append({
+                "question": question,
+                "answer": answer,
+                "docs": list(docs),
+                "created_at": now,
+                "last_used": now
+            })
+
+
+class AnswerCacheRegistry:
+    """
+    Un SemanticAnswerCache par transcript (clé : collection), LRU sur les transcripts.
+
+    Quand la collection change (nouveaux chunks indexés), `invalidate(scope)` vide son cache
+    et change sa version : une réponse générée avant l’invalidation (version lue au moment
+    de la recherche, passée à put) n’est pas enregistrée.
+    """
+
+    def __init__(self, max_transcripts: int = ANSWER_CACHE_MAX_TRANSCRIPTS):
+        self.max_transcripts = max_transcripts
+        self._caches: "OrderedDict[str, SemanticAnswerCache]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._next_version = 1
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _get(self, scope: str) -> SemanticAnswerCache:
+        cache = self._caches.get(scope)
+        if cache is None:
+            cache = self._caches[scope] = SemanticAnswerCache()
+            while len(self._caches) > self.max_transcripts:
+                self._caches.popitem(last=False)
+        self._caches.move_to_end(scope)
+        return cache
+
+    def get(self, scope: str) -> SemanticAnswerCache:
+        with self._lock:
+            return self._get(scope)
+
+    def version(self, scope: Optional[str]) -> int:
+        """Version courante du contenu indexé de `scope` (à lire avant la recherche)."""
+        with self._lock:
+            return self._versions.get(scope, 0)
+
+    def invalidate(self, scope: Optional[str]) -> None:
+        """Oublie les réponses de `scope` : la collection a reçu de nouveaux chunks."""
+        if not scope:
+            return
+        with self._lock:
+            self._caches.pop(scope, None)
+            self._versions[scope] = self._next_version
+            self._next_version += 1
+            self.invalidations += 1
+
+    def lookup(self, scope: Optional[str], query_vector) -> Optional[Dict[str, Any]]:
+        if not ANSWER_CACHE_ENABLED or not scope:
+            return None
+        entry = self.get(scope).lookup(query_vector)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if entry is not None:
+            logger.info(f"Réponse servie par le cache sémantique (similarité {entry['score']:.3f})")
+        return entry
+
+    def put(self, scope: Optional[str], query_vector, question: str, answer: str, docs: List[Any],
+            version: Optional[int] = None) -> None:
+        """Enregistre une réponse ; ignorée si `scope` a été invalidé depuis la lecture de `version`."""
+        if not ANSWER_CACHE_ENABLED or not scope or not answer:
+            return
+        # Sous le verrou : une invalidation ne peut pas s’intercaler entre la vérification et l’ajout
+        with self._lock:
+            if version is not None and version != self._versions.get(scope, 0):
+                return
+            self._get(scope).put(query_vector, question, answer, docs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": ANSWER_CACHE_ENABLED,
+                "threshold": ANSWER_CACHE_THRESHOLD,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else None,
+                "transcripts": len(self._caches),
+                "invalidations": self.invalidations,
+                "entries": sum(len(c) for c in self._caches.values())
+            }
+
+
+_REGISTRY = AnswerCacheRegistry()
+
+
+def get_answer_cache() -> AnswerCacheRegistry:
+    return _REGISTRY
+
+
+def get_stats() -> dict:
+    return _REGISTRY.stats()
@@ -54,12 +54,11 @@ def main():
     
     # 2) Prétraitement : chunking + indexation Chroma
     persist_dir = "data/vectorstores/chunks"
-    process_transcript(raw_text, persist_dir=persist_dir)
+    collection = process_transcript(raw_text, persist_dir=persist_dir)
 
 
     #Recommandation
-    #recommandation.run_recommendation_from_summary()
-    recommandation.run_recommendation_from_summary_chroma()
+    recommandation.run_recommendation_from_summary()
 
 
 
@@ -67,7 +66,7 @@ def main():
 
     # 3) Construction de la chaîne RAG
     try:
-        chain, retriever = build_and_get_rag_chain(persist_dir=persist_dir)
+        chain, retriever = build_and_get_rag_chain(persist_dir=persist_dir, collection=collection)
     except FileNotFoundError as e:
         print(str(e))
         return
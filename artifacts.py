@@ -0,0 +1,147 @@
+import os
+import json
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from chaptering import segment_by_topic
+
+logger = logging.getLogger(__name__)
+
+# —————— Config ——————
+CHAPTER_THRESHOLD = float(os.getenv("CHAPTER_THRESHOLD", "0.25"))
+CHAPTER_CHUNK_SIZE = int(os.getenv("CHAPTER_CHUNK_SIZE", "500"))
+SEGMENTATION_CACHE_ITEMS = int(os.getenv("SEGMENTATION_CACHE_ITEMS", "64"))
+# Artefacts par transcript (chapitres, titres, résumés) : data/artifacts/<hash>/<nom>.json
+ARTIFACTS_DIR = os.getenv("ARTIFACTS_DIR", os.path.join("data", "artifacts"))
+ARTIFACT_CACHE_ITEMS = int(os.getenv("ARTIFACT_CACHE_ITEMS", "256"))
+
+# Segmentations mémorisées : (hash transcript, seuil, taille de chunk) → chapitres
+_SEGMENTATIONS: "OrderedDict[Tuple[str, float, int], List[str]]" = OrderedDict()
+_LOCK = threading.Lock()
+# Un verrou par clé : deux onglets ouverts en même temps ne calculent pas deux fois.
+_KEY_LOCKS: Dict[Tuple[str, float, int], threading.Lock] = {}
+
+
+def transcript_hash(raw_text: str) -> str:
+    """
+    Identifiant stable d’un transcript : SHA-256 du texte brut.
+    """
+    return hashlib.sha256(raw_text.encode("utf-8")).hexdigest()
+
+
+def get_segmentation(
+    raw_text: str,
+    threshold: float = CHAPTER_THRESHOLD,
+    chunk_size: int = CHAPTER_CHUNK_SIZE
+) -> List[str]:
+    """
+    Retourne les chapitres du transcript, calculés une seule fois par
+    (hash du transcript, seuil, taille de chunk) puis servis depuis la mémoire.
+    """
+    key = (transcript_hash(raw_text), float(threshold), int(chunk_size))
+    with _LOCK:
+        chapters = _SEGMENTATIONS.get(key)
+        if chapters is not None:
+            _SEGMENTATIONS.move_to_end(key)
+            return chapters
+        key_lock = _KEY_LOCKS.setdefault(key, threading.Lock())
+
+    with key_lock:
+        with _LOCK:
+            chapters = _SEGMENTATIONS.get(key)
+        if chapters is None:
+            logger.info(f"Segmentation du transcript {key[0][:12]} (threshold={threshold}, chunk_size={chunk_size})")
+            try:
+                chapters = segment_by_topic(raw_text, threshold=threshold, chunk_size=chunk_size)
+                with _LOCK:
+                    _SEGMENTATIONS[key] = chapters
+                    while len(_SEGMENTATIONS) > SEGMENTATION_CACHE_ITEMS:
+                        _SEGMENTATIONS.popitem(last=False)
+            finally:
+                with _LOCK:
+                    _KEY_LOCKS.pop(key, None)
+    return chapters
+
+
+def atomic_write_json(path: str, data: Any) -> None:
+    """
+    Écrit `data` en JSON via un fichier temporaire renommé : un lecteur concurrent
+    voit l’ancien fichier ou le nouveau, jamais un fichier à moitié écrit.
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+class ArtifactStore:
+    """
+    Artefacts JSON rangés par transcript : `<root>/<transcript_id>/<name>.json`.
+    Lecture au travers d’un cache mémoire LRU (une lecture disque par artefact au plus),
+    écriture atomique puis mise à jour du cache.
+    """
+
+    def __init__(self, root: str = ARTIFACTS_DIR, max_items: int = ARTIFACT_CACHE_ITEMS):
+        self.root = root
+        self.max_items = max_items
+        self._cache: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, transcript_id: str, name: str) -> str:
+        return os.path.join(self.root, transcript_id, f"{name}.json")
+
+    def _remember(self, key: Tuple[str, str], data: Any) -> None:
+        self._cache[key] = data
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_items:
+            self._cache.popitem(last=False)
+
+    def get(self, transcript_id: Optional[str], name: str) -> Optional[Any]:
+        """Artefact `name` du transcript, ou None s’il n’a pas encore été calculé."""
+        if not transcript_id:
+            return None
+        key = (transcript_id, name)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+        try:
+            with open(self._path(transcript_id, name), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError as e:
+            logger.error(f"Artefact illisible {transcript_id[:12]}/{name} : {e}")
+            return None
+        with self._lock:
+            self._remember(key, data)
+        return data
+
+    def put(self, transcript_id: str, name: str, data: Any) -> None:
+        path = self._path(transcript_id, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write_json(path, data)
+        with self._lock:
+            self._remember((transcript_id, name), data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "cached": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+_ARTIFACTS = ArtifactStore()
+
+
+def get_artifact_store() -> ArtifactStore:
+    return _ARTIFACTS
@@ -0,0 +1,82 @@
+"""
+Benchmark rappel / latence de l’index ANN du catalogue (ann_index.py) contre la recherche exacte,
+sur un catalogue synthétique regroupé en thèmes (mélange de gaussiennes normalisé,
+plus proche de vrais embeddings qu’un bruit uniforme).
+
+Pour IVF et IVF-PQ, et plusieurs valeurs de nprobe : recall@k par rapport au top-k exact,
+latence p50 / p99 d’une requête et mémoire de l’index.
+
+    python bench_ann.py [nombre_d_episodes]
+"""
+import sys
+import time
+
+import numpy as np
+
+from ann_index import ANN_PQ_M, IVFIndex
+from numpy_index import _normalize_rows, top_k
+
+DIM = 384
+TOP_K = 10
+QUERIES = 200
+TOPICS = 2000
+DEFAULT_EPISODES = 100_000
+NPROBES = (1, 4, 16, 64, 128)
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+
+def synthetic_catalog(n, rng):
+    topics = rng.normal(size=(TOPICS, DIM)).astype(np.float32)
+    vectors = topics[rng.integers(0, TOPICS, n)] + 0.5 * rng.normal(size=(n, DIM)).astype(np.float32)
+    return _normalize_rows(vectors)
+
+
+def measure(search, queries, truth):
+    search(queries[0])  # premier appel exclu
+    samples, recall = [], 0.0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        found = search(query)
+        samples.append(time.perf_counter() - start)
+        recall += len(set(found.tolist()) & expected) / TOP_K
+    return recall / len(queries), samples
+
+
+def report(name, recall, samples, megabytes):
+    print(f"{name:<24} recall@{TOP_K} {recall:6.3f}   p50 {percentile_ms(samples, 50):7.2f} ms   "
+          f"p99 {percentile_ms(samples, 99):7.2f} ms   {megabytes:7.1f} Mo")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_EPISODES
+    rng = np.random.default_rng(0)
+    vectors = synthetic_catalog(n, rng)
+    # Requêtes proches du catalogue (comme un résumé proche d’épisodes existants)
+    queries = _normalize_rows(vectors[rng.integers(0, n, QUERIES)] + 0.3 * rng.normal(size=(QUERIES, DIM)))
+    truth = [set(top_k(vectors, q, TOP_K)[0].tolist()) for q in queries]
+    print(f"{n} épisodes × {DIM} dims, {QUERIES} requêtes, top-{TOP_K}")
+
+    recall, samples = measure(lambda q: top_k(vectors, q, TOP_K)[0], queries, truth)
+    report("exact", recall, samples, vectors.nbytes / 1e6)
+
+    for label, pq_m in (("IVF", 0), (f"IVF-PQ (m={ANN_PQ_M})", ANN_PQ_M)):
+        start = time.perf_counter()
+        index = IVFIndex.train(vectors, pq_m=pq_m)
+        print(f"\n{label} : {index.nlist} listes, entraînement {time.perf_counter() - start:.1f} s")
+        for nprobe in NPROBES:
+            # Sans PQ, les candidats sont scorés sur la matrice du catalogue (non comptée dans la taille)
+            recall, samples = measure(
+                lambda q: index.search(q, TOP_K, nprobe=nprobe, full_vectors=None if pq_m else vectors)[0],
+                queries, truth)
+            report(f"  nprobe={nprobe}", recall, samples, index.nbytes() / 1e6)
+            if pq_m:
+                recall, samples = measure(
+                    lambda q: index.search(q, TOP_K, nprobe=nprobe, full_vectors=vectors)[0], queries, truth)
+                report(f"  nprobe={nprobe} + rerank", recall, samples, index.nbytes() / 1e6)
+
+
+if __name__ == "__main__":
+    main()
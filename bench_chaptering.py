@@ -0,0 +1,94 @@
+"""
+Benchmark de la détection de frontières de chapitres sur un transcript synthétique de 3 heures.
+
+Compare l’ancienne implémentation (cosine_similarity sklearn par paire + concaténation `+=`)
+à la version vectorisée de chaptering.py, sur les mêmes embeddings (synthétiques, pour
+mesurer la segmentation seule et pas le modèle).
+
+    python bench_chaptering.py
+"""
+import random
+import time
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+from chaptering import split_into_chunks, find_boundaries, assemble_chapters
+
+WORDS_PER_MINUTE = 150
+DURATION_MINUTES = 180
+DIM = 384
+THRESHOLD = 0.25
+REPEATS = 5
+
+
+def synthetic_transcript(n_words, seed=0):
+    rng = random.Random(seed)
+    vocab = [f"mot{i}" for i in range(2000)]
+    words = []
+    while len(words) < n_words:
+        sentence = [rng.choice(vocab) for _ in range(rng.randint(8, 25))]
+        words.extend(sentence)
+        words[-1] += "."
+    return " ".join(words[:n_words])
+
+
+def synthetic_embeddings(n_chunks, seed=0):
+    # Thèmes qui dérivent : des blocs proches d’un même centroïde, avec des changements de thème
+    rng = np.random.default_rng(seed)
+    out = np.empty((n_chunks, DIM), dtype=np.float32)
+    centroid = rng.normal(size=DIM)
+    for i in range(n_chunks):
+        if rng.random() < 0.05:
+            centroid = rng.normal(size=DIM)
+        out[i] = centroid + rng.normal(scale=1.2, size=DIM)
+    return out
+
+
+def legacy_segment(chunks, embeddings, threshold):
+    chapters = []
+    current_chapter = chunks[0]
+    for i in range(1, len(chunks)):
+        similarity = cosine_similarity([embeddings[i-1]], [embeddings[i]])[0][0]
+        if similarity < threshold:
+            chapters.append(current_chapter.strip())
+            current_chapter = chunks[i]
+        else:
+            current_chapter += " " + chunks[i]
+    if current_chapter:
+        chapters.append(current_chapter.strip())
+    return chapters
+
+
+def vectorized_segment(chunks, embeddings, threshold):
+    return assemble_chapters(chunks, find_boundaries(embeddings, threshold))
+
+
+def best_of(fn, *args):
+    best = float("inf")
+    result = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    text = synthetic_transcript(WORDS_PER_MINUTE * DURATION_MINUTES)
+    chunks = split_into_chunks(text)
+    embeddings = synthetic_embeddings(len(chunks))
+    print(f"Transcript synthétique : {DURATION_MINUTES} min, {len(text)} caractères, {len(chunks)} blocs")
+
+    t_legacy, legacy = best_of(legacy_segment, chunks, embeddings, THRESHOLD)
+    t_vector, vector = best_of(vectorized_segment, chunks, embeddings, THRESHOLD)
+
+    assert legacy == vector, "Les deux implémentations doivent produire les mêmes chapitres"
+    print(f"Chapitres détectés     : {len(vector)}")
+    print(f"Ancienne (boucle)      : {t_legacy * 1000:8.2f} ms")
+    print(f"Vectorisée (NumPy)     : {t_vector * 1000:8.2f} ms")
+    print(f"Accélération           : x{t_legacy / t_vector:.1f}")
+
+
+if __name__ == "__main__":
+    main()
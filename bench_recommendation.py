@@ -0,0 +1,100 @@
+"""
+Benchmark du top-k de recommandation (recommendation_index.py) sur un catalogue synthétique :
+écriture de l’index, chargement, puis latence p50 / p95 / p99 d’une requête
+(produit matrice-vecteur + argpartition + lecture des métadonnées), hors embedding.
+Mesure ensuite le surcoût des filtres de métadonnées, du MMR et du plafond par podcast
+par rapport au top-k simple (objectif : moins de 5 ms).
+Le produit matrice-vecteur est limité par la bande passante mémoire (la matrice est relue
+en entier) : la latence dépend surtout du nombre de cœurs disponibles pour BLAS.
+
+    python bench_recommendation.py [nombre_d_episodes]
+"""
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+from numpy_index import _normalize_rows
+from recommendation_index import RecommendationIndex, write_index
+
+DIM = 384
+TOP_K = 5
+QUERIES = 1000
+DEFAULT_EPISODES = 100_000
+TARGET_P99_MS = 10.0
+TARGET_OVERHEAD_MS = 5.0
+LANGUAGES = ("fr", "en", "es", "de", "it")
+PLAIN = {"mmr_lambda": 1.0, "per_podcast": 0}
+VARIANTS = {
+    "MMR + 2 par podcast": {},
+    "filtre podcast (1/500)": {"filters": {"podcast_title": "Podcast 42"}},
+    "filtre langue (1/5) + MMR": {"filters": {"language": "en"}},
+    "filtre langue + dates + MMR": {"filters": {"language": ["fr", "en"], "published_after": "2023-01-01",
+                                                "published_before": "2023-06-30"}},
+}
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_EPISODES
+    rng = np.random.default_rng(0)
+    vectors = _normalize_rows(rng.normal(size=(n, DIM)).astype(np.float32))
+    columns = {
+        "podcast_title": [f"Podcast {i % 500}" for i in range(n)],
+        "episode_title": [f"Épisode {i}" for i in range(n)],
+        "episode_description": [f"Description de l’épisode {i}" for i in range(n)],
+        "episode_link": [f"https://example.org/episodes/{i}" for i in range(n)],
+        "language": [LANGUAGES[i % len(LANGUAGES)] for i in range(n)],
+        "published_at": [str(np.datetime64("2020-01-01") + int(d)) for d in rng.integers(0, 5 * 365, n)]
+    }
+    queries = rng.normal(size=(QUERIES, DIM)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        write_index(tmp, vectors, columns, {"model_name": "synthetic"})
+        write_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = RecommendationIndex.load(tmp)
+        load_seconds = time.perf_counter() - start
+
+    index.search(queries[0], TOP_K, **PLAIN)  # premier appel exclu
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, TOP_K, **PLAIN)
+        samples.append(time.perf_counter() - start)
+
+    # Contrôle : le top-1 d’un vecteur du catalogue est lui-même
+    assert index.search(vectors[123], 1, **PLAIN)[0]["episode_title"] == "Épisode 123"
+
+    p99 = percentile_ms(samples, 99)
+    print(f"{n} épisodes × {DIM} dims ({vectors.nbytes / 1e6:.0f} Mo), {QUERIES} requêtes, top-{TOP_K}, "
+          f"{os.cpu_count()} cœur(s)")
+    print(f"Écriture de l’index : {write_seconds:.2f} s   chargement : {load_seconds:.2f} s")
+    print(f"Requête : p50 {percentile_ms(samples, 50):6.2f} ms   p95 {percentile_ms(samples, 95):6.2f} ms   "
+          f"p99 {p99:6.2f} ms   (objectif p99 < {TARGET_P99_MS:g} ms : {'OK' if p99 < TARGET_P99_MS else 'NON'})")
+
+
+    print(f"\nSurcoût par rapport au top-k simple (objectif < {TARGET_OVERHEAD_MS:g} ms) :")
+    for name, kwargs in VARIANTS.items():
+        index.search(queries[0], TOP_K, **kwargs)
+        variant = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, TOP_K, **kwargs)
+            variant.append(time.perf_counter() - start)
+        # Le filtre par podcast désactive le plafond par podcast : k résultats attendus
+        assert len(index.search(queries[0], TOP_K, **kwargs)) == TOP_K, name
+        overhead = percentile_ms(variant, 50) - percentile_ms(samples, 50)
+        print(f"  {name:<30} p50 {percentile_ms(variant, 50):6.2f} ms   p99 {percentile_ms(variant, 99):6.2f} ms   "
+              f"surcoût p50 {overhead:+6.2f} ms ({'OK' if overhead < TARGET_OVERHEAD_MS else 'NON'})")
+
+
+if __name__ == "__main__":
+    main()
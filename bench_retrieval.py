@@ -0,0 +1,79 @@
+"""
+Benchmark de latence du retriever RAG : collection Chroma persistante contre
+l’index NumPy en memmap (numpy_index.py), pour un épisode de quelques centaines de chunks.
+
+Les embeddings sont synthétiques (vecteurs pseudo-aléatoires dérivés du texte) pour
+mesurer la recherche seule et pas le modèle ; les deux backends reçoivent les mêmes.
+
+    python bench_retrieval.py [nombre_de_chunks]
+"""
+import sys
+import time
+import hashlib
+import tempfile
+
+import numpy as np
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+
+from numpy_index import NumpyVectorIndex
+from vectorstore import chunk_ids
+
+DIM = 384
+TOP_K = 3
+QUERIES = 200
+DEFAULT_CHUNKS = 400
+
+
+class SyntheticEmbeddings(Embeddings):
+    def _vector(self, text):
+        seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+        return np.random.default_rng(seed).normal(size=DIM).astype(np.float32).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+
+def measure(retriever, queries):
+    retriever.invoke(queries[0])  # premier appel exclu (ouverture, caches)
+    samples = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        docs = retriever.invoke(query)
+        samples.append(time.perf_counter() - start)
+        results.append([d.page_content for d in docs])
+    return samples, results
+
+
+def main():
+    n_chunks = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CHUNKS
+    chunks = [f"chunk {i} " + "mot " * 150 for i in range(n_chunks)]
+    queries = [f"question {i}" for i in range(QUERIES)]
+    embedding = SyntheticEmbeddings()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chroma = Chroma(collection_name="bench", embedding_function=embedding, persist_directory=tmp + "/chroma")
+        chroma.add_texts(texts=chunks, ids=chunk_ids(chunks))
+        index = NumpyVectorIndex(tmp + "/numpy", embedding)
+        index.add_texts(chunks, ids=chunk_ids(chunks))
+
+        t_chroma, r_chroma = measure(chroma.as_retriever(search_kwargs={"k": TOP_K}), queries)
+        t_numpy, r_numpy = measure(index.as_retriever(search_kwargs={"k": TOP_K}), queries)
+
+    agreement = np.mean([len(set(a) & set(b)) / TOP_K for a, b in zip(r_chroma, r_numpy)])
+    print(f"{n_chunks} chunks, {QUERIES} requêtes, top-{TOP_K} (accord des résultats : {agreement:.0%})")
+    print(f"Chroma          : p50 {percentile_ms(t_chroma, 50):7.3f} ms   p95 {percentile_ms(t_chroma, 95):7.3f} ms")
+    print(f"NumPy (memmap)  : p50 {percentile_ms(t_numpy, 50):7.3f} ms   p95 {percentile_ms(t_numpy, 95):7.3f} ms")
+    print(f"Accélération p50 : x{np.median(t_chroma) / np.median(t_numpy):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark du résumé par chapitre : un `generate` par chapitre (ancien comportement)
+contre les batchs triés par longueur de model.summarize_chapters.
+
+Nécessite le modèle fine-tuné local (MODEL_PATH) :
+
+    MODEL_PATH=./mon_modele python bench_summarization.py
+"""
+import os
+import random
+import time
+
+import torch
+from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+
+from model import (
+    CHAPTER_GENERATION_KWARGS,
+    CHAPTER_MAX_INPUT_TOKENS,
+    SUMMARY_BATCH_TOKENS,
+    summarize_chapters
+)
+
+CHAPTER_COUNTS = (5, 20, 50)
+
+
+def synthetic_chapters(n, seed=0):
+    rng = random.Random(seed)
+    topics = ["artificial intelligence", "startups", "climate policy", "sports science",
+              "music production", "personal finance", "space exploration", "education"]
+    chapters = []
+    for _ in range(n):
+        topic = rng.choice(topics)
+        sentences = [
+            f"In this part we talk about {topic} and why it matters to our listeners {rng.randint(1, 99)} times over."
+            for _ in range(rng.randint(3, 25))
+        ]
+        chapters.append(" ".join(sentences))
+    return chapters
+
+
+def per_chapter(chapters, tokenizer, model):
+    summaries = []
+    for chapter in chapters:
+        inputs = tokenizer(
+            chapter,
+            return_tensors="pt",
+            truncation=True,
+            max_length=CHAPTER_MAX_INPUT_TOKENS,
+            padding="longest"
+        ).to(model.device)
+        summary_ids = model.generate(**inputs, **CHAPTER_GENERATION_KWARGS)
+        summaries.append(tokenizer.decode(summary_ids[0], skip_special_tokens=True).strip())
+    return summaries
+
+
+def main():
+    model_path = os.getenv("MODEL_PATH")
+    if not model_path:
+        raise SystemExit("Définissez MODEL_PATH vers le modèle fine-tuné.")
+
+    tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_path, local_files_only=True)
+    model = model.to("cuda" if torch.cuda.is_available() else "cpu")
+    print(f"Device : {model.device}, budget par batch : {SUMMARY_BATCH_TOKENS} tokens")
+
+    print(f"{'chapitres':>10} {'ancien (s)':>12} {'batché (s)':>12} {'gain':>7} {'identiques':>11}")
+    for n in CHAPTER_COUNTS:
+        chapters = synthetic_chapters(n)
+
+        start = time.perf_counter()
+        old = per_chapter(chapters, tokenizer, model)
+        t_old = time.perf_counter() - start
+
+        start = time.perf_counter()
+        new = summarize_chapters(chapters, tokenizer, model)
+        t_new = time.perf_counter() - start
+
+        same = sum(a == b for a, b in zip(old, new))
+        print(f"{n:>10} {t_old:>12.2f} {t_new:>12.2f} {t_old / t_new:>6.1f}x {same:>6}/{n}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark de débit de transcription (secondes d’audio par seconde de calcul) :
+un seul modèle whisper séquentiel contre le pool de process de parallel_transcription.py.
+
+    python bench_transcription.py [chemin_audio] [workers...]
+    python bench_transcription.py uploads/GlobeVibe.mp3 2 4
+"""
+import sys
+import time
+
+import numpy as np
+from faster_whisper import WhisperModel
+from faster_whisper.audio import decode_audio
+
+from parallel_transcription import (
+    SAMPLE_RATE,
+    WHISPER_CPU_THREADS,
+    WHISPER_MODEL_SIZE,
+    _get_pool,
+    _transcribe_piece,
+    transcribe_parallel
+)
+
+DEFAULT_AUDIO = "uploads/GlobeVibe.mp3"
+BEAM_SIZE = 5
+
+
+def sequential(audio_path, cpu_threads):
+    model = WhisperModel(WHISPER_MODEL_SIZE, device="cpu", compute_type="int8", cpu_threads=cpu_threads)
+    start = time.perf_counter()
+    segments, info = model.transcribe(audio_path, beam_size=BEAM_SIZE)
+    n = sum(1 for _ in segments)
+    return time.perf_counter() - start, info.duration, n
+
+
+def parallel(audio_path, workers):
+    # Démarre le pool et charge un modèle par worker (exclu de la mesure)
+    pool = _get_pool(workers, WHISPER_MODEL_SIZE, WHISPER_CPU_THREADS)
+    silence = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    for future in [pool.submit(_transcribe_piece, 0.0, silence, 1) for _ in range(workers)]:
+        future.result()
+    start = time.perf_counter()
+    segments, duration = transcribe_parallel(audio_path, beam_size=BEAM_SIZE, workers=workers)
+    n = sum(1 for _ in segments)
+    return time.perf_counter() - start, duration, n
+
+
+def main():
+    audio_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_AUDIO
+    worker_counts = [int(w) for w in sys.argv[2:]] or [2, 4]
+    duration = len(decode_audio(audio_path, sampling_rate=SAMPLE_RATE)) / SAMPLE_RATE
+    print(f"Audio : {audio_path} ({duration:.0f}s), modèle {WHISPER_MODEL_SIZE}, "
+          f"{WHISPER_CPU_THREADS} threads par process\n")
+
+    print(f"{'mode':>16} {'temps (s)':>10} {'segments':>9} {'audio-s / s':>12}")
+    elapsed, duration, n = sequential(audio_path, WHISPER_CPU_THREADS)
+    print(f"{'séquentiel':>16} {elapsed:>10.1f} {n:>9} {duration / elapsed:>12.1f}")
+    for workers in worker_counts:
+        elapsed, duration, n = parallel(audio_path, workers)
+        print(f"{f'{workers} workers':>16} {elapsed:>10.1f} {n:>9} {duration / elapsed:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,23 @@
-from langchain.vectorstores import Chroma
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.schema import Document
-import json
-import os
+from recommendation_index import RECO_INDEX_DIR, RecommendationIndex, reload_recommendation_index
+from ann_index import build_ann_index
+from catalog_ingest import CATALOG_PATH, ingest_catalog
 
-def load_local_podcasts(filepath='./podcast_dataset/podcast_epds_dataset.json'):
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return json.load(f)
-
-def build_podcast_chroma_index(persist_dir="data/vectorstores/podcast_eps"):
-    episodes = load_local_podcasts()
-    descriptions = [ep['episode_description'] for ep in episodes]
-    metadata = episodes
-
-    embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-
-    docs = [Document(page_content=desc, metadata=meta) for desc, meta in zip(descriptions, metadata)]
-
-    vectorstore = Chroma.from_documents(docs, embedding=embedding_model, persist_directory=persist_dir)
-    vectorstore.persist()
-    print("✅ Podcast dataset indexé et stocké dans Chroma.")
+def build_podcast_index(index_dir=RECO_INDEX_DIR, catalog_path=CATALOG_PATH):
+    """
+    Index de recommandation (matrice float32 + métadonnées en colonnes, voir recommendation_index.py),
+    mis à jour en flux depuis le catalogue : seuls les épisodes nouveaux ou modifiés sont encodés,
+    les épisodes retirés du catalogue sont supprimés (voir catalog_ingest.py), puis l’index ANN
+    éventuel est reconstruit (voir ann_index.py).
+    """
+    report = ingest_catalog(catalog_path, index_dir=index_dir)
+    # Index ANN (IVF / IVF-PQ) ré-entraîné sur le catalogue à jour si RECO_INDEX_BACKEND le demande
+    index = RecommendationIndex.load(index_dir, mmap=True)
+    build_ann_index(index.matrix, index_dir, version=index.meta.get("version", ""))
+    reload_recommendation_index(index_dir)
+    print(f"✅ Index de recommandation : {report['episodes']} épisodes ({report['embedded']} encodés, "
+          f"{report['removed']} supprimés).")
+    return report
 
 if __name__ == "__main__":
-    build_podcast_chroma_index()
+    build_podcast_index()
 
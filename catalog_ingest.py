@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from numpy_index import _normalize_rows
+from recommendation_index import (
+    COLUMNS, RECO_INDEX_DIR, VECTORS_FILE, RecommendationIndex, description_hash, write_metadata
+)
+
+logger = logging.getLogger(__name__)
+
+# —————— Config ——————
+CATALOG_PATH = os.getenv("CATALOG_PATH", "./podcast_dataset/podcast_epds_dataset.json")
+# Épisodes traités par lot (un seul appel à l’embedder par lot)
+CATALOG_BATCH_SIZE = int(os.getenv("CATALOG_BATCH_SIZE", "256"))
+CATALOG_READ_CHUNK = 1 << 16
+# Caractères pouvant suivre un élément du tableau
+_SEPARATORS = " \t\r\n,]"
+CATALOG_PROGRESS_EVERY = int(os.getenv("CATALOG_PROGRESS_EVERY", "10000"))
+
+# Une seule mise à jour de l’index à la fois dans le process : vectors.f32 et metadata.json
+# sont remplacés l’un après l’autre et doivent provenir de la même ingestion
+_INGEST_LOCK = threading.Lock()
+
+
+# ---------- lecture en flux ----------
+def iter_json_array(f, chunk_size: int = CATALOG_READ_CHUNK) -> Iterator[Any]:
+    """
+    Lit un tableau JSON (`[ {...}, {...} ]`) élément par élément, sans charger le fichier :
+    le texte est lu par blocs et chaque élément décodé dès qu’il est complet.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+    started = False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    while True:
+        # Sauter espaces et séparateurs
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            fill()
+        if pos >= len(buffer):
+            if started:
+                raise ValueError("Catalogue JSON tronqué (']' manquant)")
+            return
+        if not started:
+            if buffer[pos] != "[":
+                raise ValueError("Le catalogue JSON doit être un tableau d’épisodes")
+            started = True
+            pos += 1
+            continue
+        if buffer[pos] == "]":
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        if not eof and (end == len(buffer) or buffer[end] not in _SEPARATORS):
+            # Un nombre coupé par la fin du bloc (`1.` de `1.5`, `2e` de `2e3`) est décodé comme
+            # un préfixe valide : la valeur n’est acceptée que suivie d’un séparateur
+            fill()
+            continue
+        pos = end
+        yield item
+
+
+def iter_catalog(path: str) -> Iterator[Dict[str, Any]]:
+    """Épisodes d’un catalogue JSON (tableau) ou JSONL (un épisode par ligne), lus en flux."""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            yield from iter_json_array(f)
+
+
+def episode_id(episode: Dict[str, Any]) -> str:
+    """Identifiant stable d’un épisode : champ id explicite, sinon lien, sinon titres."""
+    for field in ("episode_id", "id", "guid", "episode_link"):
+        value = episode.get(field)
+        if value not in (None, "", "N/A"):
+            return str(value)
+    key = f"{episode.get('podcast_title', '')}\x1f{episode.get('episode_title', '')}"
+    return "t-" + hashlib.sha256(key.encode("utf-8")).hexdigest()[:24]
+
+
+# ---------- ingestion incrémentale ----------
+def _batches(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ingest_episodes(
+    episodes: Iterable[Dict[str, Any]],
+    index_dir: str = RECO_INDEX_DIR,
+    embedder=None,
+    batch_size: int = CATALOG_BATCH_SIZE
+) -> Dict[str, Any]:
+    """
+    Met à jour l’index de recommandation à partir d’un flux d’épisodes.
+
+    Delta par (episode_id, hash de la description) contre l’index existant : les épisodes
+    inchangés reprennent leur vecteur (lu en memmap), seuls les nouveaux et les modifiés
+    sont encodés, par lots ; les épisodes absents du flux sont supprimés.
+    Les vecteurs sont écrits au fil de l’eau dans un fichier temporaire, puis l’index
+    est remplacé atomiquement. Retourne un rapport (compteurs, durées, débits).
+    Les ingestions concurrentes du même process sont sérialisées.
+    """
+    with _INGEST_LOCK:
+        return _ingest_episodes(episodes, index_dir, embedder, batch_size)
+
+
+def _ingest_episodes(episodes, index_dir, embedder, batch_size) -> Dict[str, Any]:
+    if embedder is None:
+        from embedding import get_embedder
+        embedder = get_embedder()
+    model_name = getattr(embedder, "model_name", None)
+    start = time.perf_counter()
+    os.makedirs(index_dir, exist_ok=True)
+
+    old_rows: Dict[str, int] = {}
+    old_hashes: List[str] = []
+    old_matrix: Optional[np.ndarray] = None
+    try:
+        old = RecommendationIndex.load(index_dir, mmap=True)
+        if old.meta.get("model_name") == model_name and "episode_id" in old.columns:
+            old_rows = {eid: i for i, eid in enumerate(old.columns["episode_id"])}
+            old_hashes = old.columns["description_hash"]
+            old_matrix = old.matrix
+    except (FileNotFoundError, ValueError, KeyError, json.JSONDecodeError):
+        pass
+
+    counts = {"episodes": 0, "new": 0, "changed": 0, "unchanged": 0, "duplicates": 0}
+    columns: Dict[str, List[Any]] = {name: [] for name in (*COLUMNS, "episode_id", "description_hash")}
+    seen = set()
+    dim = old_matrix.shape[1] if old_matrix is not None else None
+    embed_seconds = 0.0
+    next_report = CATALOG_PROGRESS_EVERY
+
+    vectors_path = os.path.join(index_dir, VECTORS_FILE)
+    tmp_path = f"{vectors_path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        with open(tmp_path, "wb") as out:
+            for batch in _batches(episodes, batch_size):
+                rows = []
+                to_embed = []
+                for episode in batch:
+                    eid = episode_id(episode)
+                    if eid in seen:
+                        counts["duplicates"] += 1
+                        continue
+                    seen.add(eid)
+                    desc_hash = description_hash(episode.get("episode_description"))
+                    row = old_rows.get(eid)
+                    if row is not None and old_hashes[row] == desc_hash:
+                        counts["unchanged"] += 1
+                    else:
+                        counts["changed" if row is not None else "new"] += 1
+                        row = None
+                        to_embed.append(len(rows))
+                    rows.append(row)
+                    for name in COLUMNS:
+                        columns[name].append(episode.get(name))
+                    columns["episode_id"].append(eid)
+                    columns["description_hash"].append(desc_hash)
+                if not rows:
+                    continue
+
+                first = len(columns["episode_id"]) - len(rows)
+                encoded = None
+                if to_embed:
+                    t0 = time.perf_counter()
+                    texts = [columns["episode_description"][first + i] or "" for i in to_embed]
+                    encoded = _normalize_rows(embedder.encode(texts))
+                    embed_seconds += time.perf_counter() - t0
+                    dim = encoded.shape[1]
+                block = np.empty((len(rows), dim), dtype=np.float32)
+                reused = [i for i, r in enumerate(rows) if r is not None]
+                if reused:
+                    block[reused] = old_matrix[[rows[i] for i in reused]]
+                if encoded is not None:
+                    block[to_embed] = encoded
+                out.write(block.tobytes())
+
+                counts["episodes"] = len(columns["episode_id"])
+                if counts["episodes"] >= next_report:
+                    next_report += CATALOG_PROGRESS_EVERY
+                    elapsed = time.perf_counter() - start
+                    logger.info(f"Catalogue : {counts['episodes']} épisodes traités "
+                                f"({counts['episodes'] / elapsed:.0f}/s, {counts['new'] + counts['changed']} encodés)")
+
+        os.replace(tmp_path, vectors_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    write_metadata(index_dir, counts["episodes"], dim or 0, columns, {"model_name": model_name})
+
+    seconds = time.perf_counter() - start
+    embedded = counts["new"] + counts["changed"]
+    report = {
+        **counts,
+        "removed": sum(1 for eid in old_rows if eid not in seen),
+        "embedded": embedded,
+        "seconds": round(seconds, 3),
+        "embed_seconds": round(embed_seconds, 3),
+        "episodes_per_second": round(counts["episodes"] / seconds, 1) if seconds else None,
+        "embedded_per_second": round(embedded / embed_seconds, 1) if embed_seconds else None
+    }
+    logger.info(f"Index de recommandation mis à jour : {report}")
+    return report
+
+
+def ingest_catalog(path: str = CATALOG_PATH, index_dir: str = RECO_INDEX_DIR, embedder=None,
+                   batch_size: int = CATALOG_BATCH_SIZE) -> Dict[str, Any]:
+    """Ingestion incrémentale d’un fichier catalogue (.json ou .jsonl)."""
+    return ingest_episodes(iter_catalog(path), index_dir=index_dir, embedder=embedder, batch_size=batch_size)
+
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s [%(levelname)s] %(message)s")
+    print(json.dumps(ingest_catalog(sys.argv[1] if len(sys.argv) > 1 else CATALOG_PATH), indent=2))
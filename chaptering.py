@@ -1,36 +1,71 @@
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+import numpy as np
 
-def segment_by_topic(text, threshold=0.5):
+from embedding import get_embedder
+
+
+def split_into_chunks(text, chunk_size=500):
+    """
+    Normalise les espaces puis regroupe les phrases (séparées par '.') en blocs
+    d’au plus `chunk_size` caractères.
+    """
     text = text.replace("\n", " ").replace("\r", " ").replace("\t", " ")
     text = ' '.join(text.split())
-    
+
     chunks = []
-    current_chunk = ""
+    parts = []
+    current_len = 0
     for sentence in text.split('.'):
-        if len(current_chunk) + len(sentence) + 1 <= 500:
-            current_chunk += sentence + "."        
-        else:
-            chunks.append(current_chunk.strip())
-            current_chunk = sentence + "."
-    if current_chunk:
-        chunks.append(current_chunk.strip())
-
-    
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    embeddings = model.encode(chunks)
-    
-    chapters = []
-    current_chapter = chunks[0]
-    for i in range(1, len(chunks)):
-        similarity = cosine_similarity([embeddings[i-1]], [embeddings[i]])[0][0]
-        if similarity < threshold:
-            chapters.append(current_chapter.strip())
-            current_chapter = chunks[i]
+        if current_len + len(sentence) + 1 <= chunk_size:
+            parts.append(sentence)
+            current_len += len(sentence) + 1
         else:
-            current_chapter += " " + chunks[i]
-    
-    if current_chapter:
-        chapters.append(current_chapter.strip())
-    
-    return chapters
\ No newline at end of file
+            chunks.append(".".join(parts + [""]).strip())
+            parts = [sentence]
+            current_len = len(sentence) + 1
+    if parts:
+        chunks.append(".".join(parts + [""]).strip())
+    return chunks
+
+
+def adjacent_similarities(embeddings):
+    """
+    Similarité cosinus entre chaque bloc et le suivant, en une seule passe :
+    lignes normalisées puis produit scalaire ligne à ligne des vues décalées.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if len(embeddings) < 2:
+        return np.zeros(0, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    unit = embeddings / norms
+    return np.einsum("ij,ij->i", unit[:-1], unit[1:])
+
+
+def find_boundaries(embeddings, threshold):
+    """
+    Indices des blocs qui ouvrent un nouveau chapitre (similarité avec le bloc
+    précédent sous le seuil).
+    """
+    return np.flatnonzero(adjacent_similarities(embeddings) < threshold) + 1
+
+
+def assemble_chapters(chunks, boundaries):
+    """
+    Construit les chapitres par découpage d’indices et une seule jointure par chapitre.
+    """
+    starts = [0] + [int(b) for b in boundaries]
+    ends = starts[1:] + [len(chunks)]
+    chapters = [" ".join(chunks[a:b]).strip() for a, b in zip(starts[:-1], ends[:-1])]
+    last = " ".join(chunks[starts[-1]:ends[-1]])
+    if last:
+        chapters.append(last.strip())
+    return chapters
+
+
+def segment_by_topic(text, threshold=0.5, chunk_size=500):
+    chunks = split_into_chunks(text, chunk_size=chunk_size)
+
+    embeddings = get_embedder().encode(chunks)
+
+    boundaries = find_boundaries(embeddings, threshold)
+    return assemble_chapters(chunks, boundaries)
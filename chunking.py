@@ -1,33 +1,64 @@
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-import logging
-
-logger = logging.getLogger(__name__)
-
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 import logging
 from typing import List, Optional
 
 logger = logging.getLogger(__name__)
 
-def get_text_chunks(
-    text: str,
+def make_splitter(
     chunk_size: int = 1000,
     chunk_overlap: int = 200,
     separators: Optional[List[str]] = None
-) -> List[str]:
-    
+) -> RecursiveCharacterTextSplitter:
     if separators is None:
         separators = ["\n\n", "\n", " ", ""]
-
-    logger.info(f"Découpage du texte en chunks (size={chunk_size}, overlap={chunk_overlap})")
-    splitter = RecursiveCharacterTextSplitter(
+    return RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
         separators=separators,
         length_function=len
     )
+
+
+def get_text_chunks(
+    text: str,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    separators: Optional[List[str]] = None
+) -> List[str]:
+
+    logger.info(f"Découpage du texte en chunks (size={chunk_size}, overlap={chunk_overlap})")
+    splitter = make_splitter(chunk_size, chunk_overlap, separators)
     chunks = splitter.split_text(text)
     logger.info(f"{len(chunks)} chunks générés (size={chunk_size}, overlap={chunk_overlap})")
     return chunks
 
+
+
+class IncrementalChunker:
+    """
+    Découpage au fil de l’eau : on accumule le texte reçu et on émet les chunks
+    complets dès que le tampon est assez long. Le dernier chunk (incomplet) reste
+    en tampon et sert de recouvrement avec la suite.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200,
+                 separators: Optional[List[str]] = None):
+        self.chunk_size = chunk_size
+        self.splitter = make_splitter(chunk_size, chunk_overlap, separators)
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._buffer = text if not self._buffer else self._buffer + "\n" + text
+        if len(self._buffer) < 2 * self.chunk_size:
+            return []
+        chunks = self.splitter.split_text(self._buffer)
+        if len(chunks) < 2:
+            return []
+        self._buffer = chunks[-1]
+        return chunks[:-1]
+
+    def flush(self) -> List[str]:
+        chunks = self.splitter.split_text(self._buffer) if self._buffer.strip() else []
+        self._buffer = ""
+        return chunks
@@ -1,23 +1,189 @@
 
 
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
+import os
+import threading
+import time
 import logging
-from typing import List
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from embedding_cache import EmbeddingCache, cache_key
 
 logger = logging.getLogger(__name__)
 
+# —————— Config ——————
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "cpu")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE", "1") != "0"
+
+# Registre global : une seule instance par (modèle, device) pour tout le process.
+_REGISTRY: Dict[Tuple[str, str], "SharedEmbeddings"] = {}
+_REGISTRY_LOCK = threading.Lock()
+_LOAD_COUNT = 0
+_CACHES: Dict[str, EmbeddingCache] = {}
+
+
+def _get_cache(model_name: str) -> EmbeddingCache:
+    # Un seul cache par modèle, partagé entre devices (les vecteurs sont identiques).
+    with _REGISTRY_LOCK:
+        cache = _CACHES.get(model_name)
+        if cache is None:
+            cache = EmbeddingCache(model_name)
+            _CACHES[model_name] = cache
+    return cache
+
+
+class SharedEmbeddings(Embeddings):
+    """
+    Embedder partagé (SentenceTransformer) compatible avec l’interface LangChain.
+    Le modèle n’est chargé qu’au premier appel (lazy), une seule fois, sous verrou.
+    Les vecteurs déjà calculés sont servis par le cache adressé par contenu
+    (voir embedding_cache.py) : seuls les textes inconnus passent dans le modèle.
+    """
+
+    def __init__(self, model_name: str, device: str, batch_size: int, use_cache: bool = EMBEDDING_CACHE_ENABLED):
+        self.model_name = model_name
+        self.device = device
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+        self.load_seconds = 0.0
+        self.cache = _get_cache(model_name) if use_cache else None
+        self.forward_passes = 0
+        self.encoded_texts = 0
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    global _LOAD_COUNT
+                    from sentence_transformers import SentenceTransformer
+
+                    logger.info(f"Chargement du modèle d’embedding {self.model_name} sur {self.device}")
+                    start = time.perf_counter()
+                    self._model = SentenceTransformer(self.model_name, device=self.device)
+                    self.load_seconds = time.perf_counter() - start
+                    with _REGISTRY_LOCK:
+                        _LOAD_COUNT += 1
+                    logger.info(f"Modèle d’embedding chargé en {self.load_seconds:.2f}s")
+        return self._model
+
+    def _forward(self, texts: List[str]) -> np.ndarray:
+        self.forward_passes += 1
+        self.encoded_texts += len(texts)
+        vectors = self.model.encode(
+            list(texts),
+            batch_size=self.batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True
+        )
+        return np.asarray(vectors, dtype=np.float32)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Retourne une matrice float32 (len(texts), dim) des embeddings.
+        """
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        if self.cache is None:
+            return self._forward(texts)
+
+        keys = [cache_key(self.model_name, t) for t in texts]
+        cached = self.cache.get_many(keys)
+        # Textes manquants, dédupliqués par clé
+        missing: Dict[str, str] = {}
+        for key, text, vector in zip(keys, texts, cached):
+            if vector is None and key not in missing:
+                missing[key] = text
+        if missing:
+            computed = self._forward(list(missing.values()))
+            self.cache.put_many(list(missing.keys()), computed)
+            fresh = dict(zip(missing.keys(), computed))
+            cached = [v if v is not None else fresh[k] for k, v in zip(keys, cached)]
+        return np.vstack(cached).astype(np.float32, copy=False)
+
+    @property
+    def dimension(self) -> int:
+        if self.cache is not None and self.cache.dim is not None:
+            return self.cache.dim
+        return int(self.model.get_sentence_embedding_dimension())
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+
+def get_embedder(
+    model_name: Optional[str] = None,
+    device: Optional[str] = None,
+    batch_size: Optional[int] = None
+) -> SharedEmbeddings:
+    """
+    Retourne l’embedder partagé pour (model_name, device), en le créant si besoin.
+    Le chargement effectif du modèle reste paresseux (premier encode).
+    """
+    model_name = model_name or EMBEDDING_MODEL_NAME
+    device = device or EMBEDDING_DEVICE
+    key = (model_name, device)
+    with _REGISTRY_LOCK:
+        embedder = _REGISTRY.get(key)
+    if embedder is None:
+        candidate = SharedEmbeddings(
+            model_name=model_name,
+            device=device,
+            batch_size=batch_size or EMBEDDING_BATCH_SIZE
+        )
+        with _REGISTRY_LOCK:
+            embedder = _REGISTRY.setdefault(key, candidate)
+    return embedder
+
+
+def warmup_embedder() -> SharedEmbeddings:
+    """
+    Force le chargement du modèle et un premier encode (à appeler au démarrage de Flask).
+    On passe volontairement à côté du cache pour exécuter réellement le modèle.
+    """
+    embedder = get_embedder()
+    embedder._forward(["warm-up"])
+    return embedder
+
+
+def get_load_count() -> int:
+    """
+    Nombre de chargements de modèles d’embedding effectués depuis le démarrage du process.
+    """
+    return _LOAD_COUNT
+
+
+def get_stats() -> dict:
+    with _REGISTRY_LOCK:
+        models = [
+            {
+                "model_name": emb.model_name,
+                "device": emb.device,
+                "batch_size": emb.batch_size,
+                "loaded": emb._model is not None,
+                "load_seconds": round(emb.load_seconds, 3),
+                "forward_passes": emb.forward_passes,
+                "encoded_texts": emb.encoded_texts,
+                "cache": emb.cache.stats() if emb.cache is not None else None
+            }
+            for emb in _REGISTRY.values()
+        ]
+    return {"load_count": _LOAD_COUNT, "models": models}
+
+
 def get_embeddings(texts: List[str]) -> List:
     """
     Retourne la liste d’array numpy d’embeddings pour chaque texte via all-MiniLM-L6-v2.
-    
+
     """
     logger.info(f"Calcul des embeddings pour {len(texts)} textes")
-    hf_emb = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2",
-        model_kwargs={"device": "cpu"}
-    )
-    # Si vous voulez uniquement recupérer les vecteurs dans un np.ndarray :
-    return hf_emb.embed_documents(texts)
-
-
+    return list(get_embedder().encode(texts))
@@ -0,0 +1,257 @@
+
+import os
+import re
+import json
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou, un seul process par dossier de cache
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# —————— Config ——————
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join("data", "cache", "embeddings"))
+EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "20000"))
+# Taille maximale du niveau disque (éviction LRU par compaction)
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024"))
+
+# Après éviction, le niveau disque est ramené à cette fraction du maximum
+# (une compaction libère de la place pour de nombreux ajouts)
+_COMPACT_TARGET = 0.9
+# Octets d’une clé dans keys.txt (SHA-256 hex + saut de ligne)
+_KEY_BYTES = 65
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalisation utilisée pour la clé de cache : espaces compactés, bords retirés.
+    """
+    return " ".join(text.split())
+
+
+def cache_key(model_name: str, text: str) -> str:
+    """
+    Clé de contenu : SHA-256 de (nom du modèle, texte normalisé).
+    """
+    h = hashlib.sha256()
+    h.update(model_name.encode("utf-8"))
+    h.update(b"\0")
+    h.update(normalize_text(text).encode("utf-8"))
+    return h.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Cache d’embeddings adressé par contenu, pour un modèle donné.
+
+    - Niveau mémoire : LRU (OrderedDict) de vecteurs float32.
+    - Niveau disque  : `vectors.f32` (float32 bruts, une ligne par entrée, lu en memmap)
+                       + `keys.txt` (une clé hex par ligne, même ordre).
+    Les fichiers sont en ajout seul ; au-delà de `max_mb`, ils sont réécrits (compaction)
+    en ne gardant que les entrées les plus récemment utilisées. L’ordre des lignes suit
+    l’ordre LRU à la dernière compaction, puis l’ordre d’ajout.
+    Le niveau disque appartient à un seul process (verrou `.lock`, les numéros de ligne sont
+    tenus en mémoire) : un autre process ouvrant le même dossier n’utilise que le niveau mémoire.
+    La dimension est lue dans `meta.json` (ou fixée au premier ajout), ce qui permet
+    de servir un cache plein sans charger le modèle.
+    """
+
+    def __init__(self, model_name: str, dim: Optional[int] = None, cache_dir: str = EMBEDDING_CACHE_DIR,
+                 memory_items: int = EMBEDDING_CACHE_MEMORY_ITEMS, max_mb: float = EMBEDDING_CACHE_MAX_MB):
+        self.model_name = model_name
+        self.memory_items = memory_items
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.dir = os.path.join(cache_dir, safe_name)
+        os.makedirs(self.dir, exist_ok=True)
+        self._vectors_path = os.path.join(self.dir, "vectors.f32")
+        self._keys_path = os.path.join(self.dir, "keys.txt")
+        self._meta_path = os.path.join(self.dir, "meta.json")
+        self.disk = self._lock_dir()
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                dim = json.load(f)["dim"]
+        self.dim = dim
+
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # Clé → ligne sur disque, de la moins à la plus récemment utilisée
+        self._rows: "OrderedDict[str, int]" = OrderedDict()
+        self._memmap: Optional[np.memmap] = None
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._load_index()
+
+    # ---------- disque ----------
+    def _lock_dir(self) -> bool:
+        """Verrou exclusif sur le dossier, gardé jusqu’à la fin du process ; False s’il est déjà pris."""
+        if fcntl is None:
+            return True
+        self._lock_file = open(os.path.join(self.dir, ".lock"), "a")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock_file.close()
+            logger.warning(f"Cache d’embeddings {self.dir} utilisé par un autre process : "
+                           f"niveau mémoire seulement (définir EMBEDDING_CACHE_DIR par process)")
+            return False
+        return True
+
+    def _load_index(self) -> None:
+        if self.dim is None or not self.disk:
+            return
+        keys = []
+        if os.path.exists(self._keys_path):
+            with open(self._keys_path, "r", encoding="ascii") as f:
+                keys = [line.strip() for line in f if line.strip()]
+        row_bytes = self.dim * 4
+        n_vectors = os.path.getsize(self._vectors_path) // row_bytes if os.path.exists(self._vectors_path) else 0
+        # Une écriture interrompue peut laisser une clé sans vecteur (ou l’inverse) : on tronque.
+        n = min(len(keys), n_vectors)
+        if n_vectors > n:
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(n * row_bytes)
+        if len(keys) > n:
+            keys = keys[:n]
+            with open(self._keys_path, "w", encoding="ascii") as f:
+                f.writelines(k + "\n" for k in keys)
+        self._rows = OrderedDict((k, i) for i, k in enumerate(keys))
+        self._memmap = None
+        logger.info(f"Cache d’embeddings {self.model_name} : {n} vecteurs sur disque ({self.dir})")
+        self._compact()
+
+    def _disk_matrix(self) -> Optional[np.memmap]:
+        if self._memmap is None or self._memmap.shape[0] < len(self._rows):
+            if not self._rows:
+                return None
+            self._memmap = np.memmap(self._vectors_path, dtype=np.float32, mode="r",
+                                     shape=(len(self._rows), self.dim))
+        return self._memmap
+
+    def _disk_bytes(self) -> int:
+        return len(self._rows) * (self.dim * 4 + _KEY_BYTES) if self.dim else 0
+
+    def _compact(self) -> None:
+        """
+        Au-delà de `max_bytes`, réécrit le niveau disque avec les entrées les plus récemment
+        utilisées (fichiers temporaires puis renommage atomique). Appelé sous le verrou.
+        """
+        if self._disk_bytes() <= self.max_bytes:
+            return
+        keep = int(_COMPACT_TARGET * self.max_bytes) // (self.dim * 4 + _KEY_BYTES)
+        kept = list(self._rows.items())[len(self._rows) - keep:] if keep else []
+        matrix = self._disk_matrix()
+        suffix = f".tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(self._vectors_path + suffix, "wb") as f:
+            for start in range(0, len(kept), 4096):
+                rows = [row for _, row in kept[start:start + 4096]]
+                f.write(np.ascontiguousarray(matrix[rows], dtype=np.float32).tobytes())
+        with open(self._keys_path + suffix, "w", encoding="ascii") as f:
+            f.writelines(key + "\n" for key, _ in kept)
+        # Les deux fichiers ne peuvent pas être remplacés ensemble : les clés sont retirées d’abord,
+        # une interruption laisse un cache vide plutôt que des clés décalées par rapport aux vecteurs
+        os.remove(self._keys_path)
+        os.replace(self._vectors_path + suffix, self._vectors_path)
+        os.replace(self._keys_path + suffix, self._keys_path)
+        self.evicted += len(self._rows) - len(kept)
+        logger.info(f"Cache d’embeddings {self.model_name} : {len(self._rows) - len(kept)} vecteurs évincés, "
+                    f"{len(kept)} conservés")
+        self._rows = OrderedDict((key, i) for i, (key, _) in enumerate(kept))
+        self._memmap = None
+
+    # ---------- mémoire ----------
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.memory_items:
+            self._lru.popitem(last=False)
+
+    # ---------- API ----------
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Retourne, pour chaque clé, le vecteur en cache ou None.
+        """
+        out: List[Optional[np.ndarray]] = []
+        with self._lock:
+            matrix = None
+            for key in keys:
+                vector = self._lru.get(key)
+                if key in self._rows:
+                    self._rows.move_to_end(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                else:
+                    row = self._rows.get(key)
+                    if row is not None:
+                        if matrix is None:
+                            matrix = self._disk_matrix()
+                        vector = np.array(matrix[row], dtype=np.float32)
+                        self._remember(key, vector)
+                if vector is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                out.append(vector)
+        return out
+
+    def put_many(self, keys: List[str], vectors: np.ndarray) -> None:
+        """
+        Ajoute des vecteurs (float32) au cache mémoire et au stockage disque.
+        """
+        if not keys:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                if self.disk:
+                    with open(self._meta_path, "w", encoding="utf-8") as f:
+                        json.dump({"model_name": self.model_name, "dim": self.dim}, f)
+            vectors = vectors.reshape(-1, self.dim)
+            if not self.disk:
+                for key, vector in zip(keys, vectors):
+                    self._remember(key, vector)
+                return
+            new_keys, new_rows, seen = [], [], set()
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+                if key in self._rows:
+                    self._rows.move_to_end(key)
+                elif key not in seen:
+                    seen.add(key)
+                    new_keys.append(key)
+                    new_rows.append(vector)
+            if not new_keys:
+                return
+            # Vecteurs d’abord, clés ensuite : une clé présente a toujours son vecteur.
+            with open(self._vectors_path, "ab") as f:
+                f.write(np.ascontiguousarray(new_rows, dtype=np.float32).tobytes())
+            with open(self._keys_path, "a", encoding="ascii") as f:
+                f.writelines(k + "\n" for k in new_keys)
+            start = len(self._rows)
+            for i, key in enumerate(new_keys):
+                self._rows[key] = start + i
+            self._compact()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "model_name": self.model_name,
+                "disk": self.disk,
+                "disk_entries": len(self._rows),
+                "disk_mb": round(self._disk_bytes() / 1024 / 1024, 1),
+                "max_mb": round(self.max_bytes / 1024 / 1024, 1),
+                "memory_entries": len(self._lru),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evicted": self.evicted
+            }
@@ -0,0 +1,110 @@
+"""
+Faux routeur Hugging Face (API chat completions compatible OpenAI) pour tester hors ligne
+le chat RAG, en mode normal comme en streaming (`stream: true` → server-sent events).
+
+La réponse est une phrase fixe suivie d’un écho de la question, émise mot par mot
+avec un délai réglable pour observer le time-to-first-token. Pour tester les
+nouvelles tentatives et timeouts de http_client.py, le serveur peut aussi répondre
+429 (avec Retry-After) à ses N premières requêtes, ou bloquer avant de répondre.
+
+    python fake_router.py [port]
+    HF_ROUTER_URL=http://127.0.0.1:8089/v1/chat/completions HUGGINGFACE_HUB_TOKEN=fake python main.py
+"""
+import os
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8089
+# Délai avant le premier token puis entre deux tokens (secondes)
+FIRST_TOKEN_DELAY = float(os.getenv("FAKE_ROUTER_FIRST_TOKEN_DELAY", "0.3"))
+TOKEN_DELAY = float(os.getenv("FAKE_ROUTER_TOKEN_DELAY", "0.05"))
+# Nombre de premières requêtes refusées en 429, et valeur de Retry-After envoyée
+FAILURES = int(os.getenv("FAKE_ROUTER_FAILURES", "0"))
+RETRY_AFTER = os.getenv("FAKE_ROUTER_RETRY_AFTER", "1")
+# Attente avant toute réponse (pour déclencher le read timeout du client)
+STALL_SECONDS = float(os.getenv("FAKE_ROUTER_STALL_SECONDS", "0"))
+
+_served = {"requests": 0}
+_served_lock = threading.Lock()
+
+
+def fake_answer(payload: dict) -> str:
+    prompt = payload["messages"][-1]["content"]
+    question = prompt.rsplit("Question:", 1)[-1].split("Answer:", 1)[0].strip()
+    return f"Ceci est une réponse de test du faux routeur à la question : {question}"
+
+
+class FakeRouterHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        with _served_lock:
+            _served["requests"] += 1
+            rejected = _served["requests"] <= FAILURES
+        if rejected:
+            body = b'{"error": "rate limited"}'
+            self.send_response(429)
+            self.send_header("Retry-After", RETRY_AFTER)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        time.sleep(STALL_SECONDS)
+        answer = fake_answer(payload)
+        if payload.get("stream"):
+            self._stream(payload, answer)
+        else:
+            time.sleep(FIRST_TOKEN_DELAY + TOKEN_DELAY * len(answer.split()))
+            body = json.dumps({
+                "model": payload.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": answer},
+                             "finish_reason": "stop"}]
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def _stream(self, payload: dict, answer: str):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        time.sleep(FIRST_TOKEN_DELAY)
+        words = answer.split(" ")
+        for i, word in enumerate(words):
+            event = {
+                "model": payload.get("model"),
+                "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}}]
+            }
+            self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(TOKEN_DELAY)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        sys.stderr.write("fake_router: " + (format % args) + "\n")
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeRouterHandler)
+    print(f"Faux routeur sur http://127.0.0.1:{port}/v1/chat/completions (Ctrl+C pour arrêter)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,21 @@
 import os
-import requests
-from typing import List, Optional
+import json
+import asyncio
+from contextvars import ContextVar
+from typing import Any, Iterator, List, Optional
 from langchain.llms.base import LLM
+from langchain_core.outputs import GenerationChunk
 from pydantic import Field
-import os
 from dotenv import load_dotenv
-import os
+
+from http_client import get_http_client
 
 load_dotenv()
 
 HF_TOKEN = os.getenv("HUGGINGFACE_HUB_TOKEN")
 # —————— Config ——————
-API_URL = "https://router.huggingface.co/together/v1/chat/completions"
+# Surchargeable pour viser un autre endpoint compatible OpenAI (ex. fake_router.py en local)
+API_URL = os.getenv("HF_ROUTER_URL", "https://router.huggingface.co/together/v1/chat/completions")
 
 if not HF_TOKEN:
     raise RuntimeError("Please set your HF token in HUGGINGFACE_HUB_TOKEN")
@@ -23,6 +27,9 @@ HEADERS = {
 
 DEFAULT_MODEL = "meta-llama/Llama-3.2-3B-Instruct-Turbo"
 
+# Client httpx partagé par les appels d’un même abatch() (pool de connexions commun)
+_ASYNC_CLIENT: ContextVar[Optional[Any]] = ContextVar("hf_router_async_client", default=None)
+
 
 class HuggingFaceRouterLLM(LLM):
     model: str = Field(default=DEFAULT_MODEL)
@@ -32,7 +39,7 @@ class HuggingFaceRouterLLM(LLM):
     def _llm_type(self) -> str:
         return "huggingface-together"
 
-    def _call(self, prompt: str, stop: Optional[List[str]] = None) -> str:
+    def _payload(self, prompt: str, stream: bool = False) -> dict:
         messages = [
             {"role": "system", "content": "You are a helpful assistant."},
             {"role": "user", "content": prompt}
@@ -42,7 +49,95 @@ class HuggingFaceRouterLLM(LLM):
             "messages": messages,
             "temperature": self.temperature
         }
-        resp = requests.post(API_URL, headers=HEADERS, json=payload)
-        resp.raise_for_status()
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any) -> str:
+        # Session keep-alive partagée : timeouts, nouvelles tentatives et concurrence bornée
+        resp = get_http_client().post(API_URL, name="llm", headers=HEADERS, json=self._payload(prompt))
+        data = resp.json()
+        return data["choices"][0]["message"]["content"]
+
+    async def _acall(self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any) -> str:
+        client = get_http_client()
+        aclient = _ASYNC_CLIENT.get()
+        if aclient is not None:
+            resp = await client.apost(aclient, API_URL, name="llm_async", headers=HEADERS,
+                                      json=self._payload(prompt))
+        else:
+            async with client.async_session() as aclient:
+                resp = await client.apost(aclient, API_URL, name="llm_async", headers=HEADERS,
+                                          json=self._payload(prompt))
         data = resp.json()
         return data["choices"][0]["message"]["content"]
+
+    async def abatch(
+        self,
+        inputs: List[Any],
+        config: Optional[Any] = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: Any
+    ) -> List[str]:
+        """
+        Génère plusieurs réponses en parallèle avec un seul client httpx (connexions réutilisées).
+        Les appels simultanés sont bornés par le budget du process (LLM_MAX_CONCURRENCY, partagé
+        avec les appels synchrones, voir PooledHttpClient.apost) ; `max_concurrency` (config
+        LangChain) peut le restreindre davantage pour ce lot.
+        """
+        limit = config.get("max_concurrency") if isinstance(config, dict) else None
+        semaphore = asyncio.Semaphore(limit) if limit else None
+
+        async def one(prompt):
+            if semaphore is None:
+                return await self.ainvoke(prompt, **kwargs)
+            async with semaphore:
+                return await self.ainvoke(prompt, **kwargs)
+
+        async with get_http_client().async_session() as aclient:
+            token = _ASYNC_CLIENT.set(aclient)
+            try:
+                return await asyncio.gather(*(one(p) for p in inputs), return_exceptions=return_exceptions)
+            finally:
+                _ASYNC_CLIENT.reset(token)
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        **kwargs: Any
+    ) -> Iterator[GenerationChunk]:
+        """
+        Complétion en streaming (`stream: true`) : le routeur répond en server-sent events,
+        une ligne `data: {...}` par fragment (choices[0].delta.content), terminée par `data: [DONE]`.
+        """
+        client = get_http_client()
+        with client.stream_post(API_URL, name="llm_stream", headers=HEADERS,
+                                json=self._payload(prompt, stream=True)) as resp:
+            resp.encoding = "utf-8"  # text/event-stream sans charset
+            for text in iter_sse_content(resp.iter_lines(decode_unicode=True)):
+                chunk = GenerationChunk(text=text)
+                if run_manager is not None:
+                    run_manager.on_llm_new_token(text, chunk=chunk)
+                yield chunk
+
+
+def iter_sse_content(lines: Iterator[str]) -> Iterator[str]:
+    """
+    Extrait les fragments de texte d’un flux SSE de chat completions (format OpenAI).
+    """
+    for line in lines:
+        if not line or not line.startswith("data:"):
+            continue  # lignes vides (séparateurs) et commentaires keep-alive
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        event = json.loads(data)
+        choices = event.get("choices") or []
+        if not choices:
+            continue
+        text = (choices[0].get("delta") or {}).get("content")
+        if text:
+            yield text
@@ -0,0 +1,292 @@
+
+import os
+import time
+import asyncio
+import random
+import bisect
+import logging
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# —————— Config ——————
+# Connexions keep-alive conservées par hôte
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+# Nouvelles tentatives sur 429 / 5xx / erreur de connexion (0 = aucune)
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+# Attente maximale entre deux tentatives, Retry-After compris
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "20"))
+# Requêtes simultanées maximales vers le routeur LLM
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Bornes supérieures des buckets de l’histogramme de latence (secondes)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class LatencyHistogram:
+    """Histogramme cumulatif à buckets fixes (format proche de Prometheus)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def snapshot(self) -> dict:
+        cumulative, running = {}, 0
+        for bound, n in zip(self.buckets, self.counts):
+            running += n
+            cumulative[f"le_{bound:g}"] = running
+        cumulative["le_inf"] = self.count
+        return {
+            "count": self.count,
+            "mean_seconds": round(self.total / self.count, 4) if self.count else None,
+            "buckets": cumulative
+        }
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Valeur de l’en-tête Retry-After (secondes ou date HTTP) en secondes, ou None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class PooledHttpClient:
+    """
+    Client HTTP partagé : une requests.Session (pool keep-alive de `pool_size` connexions),
+    timeouts connect/read, nouvelles tentatives avec backoff exponentiel (+ jitter) sur 429/5xx
+    en respectant Retry-After, et un sémaphore qui borne le nombre de requêtes simultanées.
+    Les latences sont enregistrées par nom de requête (histogrammes exposés par stats()).
+    """
+
+    def __init__(
+        self,
+        pool_size: int = HTTP_POOL_SIZE,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+        read_timeout: float = HTTP_READ_TIMEOUT,
+        max_retries: int = HTTP_MAX_RETRIES,
+        backoff_base: float = HTTP_BACKOFF_BASE,
+        backoff_max: float = HTTP_BACKOFF_MAX,
+        max_concurrency: int = LLM_MAX_CONCURRENCY
+    ):
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrency = max_concurrency
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._counters = {"requests": 0, "retries": 0, "errors": 0, "in_flight": 0}
+
+    # ---------- mesures ----------
+    def _observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    def _count(self, counter: str, delta: int = 1) -> None:
+        with self._lock:
+            self._counters[counter] += delta
+
+    def _backoff(self, attempt: int, response) -> float:
+        delay = retry_after_seconds(response.headers.get("Retry-After")) if response is not None else None
+        if delay is None:
+            delay = self.backoff_base * (2 ** attempt) * random.uniform(0.5, 1.0)
+        return min(delay, self.backoff_max)
+
+    # ---------- requêtes ----------
+    def _send(self, method: str, url: str, name: str, stream: bool, **kwargs) -> requests.Response:
+        """
+        Envoie la requête avec nouvelles tentatives ; retourne la réponse (statut vérifié).
+        Appelé sous le sémaphore.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            response = None
+            try:
+                response = self.session.request(method, url, stream=stream, **kwargs)
+            except requests.ConnectionError as e:
+                # Connexion refusée / coupée ou connect timeout : la requête n’a pas été traitée
+                if attempt >= self.max_retries:
+                    self._count("errors")
+                    raise
+                logger.warning(f"{name} : erreur de connexion ({e}), nouvelle tentative")
+            except requests.RequestException:
+                # Read timeout : l’amont a peut-être déjà traité la requête, on ne la rejoue pas
+                self._count("errors")
+                raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    self._observe(name, time.perf_counter() - start)
+                    if response.status_code >= 400:
+                        self._count("errors")
+                        response.close()
+                    response.raise_for_status()
+                    return response
+                logger.warning(f"{name} : HTTP {response.status_code}, nouvelle tentative")
+            delay = self._backoff(attempt, response)
+            if response is not None:
+                response.close()
+            attempt += 1
+            self._count("retries")
+            time.sleep(delay)
+
+    @contextmanager
+    def _slot(self) -> Iterator[None]:
+        self._slots.acquire()
+        self._count("in_flight")
+        try:
+            yield
+        finally:
+            self._count("in_flight", -1)
+            self._slots.release()
+
+    @asynccontextmanager
+    async def _aslot(self) -> AsyncIterator[None]:
+        """
+        Même créneau que _slot() (budget de concurrence commun aux appels sync et async),
+        attendu dans un thread pour ne pas bloquer la boucle d’événements.
+        """
+        acquire = asyncio.ensure_future(asyncio.to_thread(self._slots.acquire))
+        try:
+            await asyncio.shield(acquire)
+        except asyncio.CancelledError:
+            # Tâche annulée pendant l’attente : le créneau obtenu plus tard est rendu aussitôt
+            acquire.add_done_callback(lambda f: f.cancelled() or f.exception() or self._slots.release())
+            raise
+        self._count("in_flight")
+        try:
+            yield
+        finally:
+            self._count("in_flight", -1)
+            self._slots.release()
+
+    def post(self, url: str, name: str = "http", **kwargs) -> requests.Response:
+        """POST avec corps lu entièrement (le créneau de concurrence est libéré au retour)."""
+        self._count("requests")
+        with self._slot():
+            return self._send("POST", url, name, stream=False, **kwargs)
+
+    @contextmanager
+    def stream_post(self, url: str, name: str = "http_stream", **kwargs) -> Iterator[requests.Response]:
+        """
+        POST en streaming : la réponse est lue par l’appelant dans le bloc `with`,
+        le créneau de concurrence et la connexion sont rendus à la sortie du bloc.
+        La latence enregistrée est le délai jusqu’aux en-têtes de réponse.
+        """
+        self._count("requests")
+        with self._slot():
+            response = self._send("POST", url, name, stream=True, **kwargs)
+            try:
+                yield response
+            finally:
+                response.close()
+
+    # ---------- variante asyncio (httpx) ----------
+    def async_session(self) -> httpx.AsyncClient:
+        """
+        Client httpx asynchrone avec les mêmes limites (pool, timeouts) que la Session,
+        à utiliser comme `async with` le temps d’un lot de requêtes.
+        """
+        return httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+            timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0])
+        )
+
+    async def apost(self, aclient: httpx.AsyncClient, url: str, name: str = "http_async",
+                    **kwargs) -> httpx.Response:
+        """
+        POST asynchrone, mêmes règles que post() : nouvelles tentatives sur 429/5xx et erreurs
+        de connexion (Retry-After respecté), pas de rejeu après un read timeout.
+        Partage le budget `max_concurrency` du process avec post() et stream_post().
+        """
+        self._count("requests")
+        async with self._aslot():
+            attempt = 0
+            while True:
+                start = time.perf_counter()
+                response = None
+                try:
+                    response = await aclient.post(url, **kwargs)
+                except (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError) as e:
+                    if attempt >= self.max_retries:
+                        self._count("errors")
+                        raise
+                    logger.warning(f"{name} : erreur de connexion ({e}), nouvelle tentative")
+                except httpx.HTTPError:
+                    self._count("errors")
+                    raise
+                else:
+                    if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                        self._observe(name, time.perf_counter() - start)
+                        if response.status_code >= 400:
+                            self._count("errors")
+                        response.raise_for_status()
+                        return response
+                    logger.warning(f"{name} : HTTP {response.status_code}, nouvelle tentative")
+                delay = self._backoff(attempt, response)
+                attempt += 1
+                self._count("retries")
+                await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pool_size": self.pool_size,
+                "timeout": {"connect": self.timeout[0], "read": self.timeout[1]},
+                "max_concurrency": self.max_concurrency,
+                **self._counters,
+                "latency": {name: h.snapshot() for name, h in self._histograms.items()}
+            }
+
+
+_CLIENT: Optional[PooledHttpClient] = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_http_client() -> PooledHttpClient:
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = PooledHttpClient()
+    return _CLIENT
+
+
+def get_stats() -> dict:
+    with _CLIENT_LOCK:
+        client = _CLIENT
+    return client.stats() if client is not None else {"requests": 0}
@@ -0,0 +1,191 @@
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# —————— Config ——————
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join("data", "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Nombre maximal de jobs en attente + en cours ; au-delà, submit() refuse
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "16"))
+
+# Étapes de la pipeline d’ingestion, dans l’ordre
+INGEST_STAGES = ("download", "transcribe", "chunk", "index", "chain")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    stage       TEXT,
+    stages      TEXT NOT NULL,
+    error       TEXT,
+    result      TEXT,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL
+)
+"""
+
+
+class JobQueueFull(RuntimeError):
+    """Levée quand la file de jobs est pleine."""
+
+
+class JobContext:
+    """
+    Handle passé à la fonction du job pour publier son avancement étape par étape.
+    """
+
+    def __init__(self, manager: "JobManager", job_id: str):
+        self.manager = manager
+        self.job_id = job_id
+
+    def stage(self, name: str, progress: float = 0.0) -> None:
+        """Démarre (ou met à jour) l’étape `name` avec un avancement entre 0 et 1."""
+        self.manager._set_stage(self.job_id, name, progress)
+
+    def skip(self, name: str) -> None:
+        """Marque une étape comme sans objet pour ce job (ex. download pour un .txt)."""
+        self.manager._set_stage(self.job_id, name, None)
+
+    def done(self, name: str) -> None:
+        self.manager._set_stage(self.job_id, name, 1.0)
+
+
+class JobManager:
+    """
+    Pool de workers borné + table de jobs persistante (SQLite).
+
+    Chaque job a un statut (queued / running / done / failed), l’étape courante
+    et l’avancement de chaque étape. Les jobs interrompus par un redémarrage du
+    process sont marqués en échec au démarrage.
+    """
+
+    def __init__(self, db_path: str = JOBS_DB_PATH, workers: int = JOB_WORKERS,
+                 queue_size: int = JOB_QUEUE_SIZE, stages=INGEST_STAGES):
+        self.db_path = db_path
+        self.stages = tuple(stages)
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db_lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        with self._db_lock, self._connect() as conn:
+            conn.execute(_SCHEMA)
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? "
+                "WHERE status IN ('queued', 'running')",
+                ("Interrompu par un redémarrage du serveur.", time.time())
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # ---------- écriture ----------
+    def _update(self, job_id: str, **fields) -> None:
+        fields["updated_at"] = time.time()
+        columns = ", ".join(f"{k} = ?" for k in fields)
+        with self._db_lock, self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+        with self._changed:
+            self._changed.notify_all()
+
+    def _set_stage(self, job_id: str, name: str, progress: Optional[float]) -> None:
+        job = self.get(job_id)
+        if job is None:
+            return
+        stages = job["stages"]
+        stages[name] = None if progress is None else round(max(0.0, min(1.0, progress)), 3)
+        self._update(job_id, stage=name, stages=json.dumps(stages))
+
+    # ---------- API ----------
+    def submit(self, kind: str, fn: Callable[..., Any], *args, **kwargs) -> str:
+        """
+        Enregistre un job et le confie au pool. `fn(ctx, *args, **kwargs)` reçoit un JobContext ;
+        sa valeur de retour (JSON-sérialisable) est stockée comme résultat.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise JobQueueFull("Trop de traitements en cours, réessayez plus tard.")
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        stages = {name: 0.0 for name in self.stages}
+        with self._db_lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, stage, stages, created_at, updated_at) "
+                "VALUES (?, ?, 'queued', NULL, ?, ?, ?)",
+                (job_id, kind, json.dumps(stages), now, now)
+            )
+        try:
+            self._executor.submit(self._run, job_id, fn, args, kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        logger.info(f"Job {job_id} ({kind}) mis en file")
+        return job_id
+
+    def _run(self, job_id: str, fn: Callable[..., Any], args, kwargs) -> None:
+        start = time.perf_counter()
+        try:
+            self._update(job_id, status="running")
+            result = fn(JobContext(self, job_id), *args, **kwargs)
+            self._update(job_id, status="done", result=json.dumps(result))
+            logger.info(f"Job {job_id} terminé en {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            logger.exception(f"Job {job_id} en échec : {e}")
+            self._update(job_id, status="failed", error=str(e))
+        finally:
+            self._slots.release()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["stages"] = json.loads(job["stages"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def wait_for_update(self, job_id: str, since: float, timeout: float = 15.0) -> Optional[Dict[str, Any]]:
+        """
+        Bloque jusqu’à ce que le job soit modifié après `since` (ou jusqu’au timeout),
+        puis renvoie son état courant. Utilisé par le flux SSE.
+        """
+        deadline = time.time() + timeout
+        job = self.get(job_id)
+        while job is not None and job["updated_at"] <= since:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            with self._changed:
+                self._changed.wait(timeout=min(remaining, 1.0))
+            job = self.get(job_id)
+        return job
+
+
+_MANAGER: Optional[JobManager] = None
+_MANAGER_LOCK = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    global _MANAGER
+    with _MANAGER_LOCK:
+        if _MANAGER is None:
+            _MANAGER = JobManager()
+    return _MANAGER
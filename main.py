@@ -4,6 +4,7 @@ import json
 import os
 import uuid
 import logging
+import numpy as np
 from flask import (
     Flask,
     request,
@@ -12,18 +13,39 @@ from flask import (
     send_from_directory,
     jsonify,
     redirect,
-    url_for
+    url_for,
+    Response,
+    stream_with_context
 )
 from werkzeug.utils import secure_filename
 
-# Vos utilitaires RAG (process_transcript, build_and_get_rag_chain)
-from rag_utils import process_transcript, build_and_get_rag_chain
-
-# Fonction de découpages textuels (chunks) si nécessaire
-# Removed unused import
-# Fonction de segmentation en chapitres
-from chaptering import segment_by_topic
-from model import summarize_chapters_and_global
+# Vos utilitaires RAG (build_and_get_rag_chain)
+from rag_utils import build_and_get_rag_chain
+from rag_chat import stream_rag_answer, answer_questions
+
+# Découpage en chunks + indexation Chroma (étapes du job d’ingestion)
+from chunking import get_text_chunks
+from vectorstore import get_vectorstore, open_vectorstore, collection_name, touch_collection, maybe_gc
+import vectorstore
+from streaming_ingest import stream_ingest, STREAMING_INGEST
+from segment_store import SegmentRecorder, segments_path, load_segment_store
+from transcript_cache import (
+    get_transcript_cache,
+    audio_cache_key,
+    youtube_cache_key,
+    youtube_video_id
+)
+from parallel_transcription import WHISPER_MODEL_SIZE
+import streaming_ingest
+from jobs import get_job_manager, JobQueueFull
+from session_store import SessionStore
+# Segmentation en chapitres, mémorisée par transcript
+from artifacts import get_segmentation, transcript_hash, get_artifact_store, CHAPTER_THRESHOLD, CHAPTER_CHUNK_SIZE
+from model import summarize_chapters_and_global, get_summarizer
+import model
+import embedding
+import http_client
+import answer_cache
 
 
 app = Flask(__name__)
@@ -35,9 +57,12 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 
 # Dossier persistant pour Chroma
-VECTORDIR = os.path.join(os.getcwd(), "data", "vectorstores", "chunks")
+VECTORDIR = os.path.abspath(vectorstore.VECTORSTORE_DIR)
 os.makedirs(VECTORDIR, exist_ok=True)
 
+# Réglages whisper (font partie de la clé du cache de transcriptions)
+WHISPER_BEAM_SIZE = 5
+
 # Logger
 logging.basicConfig(
     level=logging.INFO,
@@ -49,44 +74,264 @@ logger = logging.getLogger("podcast_ai_app")
 # -----------------------------
 #   Stockage d’état par utilisateur
 # -----------------------------
-# On va garder un dictionnaire en mémoire, indexé par session["uid"].
-# _STORED[uid] = {
-#    "raw_text": None or str,
+# États bornés en mémoire, indexés par session["uid"] (voir session_store.py) :
+# LRU, éviction après inactivité et budget mémoire sur les transcripts.
+# sessions.get(uid) = {
+#    "raw_text": None or str (relu depuis le disque après éviction),
+#    "transcript_id": None or str (sha256 du transcript),
 #    "audio_filename": None or str,
+#    "segments_path": None or str (timestamps whisper, voir segment_store.py),
+#    "collection": None or str (collection Chroma du transcript, voir vectorstore.py),
 #    "rag_ready": bool,
-#    "chain": objet RAG,
-#    "retriever": objet RAG,
+#    "chain": objet RAG (reconstruit depuis la collection après éviction),
+#    "retriever": objet RAG (idem),
+#    "job_id": None or str (dernier job d’ingestion),
 # }
-_STORED = {}
+sessions = SessionStore(
+    rebuild_chain=lambda collection: build_and_get_rag_chain(persist_dir=VECTORDIR, collection=collection)
+)
 
 
 def _get_user_state():
     """
-    Retourne le dictionnaire d’état propre à l’utilisateur courant.
+    Retourne l’état propre à l’utilisateur courant (recréé depuis le disque s’il a été évincé).
     Si la session ne contient pas d’UID, on en génère un nouveau.
     """
     if "uid" not in session:
-        uid = str(uuid.uuid4())
-        session["uid"] = uid
-        _STORED[uid] = {
-            "raw_text": None,
-            "audio_filename": None,
-            "rag_ready": False,
-            "chain": None,
-            "retriever": None
-        }
+        session["uid"] = str(uuid.uuid4())
+    return sessions.get(session["uid"])
+
+
+# -----------------------------
+#   Pipeline d’ingestion (exécutée en arrière-plan par jobs.py)
+# -----------------------------
+def _publish_transcript(state, raw_text, audio_filename, segments_file=None):
+    state["raw_text"] = raw_text
+    state["transcript_id"] = transcript_hash(raw_text)
+    state["audio_filename"] = audio_filename
+    state["segments_path"] = segments_file
+
+
+def _save_segments(store, audio_path):
+    # Timestamps rangés à côté de l’audio : chapitres et sources deviennent « seekables »
+    try:
+        path = segments_path(audio_path)
+        store.save(path)
+        return path
+    except Exception as e:
+        logger.error(f"Impossible d’enregistrer les timestamps : {e}")
+        return None
+
+
+def _stream_audio(ctx, state, audio_path, audio_filename, collection):
+    """
+    Variante streaming : les segments whisper sont découpés et indexés au fil du décodage.
+    La pipeline RAG et les vues chapitres sont utilisables dès le premier lot indexé.
+    Retourne (transcript, rapport de mesures, SegmentStore).
+    """
+    from transcription import transcribe_stream
+
+    ctx.stage("transcribe")
+    segments, duration = transcribe_stream(audio_path, beam_size=WHISPER_BEAM_SIZE)
+    recorder = SegmentRecorder()
+    vectordb = open_vectorstore(persist_dir=VECTORDIR, collection=collection)
+
+    def on_ready(partial_text):
+        ctx.stage("chain")
+        chain, retriever = build_and_get_rag_chain(persist_dir=VECTORDIR, collection=collection)
+        _publish_transcript(state, partial_text, audio_filename)
+        state["collection"] = collection
+        state["chain"] = chain
+        state["retriever"] = retriever
+        state["rag_ready"] = True
+        ctx.done("chain")
+
+    def on_text(partial_text):
+        # Un nouveau lot vient d’être indexé : les réponses déjà en cache sont incomplètes
+        answer_cache.get_answer_cache().invalidate(collection)
+        _publish_transcript(state, partial_text, audio_filename)
+
+    def on_progress(stage, fraction):
+        ctx.stage(stage, fraction)
+
+    try:
+        raw_text, report = stream_ingest(recorder.record(segments), duration, vectordb,
+                                         on_ready=on_ready, on_text=on_text, on_progress=on_progress)
+    except Exception as e:
+        logger.error(f"Erreur pendant l’ingestion streaming : {e}")
+        raise RuntimeError("Échec de la transcription ou de l’indexation de l’audio.") from e
+
+    if not raw_text.strip():
+        raise RuntimeError("Échec de l’ingestion/transcription : texte vide.")
+    for name in ("transcribe", "chunk", "index", "chain"):
+        ctx.done(name)
+    store = recorder.build()
+    _publish_transcript(state, raw_text, audio_filename, _save_segments(store, audio_path))
+    return raw_text, report, store
+
+
+def _ingest_job(ctx, state, source_type, payload):
+    """
+    Télécharge / transcrit / découpe / indexe puis construit la pipeline RAG,
+    en publiant l’avancement de chaque étape. Met à jour `state` à la fin.
+    Les transcriptions déjà faites (même audio ou même vidéo YouTube) sont
+    servies par le cache : ni téléchargement ni transcription dans ce cas.
+    """
+    audio_filename = None
+    audio_path = None
+    raw_text = ""
+    cache = get_transcript_cache()
+    cache_keys = []
+    cached = None
+
+    # --- Ingestion YouTube --- #
+    if source_type == "youtube":
+        from transcription import download_audio_from_youtube
+        video_id = youtube_video_id(payload)
+        if video_id:
+            cache_keys.append(youtube_cache_key(video_id, WHISPER_MODEL_SIZE, WHISPER_BEAM_SIZE))
+            cached = cache.get(cache_keys[-1])
+
+        if cached is not None:
+            ctx.skip("download")
+        else:
+            try:
+                ctx.stage("download")
+                logger.info(f"Ingestion depuis YouTube : {payload}")
+                # 1) Download the audio to a temporary path (e.g. /tmp/xyz.wav)
+                wav_path = download_audio_from_youtube(payload)
+                audio_filename = os.path.basename(wav_path)
+
+                # 2) Move it into UPLOAD_FOLDER so send_from_directory can find it
+                audio_path = os.path.join(app.config["UPLOAD_FOLDER"], audio_filename)
+                os.replace(wav_path, audio_path)
+                ctx.done("download")
+            except Exception as e:
+                logger.error(f"Erreur ingestion YouTube : {e}")
+                raise RuntimeError("Échec de la récupération de l’audio YouTube.") from e
+            cache_keys.append(audio_cache_key(audio_path, WHISPER_MODEL_SIZE, WHISPER_BEAM_SIZE))
+            cached = cache.get(cache_keys[-1])
+
+    # --- Ingestion fichier audio local (déjà enregistré dans UPLOAD_FOLDER) --- #
+    elif source_type == "audio_file":
+        ctx.skip("download")
+        audio_filename = payload
+        audio_path = os.path.join(app.config["UPLOAD_FOLDER"], payload)
+        cache_keys.append(audio_cache_key(audio_path, WHISPER_MODEL_SIZE, WHISPER_BEAM_SIZE))
+        cached = cache.get(cache_keys[-1])
+
+    # --- Ingestion fichier texte (.txt, déjà lu par la requête) --- #
+    else:
+        ctx.skip("download")
+        ctx.skip("transcribe")
+        raw_text = payload
+
+    report = None
+    segments_file = None
+    collection = None
+    if cached is not None:
+        # Transcription déjà connue : on saute la transcription
+        ctx.skip("transcribe")
+        raw_text = cached["text"]
+        segments_file = cached["segments_path"]
+        collection = cached.get("collection")
+        if audio_filename is None and cached.get("audio_filename"):
+            if os.path.exists(os.path.join(app.config["UPLOAD_FOLDER"], cached["audio_filename"])):
+                audio_filename = cached["audio_filename"]
+        audio_path = None
+
+    # Une collection Chroma par contenu : clé de l’audio (connue avant la transcription) ou du texte
+    if collection is None and audio_path:
+        collection = collection_name(cache_keys[-1])
+
+    if audio_path and STREAMING_INGEST:
+        raw_text, report, store = _stream_audio(ctx, state, audio_path, audio_filename, collection)
+        for key in cache_keys:
+            cache.put(key, raw_text, store, audio_filename=audio_filename, collection=collection)
     else:
-        uid = session["uid"]
-        if uid not in _STORED:
-            # Si on avait perdu l’état côté serveur, on le recrée
-            _STORED[uid] = {
-                "raw_text": None,
-                "audio_filename": None,
-                "rag_ready": False,
-                "chain": None,
-                "retriever": None
-            }
-    return _STORED[session["uid"]]
+        if audio_path:
+            from transcription import transcribe_file_with_segments
+            try:
+                ctx.stage("transcribe")
+                raw_text, store = transcribe_file_with_segments(audio_path, beam_size=WHISPER_BEAM_SIZE)
+                ctx.done("transcribe")
+                segments_file = _save_segments(store, audio_path)
+            except Exception as e:
+                logger.error(f"Erreur transcription audio : {e}")
+                raise RuntimeError("Échec de la transcription du fichier audio.") from e
+            for key in cache_keys:
+                cache.put(key, raw_text, store, audio_filename=audio_filename, collection=collection)
+
+        if not raw_text.strip():
+            raise RuntimeError("Échec de l’ingestion/transcription : texte vide.")
+        if collection is None:
+            collection = collection_name(transcript_hash(raw_text))
+
+        # Pre-traitement : chunking + indexation Chroma
+        try:
+            ctx.stage("chunk")
+            chunks = get_text_chunks(raw_text)
+            ctx.done("chunk")
+
+            ctx.stage("index")
+            get_vectorstore(chunks, persist_dir=VECTORDIR, collection=collection)
+            ctx.done("index")
+        except Exception as e:
+            logger.error(f"Erreur pendant le prétraitement : {e}")
+            raise RuntimeError("Échec du prétraitement (chunking/indexation).") from e
+
+        # Construire la pipeline RAG (chain + retriever)
+        try:
+            ctx.stage("chain")
+            chain, retriever = build_and_get_rag_chain(persist_dir=VECTORDIR, collection=collection)
+            ctx.done("chain")
+        except Exception as e:
+            logger.error(f"Erreur build_and_get_rag_chain : {e}")
+            raise RuntimeError("Échec de la construction de la pipeline RAG.") from e
+
+        # Stocker l’état utilisateur
+        _publish_transcript(state, raw_text, audio_filename, segments_file)
+        state["collection"] = collection
+        state["chain"] = chain
+        state["retriever"] = retriever
+        state["rag_ready"] = True
+
+    # Indexation terminée : aucune réponse produite sur un index partiel (ou ancien) n’est resservie
+    answer_cache.get_answer_cache().invalidate(collection)
+
+    # Segmentation du transcript complet, réutilisée par tous les onglets
+    try:
+        get_segmentation(raw_text)
+    except Exception as e:
+        logger.error(f"Erreur pendant la segmentation : {e}")
+
+    # Suppression des collections inutilisées depuis longtemps (au plus une fois par heure)
+    try:
+        # Les sessions (en mémoire ou persistées) reconstruisent leur chaîne depuis leur collection
+        maybe_gc(VECTORDIR, keep={collection, *sessions.collections()})
+    except Exception as e:
+        logger.error(f"Erreur pendant le GC des collections : {e}")
+
+    logger.info("Pipeline RAG initialisée avec succès.")
+    return {
+        "transcript_id": state["transcript_id"],
+        "audio_filename": audio_filename,
+        "transcript_cache_hit": cached is not None,
+        "streaming": report
+    }
+
+
+
+def _pinned_ingest_job(ctx, state, source_type, payload):
+    """_ingest_job, puis désépinglage et persistance de la session (même en cas d’échec)."""
+    try:
+        return _ingest_job(ctx, state, source_type, payload)
+    finally:
+        sessions.release(state)
+
+def _wants_json():
+    best = request.accept_mimetypes.best_match(["application/json", "text/html"])
+    return best == "application/json" or request.headers.get("X-Requested-With") == "XMLHttpRequest"
 
 
 # -----------------------------
@@ -95,23 +340,18 @@ def _get_user_state():
 @app.route("/", methods=["GET", "POST"])
 def index():
     """
-    GET  : affiche la page d’accueil (formulaire d’import + onglets + lecteur audio).  
-    POST : traite l’import (YouTube / audio local / texte), transcrit, 
-           stocke raw_text et audio_filename dans l’état, 
-           construit l’index Chroma + pipeline RAG (chain + retriever).
+    GET  : affiche la page d’accueil (formulaire d’import + onglets + lecteur audio),
+           ainsi que l’avancement du job d’ingestion en cours.
+    POST : valide l’import (YouTube / audio local / texte) puis lance un job
+           d’ingestion en arrière-plan (download / transcribe / chunk / index / chain).
+           Répond immédiatement : redirection, ou 202 + job_id si le client demande du JSON.
     """
     state = _get_user_state()
     error = None
 
-    # Lecture de l’état pour le template
-    raw_text = state["raw_text"]
-    audio_filename = state["audio_filename"]
-    # Removed unused variable
-
     if request.method == "POST":
         source_type = request.form.get("source_type", "")
-        raw_text = ""
-        audio_filename = None
+        payload = None
 
         # --- Ingestion YouTube --- #
         if source_type == "youtube":
@@ -119,28 +359,7 @@ def index():
             if not yt_url.startswith(("http://", "https://")):
                 error = "URL YouTube invalide."
             else:
-                try:
-                    logger.info(f"Ingestion depuis YouTube : {yt_url}")
-                    from transcription import download_audio_from_youtube, transcribe_file
-
-                    # 1) Download the audio to a temporary path (e.g. /tmp/xyz.wav)
-                    wav_path = download_audio_from_youtube(yt_url)
-                    basename = os.path.basename(wav_path)
-
-                    # 2) Move it into UPLOAD_FOLDER so send_from_directory can find it
-                    new_path = os.path.join(app.config["UPLOAD_FOLDER"], basename)
-                    os.replace(wav_path, new_path)
-                    # (If you prefer to copy instead of move, you could use `shutil.copy(wav_path, new_path)`)
-
-                    # 3) Transcribe the file now located at new_path
-                    raw_text = transcribe_file(new_path, beam_size=5)
-
-                    # 4) Remember only the filename (Flask will serve /uploads/<audio_filename>)
-                    audio_filename = basename
-
-                except Exception as e:
-                    logger.error(f"Erreur ingestion YouTube : {e}")
-                    error = "Échec de la récupération ou de la transcription de l’audio YouTube."
+                payload = yt_url
 
         # --- Ingestion fichier audio local --- #
         elif source_type == "audio_file":
@@ -153,13 +372,10 @@ def index():
                     filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
                     audio_file.save(filepath)
                     logger.info(f"Ingestion depuis fichier audio local : {filepath}")
-
-                    from transcription import transcribe_file
-                    raw_text = transcribe_file(filepath, beam_size=5)
-                    audio_filename = filename
+                    payload = filename
                 except Exception as e:
-                    logger.error(f"Erreur transcription audio local : {e}")
-                    error = "Échec de la transcription du fichier audio."
+                    logger.error(f"Impossible d’enregistrer le fichier audio : {e}")
+                    error = "Échec de l’enregistrement du fichier audio."
 
         # --- Ingestion fichier texte (.txt) --- #
         elif source_type == "text_file":
@@ -173,56 +389,99 @@ def index():
                     txt_file.save(txt_path)
                     logger.info(f"Ingestion depuis fichier texte local : {txt_path}")
                     with open(txt_path, "r", encoding="utf-8") as f:
-                        raw_text = f.read()
-                    # No audio file to play in this branch
-                    audio_filename = None
+                        payload = f.read()
                 except Exception as e:
                     logger.error(f"Impossible de lire le fichier texte : {e}")
                     error = "Erreur lors de la lecture du fichier texte."
 
-
         else:
             error = "Type de source inconnu."
 
-        # --- Si pas d’erreur, on stocke raw_text / audio_filename puis on build la pipeline RAG --- #
+        # --- Si pas d’erreur, on lance le job d’ingestion --- #
+        job_id = None
         if not error:
-            if not raw_text.strip():
-                error = "Échec de l’ingestion/transcription : texte vide."
-            else:
-                # Stocker l’état utilisateur
-                state["raw_text"] = raw_text
-                state["audio_filename"] = audio_filename
-
-                # Pre-traitement : chunking + indexation Chroma
-                try:
-                    process_transcript(raw_text, persist_dir=VECTORDIR)
-                except Exception as e:
-                    logger.error(f"Erreur pendant process_transcript : {e}")
-                    error = "Échec du prétraitement (chunking/indexation)."
-
-                # Construire la pipeline RAG (chain + retriever)
-                if not error:
-                    try:
-                        chain, retriever = build_and_get_rag_chain(persist_dir=VECTORDIR)
-                        state["chain"] = chain
-                        state["retriever"] = retriever
-                        state["rag_ready"] = True
-                        # Removed unused variable
-                        logger.info("Pipeline RAG initialisée avec succès.")
-                    except Exception as e:
-                        logger.error(f"Erreur build_and_get_rag_chain : {e}")
-                        error = "Échec de la construction de la pipeline RAG."
-
-        # Après le POST, on redirige en GET pour afficher le formulaire + données
+            try:
+                # La session reste épinglée (non évictable) jusqu’à la fin du job
+                sessions.pin(state)
+                job_id = get_job_manager().submit("ingest", _pinned_ingest_job, state, source_type, payload)
+                state["job_id"] = job_id
+            except JobQueueFull as e:
+                sessions.release(state)
+                error = str(e)
+
+        if _wants_json():
+            if error:
+                return jsonify({"error": error}), 400
+            return jsonify({
+                "job_id": job_id,
+                "status_url": url_for("get_job", job_id=job_id),
+                "events_url": url_for("job_events", job_id=job_id)
+            }), 202
+
+        # Après le POST, on redirige en GET pour afficher le formulaire + l’avancement
+        state["error"] = error
         return redirect(url_for("index"))
 
-    # En GET, on passe le state au template
+    # En GET, on passe le state (et le job en cours éventuel) au template
+    error = state.pop("error", None)
+    active_job_id = None
+    if state.get("job_id"):
+        job = get_job_manager().get(state["job_id"])
+        if job is not None and job["status"] in ("queued", "running"):
+            active_job_id = job["id"]
+        elif job is not None and job["status"] == "failed":
+            error = error or job["error"]
+            state["job_id"] = None
+
     return render_template(
         "index2.html",  # <--- votre template
         raw_text=state["raw_text"],
         audio_filename=state["audio_filename"],
         error=error,
-        rag_ready=state["rag_ready"]
+        rag_ready=state["rag_ready"],
+        job_id=active_job_id
+    )
+
+
+# -----------------------------
+#   GET /jobs/<job_id>  et  GET /jobs/<job_id>/events (SSE)
+# -----------------------------
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({ "error": "Job introuvable." }), 404
+    return jsonify(job), 200
+
+
+@app.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """
+    Flux Server-Sent Events : un message JSON à chaque changement d’étape,
+    fermé quand le job est terminé (done / failed).
+    """
+    manager = get_job_manager()
+    if manager.get(job_id) is None:
+        return jsonify({ "error": "Job introuvable." }), 404
+
+    def stream():
+        since = 0.0
+        while True:
+            job = manager.wait_for_update(job_id, since)
+            if job is None:
+                break
+            if job["updated_at"] > since:
+                since = job["updated_at"]
+                yield f"data: {json.dumps(job, ensure_ascii=False)}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+            if job["status"] in ("done", "failed"):
+                break
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
@@ -234,6 +493,52 @@ def uploaded_file(filename):
     return send_from_directory(app.config["UPLOAD_FOLDER"], filename)
 
 
+# -----------------------------
+#   Artefacts par transcript (chapitres, titres, résumés), voir artifacts.py
+# -----------------------------
+def _transcript_id(state, raw_text):
+    return state["transcript_id"] or transcript_hash(raw_text)
+
+
+def _chapters_artifact(state, raw_text):
+    """
+    {"chapters": [...], "titles": [...]} du transcript : calculé au premier appel,
+    puis relu depuis le store (mémoire, sinon disque).
+    """
+    store = get_artifact_store()
+    transcript_id = _transcript_id(state, raw_text)
+    params = {"threshold": CHAPTER_THRESHOLD, "chunk_size": CHAPTER_CHUNK_SIZE}
+    data = store.get(transcript_id, "chapters")
+    if data is None or data.get("params") != params:
+        chapters_list = get_segmentation(raw_text)
+        data = {
+            "chapters": chapters_list,
+            "titles": ["Chapter " + str(i + 1) for i in range(len(chapters_list))],
+            "params": params
+        }
+        store.put(transcript_id, "chapters", data)
+    return data
+
+
+def _summaries_artifact(state, raw_text):
+    """
+    {"chapter_summaries": [...], "global_summary": str} du transcript, résumé une seule fois
+    par modèle puis relu depuis le store. None s’il n’y a aucun chapitre.
+    """
+    store = get_artifact_store()
+    transcript_id = _transcript_id(state, raw_text)
+    model_path = os.getenv("MODEL_PATH")
+    data = store.get(transcript_id, "summaries")
+    if data is None or data.get("model_path") != model_path:
+        chapters_list = _chapters_artifact(state, raw_text)["chapters"]
+        if not chapters_list:
+            return None
+        output = summarize_chapters_and_global(chapters_list, model_path=model_path, output_path=None)
+        data = dict(output, model_path=model_path)
+        store.put(transcript_id, "summaries", data)
+    return data
+
+
 # -----------------------------
 #   GET /get_chapters
 # -----------------------------
@@ -246,22 +551,19 @@ def get_chapters():
         # Pas d’erreur, mais liste vide si aucune transcription
         return jsonify({ "chapters": [] }), 200
 
-    # Segmente en chapitres
-    chapters_list = segment_by_topic(raw_text, threshold=0.25)
-    # create title list
-    titles  = ["Chapter "+str(i+1) for i in range(len(chapters_list))]
-    # save titles to titles.json
-    with open("data/titles.json", "w", encoding="utf-8") as f:
-        json.dump({"titles": titles}, f, ensure_ascii=False, indent=4)
+    # Segmente en chapitres (une fois par transcript)
+    artifact = _chapters_artifact(state, raw_text)
+    chapters_list = artifact["chapters"]
+    titles = artifact["titles"]
 
-    # save chapters_list to chapters.json
-    with open("data/chapters.json", "w", encoding="utf-8") as f:
-        json.dump({"chapters": chapters_list}, f, ensure_ascii=False, indent=4)
+    # Timestamps de début de chapitre (si l’audio a été transcrit ici)
+    store = load_segment_store(state.get("segments_path"))
+    starts = store.locate_sequence(chapters_list) if store else [None] * len(chapters_list)
 
     json_chapters = []
     for idx, chap_text in enumerate(chapters_list):
         title = titles[idx]
-        json_chapters.append({ "index": idx, "title": title })
+        json_chapters.append({ "index": idx, "title": title, "start": starts[idx] })
 
     return jsonify({ "chapters": json_chapters }), 200
 
@@ -275,15 +577,12 @@ def get_summaries():
     if not raw_text:
         return jsonify({ "error": "Aucune transcription en mémoire." }), 400
 
-    chapters_list = segment_by_topic(raw_text, threshold=0.25)
-    if not chapters_list:
+    artifact = _summaries_artifact(state, raw_text)
+    if artifact is None:
         return jsonify({ "error": "Aucun chapitre à résumer." }), 400
 
-    summaries = summarize_chapters_and_global(chapters_list, model_path=os.getenv("MODEL_PATH"),
-                                        output_path="data/summaries.json")["chapter_summaries"]
-    # get titles from data/titles
-    with open("data/titles.json", "r") as f:
-        title_list = json.load(f)["titles"]
+    summaries = artifact["chapter_summaries"]
+    title_list = _chapters_artifact(state, raw_text)["titles"]
     json_summaries = []
     for idx, summary in enumerate(summaries):
         json_summaries.append({
@@ -305,9 +604,7 @@ def get_chapter_content(index):
     if not raw_text:
         return jsonify({ "error": "Aucune transcription en mémoire." }), 400
 
-    # get chapters from data/chapters.json
-    with open("data/chapters.json", "r") as f:
-        chapters_list = json.load(f)["chapters"]
+    chapters_list = _chapters_artifact(state, raw_text)["chapters"]
     if index < 0 or index >= len(chapters_list):
         return jsonify({ "error": "Index de chapitre invalide." }), 400
 
@@ -325,10 +622,11 @@ def get_summary_content(index):
     if not raw_text:
         return jsonify({ "error": "Aucune transcription en mémoire." }), 400
 
-    # get summaries from data/summaries.json
-    with open("data/summaries.json", "r") as f:
-        summaries_list = json.load(f)["chapter_summaries"]
-    
+    # Résumés calculés par /get_summaries ou /get_global_summary
+    artifact = get_artifact_store().get(_transcript_id(state, raw_text), "summaries")
+    if artifact is None:
+        return jsonify({ "error": "Résumés non encore calculés." }), 400
+    summaries_list = artifact["chapter_summaries"]
 
     if index < 0 or index >= len(summaries_list):
         return jsonify({ "error": "Index de résumé invalide." }), 400
@@ -349,19 +647,29 @@ def get_global_summary():
     if not raw_text:
         return jsonify({ "error": "Aucune transcription en mémoire." }), 400
     
-    chapters_list = segment_by_topic(raw_text, threshold=0.25)
-    if not chapters_list:
+    artifact = _summaries_artifact(state, raw_text)
+    if artifact is None:
         return jsonify({ "error": "Aucun chapitre à résumer." }), 400
 
-    global_summary = summarize_chapters_and_global(chapters_list,
-                                                   model_path=os.getenv("MODEL_PATH"),
-                                                   output_path="data/summaries.json")["global_summary"]
+    global_summary = artifact["global_summary"]
     return jsonify({ "global_summary": global_summary }), 200
 
 
 # -----------------------------
 #   POST /rag_chat
 # -----------------------------
+def _format_sources(state, docs):
+    # Extraits des sources + leur timestamp dans l’audio (si les segments whisper sont connus)
+    store = load_segment_store(state.get("segments_path"))
+    sources = []
+    source_times = []
+    for doc in docs:
+        snippet = doc.page_content.replace("\n", " ").strip()
+        sources.append(snippet[:200] + "…")
+        source_times.append(store.locate(doc.page_content) if store else None)
+    return sources, source_times
+
+
 @app.route("/rag_chat", methods=["POST"])
 def rag_chat():
     state = _get_user_state()
@@ -379,83 +687,205 @@ def rag_chat():
         return jsonify({ "error": "Pipeline introuvable (chain/retriever)." }), 500
 
     logger.info(f"Requête RAG reçue : {question}")
+    touch_collection(state.get("collection"), VECTORDIR)
 
-    docs = retriever.get_relevant_documents(question)
-    answer = chain.invoke({ "question": question })
+    # Recherche + génération en un seul passage (la query n’est embeddée et cherchée qu’une fois)
+    result = chain.invoke({ "question": question })
+    docs = result["docs"]
+    answer = result["answer"]
 
-    sources = []
-    for doc in docs:
-        snippet = doc.page_content.replace("\n", " ").strip()
-        sources.append(snippet[:200] + "…")
+    sources, source_times = _format_sources(state, docs)
 
     return jsonify({
         "answer": answer,
-        "sources": sources
+        "sources": sources,
+        "source_times": source_times,
+        "timings": result["timings"],
+        "cached": result["cached"]
     }), 200
 
-import recommandation
-from build_podcast_vectorstore import build_podcast_chroma_index
+
+# -----------------------------
+#   POST /rag_chat/batch
+# -----------------------------
+RAG_BATCH_MAX_QUESTIONS = int(os.getenv("RAG_BATCH_MAX_QUESTIONS", "16"))
+
+
+@app.route("/rag_chat/batch", methods=["POST"])
+def rag_chat_batch():
+    """
+    Plusieurs questions en un appel : {"questions": [...]} → {"results": [...], "timings": {...}}.
+    Embeddings des questions en un forward, recherche en une opération matricielle,
+    appels LLM concurrents (LLM_MAX_CONCURRENCY).
+    """
+    state = _get_user_state()
+    if not state["rag_ready"]:
+        return jsonify({ "error": "Pipeline RAG non initialisée." }), 400
+
+    data = request.get_json(silent=True) or {}
+    questions = [q.strip() for q in data.get("questions", []) if isinstance(q, str) and q.strip()]
+    if not questions:
+        return jsonify({ "error": "Aucune question fournie." }), 400
+    if len(questions) > RAG_BATCH_MAX_QUESTIONS:
+        return jsonify({ "error": f"Au plus {RAG_BATCH_MAX_QUESTIONS} questions par lot." }), 400
+
+    retriever = state["retriever"]
+    if retriever is None:
+        return jsonify({ "error": "Pipeline introuvable (chain/retriever)." }), 500
+
+    logger.info(f"Lot RAG reçu : {len(questions)} questions")
+    touch_collection(state.get("collection"), VECTORDIR)
+
+    batch = answer_questions(retriever, questions, scope=state.get("collection"))
+    results = []
+    for item in batch["results"]:
+        sources, source_times = _format_sources(state, item["docs"])
+        results.append({
+            "question": item["question"],
+            "answer": item["answer"],
+            "error": item["error"],
+            "cached": item["cached"],
+            "sources": sources,
+            "source_times": source_times
+        })
+    return jsonify({ "results": results, "timings": batch["timings"] }), 200
+
+
+# -----------------------------
+#   GET|POST /rag_chat/stream
+# -----------------------------
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@app.route("/rag_chat/stream", methods=["GET", "POST"])
+def rag_chat_stream():
+    """
+    Version streaming de /rag_chat (Server-Sent Events). La question est passée en
+    paramètre `question` (GET, pour EventSource) ou en JSON (POST). Événements :
+      - sources : {"sources", "source_times"} dès la fin de la recherche
+      - token   : {"text"} pour chaque fragment de la réponse
+      - done    : {"answer", "timings"} (dont llm_first_token)
+      - error   : {"error"}
+    """
+    state = _get_user_state()
+    if not state["rag_ready"]:
+        return jsonify({ "error": "Pipeline RAG non initialisée." }), 400
+
+    if request.method == "POST":
+        question = (request.get_json(silent=True) or {}).get("question", "").strip()
+    else:
+        question = request.args.get("question", "").strip()
+    if not question:
+        return jsonify({ "error": "Aucune question fournie." }), 400
+
+    chain = state["chain"]
+    if chain is None:
+        return jsonify({ "error": "Pipeline introuvable (chain/retriever)." }), 500
+
+    logger.info(f"Requête RAG (streaming) reçue : {question}")
+    touch_collection(state.get("collection"), VECTORDIR)
+
+    def stream():
+        try:
+            for event in stream_rag_answer(chain, question):
+                if "docs" in event:
+                    sources, source_times = _format_sources(state, event["docs"])
+                    yield _sse("sources", {"sources": sources, "source_times": source_times})
+                elif "token" in event:
+                    yield _sse("token", {"text": event["token"]})
+                else:
+                    yield _sse("done", event)
+        except Exception as e:
+            logger.error(f"Erreur pendant la réponse RAG en streaming : {e}")
+            yield _sse("error", {"error": "Erreur pendant la génération de la réponse."})
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+from build_podcast_vectorstore import build_podcast_index
+import recommendation_index
+from ann_index import ANN_NPROBE
 @app.route("/build_index_podcasts", methods=["GET"])
 def build_index_podcasts():
     """
-    Cette route appelle directement la fonction `build_podcast_chroma_index`
-    qui se trouve dans `recommandation.py`. Elle reconstruit l’index Chroma
-    des épisodes de podcast stockés dans './podcast_dataset/podcast_epds_dataset.json'.
+    Construit l’index de recommandation des épisodes stockés dans
+    './podcast_dataset/podcast_epds_dataset.json' (voir recommendation_index.py) :
+    lecture en flux, seuls les épisodes nouveaux ou modifiés sont ré-encodés, les épisodes
+    retirés du catalogue sont supprimés, puis l’index est rechargé. Répond avec le rapport d’ingestion.
     """
     try:
-        # Appel à votre fonction pré-existante
-        build_podcast_chroma_index(persist_dir="data/vectorstores/podcast_eps")
-        return jsonify({"status": "Index Chroma des podcasts reconstruit avec succès."}), 200
+        report = build_podcast_index()
+        return jsonify({"status": "Index des podcasts reconstruit avec succès.", **report}), 200
 
     except Exception as e:
-        logger.error(f"Erreur lors de build_podcast_chroma_index : {e}")
+        logger.error(f"Erreur lors de build_podcast_index : {e}")
         return jsonify({"error": f"Échec de la construction de l’index : {str(e)}"}), 500
 
+def _recommendation_params(args):
+    """
+    Paramètres de /get_recommendations. Lève ValueError si un paramètre est invalide.
+      top_k, nprobe            : nombre de résultats, listes IVF visitées (index ANN)
+      podcast, language        : filtres par valeur exacte (répétables : ?podcast=A&podcast=B)
+      after, before            : intervalle de publication (AAAA-MM-JJ)
+      mmr                      : poids de la pertinence dans le MMR (1 = pas de diversification)
+      per_podcast              : épisodes max par podcast (0 = sans limite ; ignoré avec le filtre podcast)
+    """
+    params = {
+        "k": int(args.get("top_k", recommendation_index.RECO_TOP_K)),
+        # Listes IVF visitées (index ANN uniquement) : plus grand = meilleur rappel, plus lent
+        "nprobe": int(args.get("nprobe", ANN_NPROBE)),
+        "mmr_lambda": float(args.get("mmr", recommendation_index.RECO_MMR_LAMBDA)),
+        "per_podcast": int(args.get("per_podcast", recommendation_index.RECO_PER_PODCAST))
+    }
+    if not 1 <= params["k"] <= recommendation_index.RECO_MAX_TOP_K:
+        raise ValueError(f"top_k doit être entre 1 et {recommendation_index.RECO_MAX_TOP_K}")
+    if params["nprobe"] < 1 or params["per_podcast"] < 0 or not 0.0 <= params["mmr_lambda"] <= 1.0:
+        raise ValueError("nprobe ≥ 1, per_podcast ≥ 0, mmr entre 0 et 1")
+    filters = {
+        "podcast_title": args.getlist("podcast"),
+        "language": args.getlist("language"),
+        "published_after": args.get("after"),
+        "published_before": args.get("before")
+    }
+    for key in ("published_after", "published_before"):
+        if filters[key] and np.isnat(recommendation_index.parse_day(filters[key])):
+            raise ValueError(f"date invalide : {filters[key]} (format AAAA-MM-JJ)")
+    params["filters"] = {key: value for key, value in filters.items() if value}
+    return params
+
+
 @app.route("/get_recommendations", methods=["GET"])
 def get_recommendations():
     """
-    Cette route appelle directement la fonction `run_recommendation_from_summary_chroma`
-    qui se trouve dans `recommandation.py`. Elle renvoie en JSON la liste des recommandations.
-
-    ATTENTION :
-      - run_recommendation_from_summary_chroma affiche par défaut les résultats au format console.
-      - Pour la retourner en JSON, on adapte un peu son appel en interceptant la liste qu'elle génère.
+    Recommande des épisodes proches du résumé global du transcript de l’utilisateur :
+    un embedding du résumé puis un top-k sur la matrice du catalogue, chargée une fois par process.
+    Filtres de métadonnées, diversification MMR et plafond par podcast : voir _recommendation_params.
     """
+    from recommandation import load_global_summary
+
+    try:
+        params = _recommendation_params(request.args)
+    except ValueError as e:
+        return jsonify({"error": f"Paramètre invalide : {e}"}), 400
 
     try:
-        # run_recommendation_from_summary_chroma attend par défaut top_k=5 et persiste dans "data/vectorstores/podcast_eps"
-        # Mais pour récupérer ses recommandations au lieu de juste les afficher, on modifie légèrement son code
-        # pour qu'il renvoie la liste. On crée un wrapper temporaire ici.
-
-        # On duplique l'essentiel de run_recommendation_from_summary_chroma pour récupérer la liste :
-        from recommandation import load_global_summary
-        from langchain.vectorstores import Chroma
-        from langchain.embeddings import HuggingFaceEmbeddings
-
-        # 1) Charger le résumé global
-        global_summary = load_global_summary(filepath="data/summaries.json")
-
-        # 2) Préparer l’embedder + recharger l’index Chroma (persisté précédemment)
-        embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-        persist_dir = "data/vectorstores/podcast_eps"
-        vectorstore = Chroma(persist_directory=persist_dir, embedding_function=embedding_model)
-
-        # 3) Lancer la recherche de similarité (on prend top_k=5)
-        top_k = 5
-        results = vectorstore.similarity_search_with_relevance_scores(global_summary, k=top_k)
-
-        # 4) Construire la liste de recommandations sous forme de dict
-        recommendations = []
-        for rank, (doc, score) in enumerate(results, start=1):
-            meta = doc.metadata or {}
-            recommendations.append({
-                "rank": rank,
-                "podcast_title": meta.get("podcast_title", "Unknown"),
-                "episode_title": meta.get("episode_title", "Unknown"),
-                "description": doc.page_content,
-                "episode_link": meta.get("episode_link", "N/A"),
-                "score": float(score)
-            })
+        # 1) Charger le résumé global du transcript de l’utilisateur
+        state = _get_user_state()
+        if not state["transcript_id"]:
+            return jsonify({"error": "Aucune transcription en mémoire."}), 400
+        try:
+            global_summary = load_global_summary(transcript_id=state["transcript_id"])
+        except FileNotFoundError:
+            # Prérequis non rempli (résumés jamais générés) : pas une erreur serveur
+            return jsonify({"error": "Aucun résumé pour cette transcription : "
+                                     "générez d’abord les résumés (/get_summaries)."}), 409
+
+        # 2) Top-k sur l’index du catalogue
+        recommendations = recommendation_index.recommend(global_summary, **params)
 
         return jsonify({"recommendations": recommendations}), 200
 
@@ -467,10 +897,43 @@ def get_recommendations():
         logger.error(f"Erreur lors de la récupération des recommandations : {e}")
         return jsonify({"error": f"Échec des recommandations : {str(e)}"}), 500
 
+# -----------------------------
+#   GET /metrics
+# -----------------------------
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Expose les compteurs internes (chargements de modèles, etc.) en JSON.
+    """
+    return jsonify({
+        "embedding": embedding.get_stats(),
+        "summarizer": model.get_stats(),
+        "streaming_ingest": streaming_ingest.get_stats(),
+        "transcript_cache": get_transcript_cache().stats(),
+        "vectorstore": vectorstore.get_stats(VECTORDIR),
+        "llm_http": http_client.get_stats(),
+        "answer_cache": answer_cache.get_stats(),
+        "sessions": sessions.stats(),
+        "artifacts": get_artifact_store().stats(),
+        "recommendations": recommendation_index.get_stats()
+    }), 200
+
+
 # -----------------------------
 #   Lancement de l’application
 # -----------------------------
 if __name__ == "__main__":
     
     os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
+    # Pré-charger l’embedder partagé pour que la première requête ne paie pas le chargement
+    if os.getenv("EMBEDDING_WARMUP", "1") != "0":
+        embedding.warmup_embedder()
+    # Idem pour le modèle de résumé fine-tuné (résident pour toute la durée du process)
+    if os.getenv("MODEL_PATH") and os.getenv("SUMMARY_WARMUP", "1") != "0":
+        get_summarizer(os.getenv("MODEL_PATH")).warmup()
+    # Index de recommandation chargé une fois (s’il a déjà été construit)
+    try:
+        recommendation_index.get_recommendation_index()
+    except FileNotFoundError:
+        logger.info("Index de recommandation absent : appeler /build_index_podcasts pour le construire.")
     app.run(debug=True)
@@ -1,70 +1,267 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
 import torch
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
-from pathlib import Path
 import json
 
-def summarize_chapters_and_global(chapters, model_path, output_path="summaries.json"):
-    # Charger le modèle fine-tuné
-    tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
-    model = AutoModelForSeq2SeqLM.from_pretrained(model_path, local_files_only=True)
-
-    model = model.to("cuda" if torch.cuda.is_available() else "cpu")
-
-    summaries = []
-
-    # Résumé par chapitre
-    for chapter in chapters:
-        inputs = tokenizer(
-            chapter,
-            return_tensors="pt",
-            truncation=True,
-            max_length=512,
-            padding="longest"
-        ).to(model.device)
-
-        summary_ids = model.generate(
-            **inputs,
-            max_new_tokens=150,
-            num_beams=4,
-            no_repeat_ngram_size=3,
-            repetition_penalty=2.5,
-            length_penalty=1.0,
-            early_stopping=True
-        )
-
-        summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
-        summaries.append(summary.strip())
-
-    # Résumé global à partir de tous les chapitres concaténés
-    full_text = " ".join(chapters)
-    inputs = tokenizer(
-        full_text,
-        return_tensors="pt",
+logger = logging.getLogger(__name__)
+
+# Budget de tokens (longueur paddée × nombre de chapitres) par appel à `generate`
+SUMMARY_BATCH_TOKENS = int(os.getenv("SUMMARY_BATCH_TOKENS", "4096"))
+# Quantification dynamique int8 des couches Linear (CPU uniquement)
+SUMMARY_QUANTIZE = os.getenv("SUMMARY_QUANTIZE", "0") == "1"
+# "hierarchical" : résumé global construit à partir des résumés de chapitres (map-reduce)
+# "truncate"     : ancien comportement, chapitres concaténés puis tronqués à 1024 tokens
+GLOBAL_SUMMARY_MODE = os.getenv("GLOBAL_SUMMARY_MODE", "hierarchical")
+# Nombre de latences conservées pour les métriques
+LATENCY_WINDOW = 200
+
+CHAPTER_MAX_INPUT_TOKENS = 512
+CHAPTER_GENERATION_KWARGS = dict(
+    max_new_tokens=150,
+    num_beams=4,
+    no_repeat_ngram_size=3,
+    repetition_penalty=2.5,
+    length_penalty=1.0,
+    early_stopping=True
+)
+
+GLOBAL_MAX_INPUT_TOKENS = 1024
+GLOBAL_GENERATION_KWARGS = dict(CHAPTER_GENERATION_KWARGS, max_new_tokens=200)
+
+
+def length_sorted_batches(lengths, token_budget):
+    """
+    Regroupe des indices par longueur décroissante de sorte que
+    (longueur max du batch × taille du batch) reste sous `token_budget`.
+    Un élément seul plus long que le budget forme son propre batch.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    batches = []
+    current = []
+    for idx in order:
+        # Trié par longueur décroissante : le premier élément fixe la longueur paddée
+        padded_len = lengths[current[0]] if current else lengths[idx]
+        if current and padded_len * (len(current) + 1) > token_budget:
+            batches.append(current)
+            current = []
+        current.append(idx)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def generate_batched(texts, tokenizer, model, token_budget, max_input_tokens, generation_kwargs):
+    """
+    Génère un résumé par texte en regroupant les textes de longueur voisine dans un même
+    appel `generate` paddé. Les résumés sont renvoyés dans l’ordre des textes.
+    """
+    if not texts:
+        return []
+
+    encoded = tokenizer(
+        list(texts),
         truncation=True,
-        max_length=1024,
-        padding="longest"
-    ).to(model.device)
-
-    summary_ids = model.generate(
-        **inputs,
-        max_new_tokens=200,
-        num_beams=4,
-        no_repeat_ngram_size=3,
-        repetition_penalty=2.5,
-        length_penalty=1.0,
-        early_stopping=True
+        max_length=max_input_tokens
     )
+    lengths = [len(ids) for ids in encoded["input_ids"]]
+
+    summaries = [None] * len(texts)
+    for batch in length_sorted_batches(lengths, token_budget):
+        features = [
+            {"input_ids": encoded["input_ids"][i], "attention_mask": encoded["attention_mask"][i]}
+            for i in batch
+        ]
+        inputs = tokenizer.pad(features, padding="longest", return_tensors="pt").to(model.device)
+
+        summary_ids = model.generate(**inputs, **generation_kwargs)
+
+        decoded = tokenizer.batch_decode(summary_ids, skip_special_tokens=True)
+        for idx, summary in zip(batch, decoded):
+            summaries[idx] = summary.strip()
+    return summaries
+
+
+def summarize_chapters(chapters, tokenizer, model, token_budget=SUMMARY_BATCH_TOKENS):
+    """
+    Résume chaque chapitre (batchs triés par longueur, voir generate_batched).
+    """
+    return generate_batched(chapters, tokenizer, model, token_budget,
+                            CHAPTER_MAX_INPUT_TOKENS, CHAPTER_GENERATION_KWARGS)
+
+
+def group_by_token_window(texts, lengths, max_tokens):
+    """
+    Regroupe des textes consécutifs tant que leur longueur cumulée tient dans `max_tokens`.
+    """
+    groups = []
+    current, current_len = [], 0
+    for text, length in zip(texts, lengths):
+        if current and current_len + length > max_tokens:
+            groups.append(current)
+            current, current_len = [], 0
+        current.append(text)
+        current_len += length
+    if current:
+        groups.append(current)
+    return groups
+
+
+def hierarchical_global_summary(chapter_summaries, tokenizer, model, token_budget=SUMMARY_BATCH_TOKENS,
+                                max_input_tokens=GLOBAL_MAX_INPUT_TOKENS):
+    """
+    Étape « reduce » : le résumé global est généré à partir des résumés de chapitres.
+    S’ils dépassent la fenêtre de contexte, on les regroupe par fenêtres consécutives,
+    on résume chaque fenêtre, et on recommence sur ces résumés intermédiaires.
+    """
+    texts = [s for s in chapter_summaries if s]
+    if not texts:
+        return ""
+
+    while True:
+        # +1 par texte pour l’espace de jointure, marge pour les tokens spéciaux
+        lengths = [len(ids) + 1 for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+        groups = group_by_token_window(texts, lengths, max_input_tokens - 2)
+        if len(groups) == 1 or len(groups) >= len(texts):
+            # Tient dans la fenêtre (ou plus rien à regrouper : la troncature fera le reste)
+            return generate_batched([" ".join(texts)], tokenizer, model, token_budget,
+                                    max_input_tokens, GLOBAL_GENERATION_KWARGS)[0]
+        texts = generate_batched([" ".join(g) for g in groups], tokenizer, model, token_budget,
+                                 max_input_tokens, GLOBAL_GENERATION_KWARGS)
+
+
+class Summarizer:
+    """
+    Service de résumé résident : tokenizer + modèle fine-tuné chargés une seule fois
+    (au premier appel ou via warmup()), puis réutilisés par toutes les requêtes.
+    Les appels à `generate` sont sérialisés par un verrou pour ne pas se disputer les cœurs.
+    """
+
+    def __init__(self, model_path, quantize=SUMMARY_QUANTIZE, device=None):
+        self.model_path = model_path
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        # La quantification dynamique int8 ne concerne que l’inférence CPU
+        self.quantize = bool(quantize) and self.device == "cpu"
+        self.tokenizer = None
+        self.model = None
+        self.load_seconds = 0.0
+        self._load_lock = threading.Lock()
+        self._infer_lock = threading.Lock()
+        self.calls = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def load(self):
+        if self.model is None:
+            with self._load_lock:
+                if self.model is None:
+                    start = time.perf_counter()
+                    tokenizer = AutoTokenizer.from_pretrained(self.model_path, local_files_only=True)
+                    model = AutoModelForSeq2SeqLM.from_pretrained(self.model_path, local_files_only=True)
+                    model.eval()
+                    if self.quantize:
+                        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+                    model = model.to(self.device)
+                    self.tokenizer = tokenizer
+                    self.model = model
+                    self.load_seconds = time.perf_counter() - start
+                    logger.info(f"Modèle de résumé chargé depuis {self.model_path} en {self.load_seconds:.2f}s "
+                                f"(device={self.device}, int8={self.quantize})")
+        return self
+
+    def warmup(self):
+        """
+        Charge le modèle et exécute une génération courte pour amortir les initialisations.
+        """
+        self.load()
+        with self._infer_lock, torch.inference_mode():
+            inputs = self.tokenizer("warm-up", return_tensors="pt").to(self.model.device)
+            self.model.generate(**inputs, max_new_tokens=4)
+        return self
+
+    def summarize(self, chapters, batch_tokens=SUMMARY_BATCH_TOKENS, global_mode=GLOBAL_SUMMARY_MODE):
+        """
+        Retourne {"chapter_summaries": [...], "global_summary": str}.
+        `global_mode` : "hierarchical" (map-reduce sur les résumés) ou "truncate".
+        """
+        self.load()
+        tokenizer, model = self.tokenizer, self.model
+        start = time.perf_counter()
+        with self._infer_lock, torch.inference_mode():
+            # Résumé par chapitre (batchs triés par longueur)
+            summaries = summarize_chapters(chapters, tokenizer, model, token_budget=batch_tokens)
+
+            if global_mode == "hierarchical":
+                # Résumé global construit à partir des résumés de chapitres déjà calculés
+                global_summary = hierarchical_global_summary(summaries, tokenizer, model,
+                                                             token_budget=batch_tokens)
+            else:
+                # Résumé global à partir de tous les chapitres concaténés (tronqués)
+                global_summary = generate_batched([" ".join(chapters)], tokenizer, model, batch_tokens,
+                                                  GLOBAL_MAX_INPUT_TOKENS, GLOBAL_GENERATION_KWARGS)[0]
+        elapsed = time.perf_counter() - start
+        self.calls += 1
+        self.latencies.append(elapsed)
+        logger.info(f"{len(chapters)} chapitres résumés en {elapsed:.2f}s")
+
+        return {
+            "chapter_summaries": summaries,
+            "global_summary": global_summary
+        }
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+
+        def pct(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3)
+
+        return {
+            "model_path": self.model_path,
+            "device": self.device,
+            "quantized_int8": self.quantize,
+            "loaded": self.model is not None,
+            "load_seconds": round(self.load_seconds, 3),
+            "calls": self.calls,
+            "latency_p50_seconds": pct(0.50),
+            "latency_p95_seconds": pct(0.95),
+            "latency_last_seconds": round(self.latencies[-1], 3) if self.latencies else None
+        }
+
+
+# Un Summarizer résident par (chemin du modèle, quantification)
+_SUMMARIZERS = {}
+_SUMMARIZERS_LOCK = threading.Lock()
+
+
+def get_summarizer(model_path=None, quantize=SUMMARY_QUANTIZE):
+    model_path = model_path or os.getenv("MODEL_PATH")
+    key = (model_path, bool(quantize))
+    with _SUMMARIZERS_LOCK:
+        summarizer = _SUMMARIZERS.get(key)
+        if summarizer is None:
+            summarizer = Summarizer(model_path, quantize=quantize)
+            _SUMMARIZERS[key] = summarizer
+    return summarizer
+
 
-    global_summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
+def get_stats():
+    with _SUMMARIZERS_LOCK:
+        return {"summarizers": [s.stats() for s in _SUMMARIZERS.values()]}
 
-    # Sauvegarder dans un fichier JSON
-    output = {
-        "chapter_summaries": summaries,
-        "global_summary": global_summary.strip()
-    }
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(output, f, indent=2, ensure_ascii=False)
+def summarize_chapters_and_global(chapters, model_path, output_path="summaries.json",
+                                  batch_tokens=SUMMARY_BATCH_TOKENS, global_mode=GLOBAL_SUMMARY_MODE):
+    # Modèle fine-tuné résident (chargé au premier appel seulement)
+    output = get_summarizer(model_path).summarize(chapters, batch_tokens=batch_tokens,
+                                                  global_mode=global_mode)
 
-    print(f"✅ Résumés sauvegardés dans : {output_path}")
-    return output
\ No newline at end of file
+    # Sauvegarder dans un fichier JSON (l’application web range les résumés par transcript, voir artifacts.py)
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2, ensure_ascii=False)
+        print(f"✅ Résumés sauvegardés dans : {output_path}")
+    return output
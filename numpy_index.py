@@ -0,0 +1,235 @@
+
+import os
+import json
+import hashlib
+import threading
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def top_k(matrix: np.ndarray, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k exact par similarité cosinus : un produit matrice-vecteur puis argpartition.
+    `matrix` et `query` doivent être normalisés. Retourne (indices, scores) triés.
+    """
+    scores = matrix @ query
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    if k < len(scores):
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(len(scores))
+    idx = idx[np.argsort(-scores[idx], kind="stable")]
+    return idx, scores[idx]
+
+
+def top_k_many(matrix: np.ndarray, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k exact pour plusieurs requêtes à la fois : un seul produit matriciel
+    (n_requêtes × n_chunks) puis argpartition ligne par ligne. Retourne (indices, scores) triés.
+    """
+    scores = queries @ matrix.T
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.zeros((len(queries), 0))
+        return empty.astype(np.int64), empty.astype(np.float32)
+    if k < scores.shape[1]:
+        idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        idx = np.tile(np.arange(scores.shape[1]), (len(queries), 1))
+    top = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-top, axis=1, kind="stable")
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(top, order, axis=1)
+
+
+class NumpyVectorIndex:
+    """
+    Index vectoriel en mémoire pour les chunks d’un transcript (quelques centaines de lignes) :
+    matrice float32 contiguë de vecteurs normalisés, lue en memmap.
+
+    Sur disque, dans `path` : `vectors.f32` (float32 bruts, une ligne par chunk),
+    `chunks.jsonl` (id + texte, même ordre) et `meta.json` (dimension).
+    Fichiers en ajout seul ; expose add_texts() / as_retriever() comme un VectorStore Chroma.
+    """
+
+    def __init__(self, path: str, embedding: Embeddings):
+        self.path = path
+        self.embedding = embedding
+        os.makedirs(path, exist_ok=True)
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._chunks_path = os.path.join(path, "chunks.jsonl")
+        self._meta_path = os.path.join(path, "meta.json")
+        self._lock = threading.Lock()
+        self.dim: Optional[int] = None
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self._id_set = set()
+        self._matrix: Optional[np.ndarray] = None
+        self._load()
+
+    # ---------- disque ----------
+    def _load(self) -> None:
+        if not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            self.dim = json.load(f)["dim"]
+        rows = []
+        if os.path.exists(self._chunks_path):
+            with open(self._chunks_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rows.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        break  # dernière ligne tronquée
+        row_bytes = self.dim * 4
+        n_vectors = os.path.getsize(self._vectors_path) // row_bytes if os.path.exists(self._vectors_path) else 0
+        # Une écriture interrompue peut laisser un vecteur sans chunk (ou l’inverse) : on tronque.
+        n = min(len(rows), n_vectors)
+        if n_vectors > n:
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(n * row_bytes)
+        if len(rows) > n:
+            rows = rows[:n]
+            with open(self._chunks_path, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in rows)
+        self.ids = [r["id"] for r in rows]
+        self.texts = [r["text"] for r in rows]
+        self._id_set = set(self.ids)
+        self._remap()
+
+    def _remap(self) -> None:
+        n = len(self.ids)
+        self._matrix = None if n == 0 else np.memmap(
+            self._vectors_path, dtype=np.float32, mode="r", shape=(n, self.dim)
+        )
+
+    # ---------- écriture ----------
+    def add_texts(self, texts: List[str], ids: Optional[List[str]] = None, **kwargs) -> List[str]:
+        """
+        Ajoute des chunks (embeddings calculés en un seul passage batché).
+        Un id déjà présent est ignoré : ré-indexer les mêmes chunks est idempotent.
+        """
+        texts = list(texts)
+        if ids is None:
+            ids = [hashlib.sha256(t.encode("utf-8")).hexdigest() for t in texts]
+        with self._lock:
+            fresh = [(i, t) for i, t in dict(zip(ids, texts)).items() if i not in self._id_set]
+        if not fresh:
+            return list(ids)
+        vectors = _normalize_rows(self.embedding.embed_documents([t for _, t in fresh]))
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self._meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim}, f)
+            keep = [(row, i, t) for row, (i, t) in zip(vectors, fresh) if i not in self._id_set]
+            if keep:
+                # Vecteurs d’abord, chunks ensuite : un chunk présent a toujours son vecteur.
+                with open(self._vectors_path, "ab") as f:
+                    f.write(np.ascontiguousarray([row for row, _, _ in keep], dtype=np.float32).tobytes())
+                with open(self._chunks_path, "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps({"id": i, "text": t}, ensure_ascii=False) + "\n" for _, i, t in keep)
+                for _, i, t in keep:
+                    self.ids.append(i)
+                    self.texts.append(t)
+                    self._id_set.add(i)
+                self._remap()
+        return list(ids)
+
+    # ---------- lecture ----------
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], k: int = 4
+    ) -> List[Tuple[Document, float]]:
+        with self._lock:
+            matrix, ids, texts = self._matrix, self.ids, self.texts
+        if matrix is None:
+            return []
+        q = _normalize_rows([embedding])[0]
+        idx, scores = top_k(matrix, q, k)
+        return [
+            (Document(page_content=texts[i], metadata={"id": ids[i]}), float(s))
+            for i, s in zip(idx, scores)
+        ]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    def similarity_search_by_vectors(self, embeddings, k: int = 4) -> List[List[Document]]:
+        """Recherche groupée : une liste de documents par vecteur requête (un seul produit matriciel)."""
+        with self._lock:
+            matrix, ids, texts = self._matrix, self.ids, self.texts
+        if matrix is None:
+            return [[] for _ in embeddings]
+        idx, _ = top_k_many(matrix, _normalize_rows(embeddings), k)
+        return [
+            [Document(page_content=texts[i], metadata={"id": ids[i]}) for i in row]
+            for row in idx
+        ]
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def as_retriever(self, search_kwargs: Optional[Dict[str, Any]] = None) -> "NumpyRetriever":
+        return NumpyRetriever(index=self, k=(search_kwargs or {}).get("k", 4))
+
+
+class NumpyRetriever(BaseRetriever):
+    """Retriever LangChain adossé à un NumpyVectorIndex."""
+
+    index: Any
+    k: int = 4
+
+    @property
+    def vectorstore(self) -> NumpyVectorIndex:
+        # Même accès que VectorStoreRetriever.vectorstore côté Chroma
+        return self.index
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.index.similarity_search(query, k=self.k)
+
+
+_INDEXES: Dict[str, NumpyVectorIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_numpy_index(path: str, embedding: Embeddings) -> NumpyVectorIndex:
+    """
+    Index ouvert une seule fois par dossier : l’ingestion (écriture) et le chat (lecture)
+    partagent la même instance.
+    """
+    path = os.path.abspath(path)
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(path)
+        if index is None:
+            index = NumpyVectorIndex(path, embedding)
+            _INDEXES[path] = index
+    return index
+
+
+def drop_numpy_index(path: str) -> None:
+    """Oublie l’instance ouverte pour `path` (avant suppression du dossier par le GC)."""
+    with _INDEXES_LOCK:
+        _INDEXES.pop(os.path.abspath(path), None)
@@ -0,0 +1,130 @@
+
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# —————— Config ——————
+SAMPLE_RATE = 16000
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "tiny")
+# Nombre de process whisper (1 = transcription séquentielle classique)
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "1"))
+# Threads CTranslate2 par process
+WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", "2"))
+# Longueur visée des morceaux envoyés aux workers
+TRANSCRIBE_PIECE_SECONDS = float(os.getenv("TRANSCRIBE_PIECE_SECONDS", "120"))
+
+# Même interface que les segments faster-whisper (start / end / text)
+Segment = namedtuple("Segment", ["start", "end", "text"])
+
+# Modèle propre à chaque process worker
+_worker_model = None
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_KEY = None
+_POOL_LOCK = threading.Lock()
+
+
+def _init_worker(model_size: str, cpu_threads: int) -> None:
+    global _worker_model
+    from faster_whisper import WhisperModel
+
+    _worker_model = WhisperModel(
+        model_size_or_path=model_size,
+        device="cpu",
+        compute_type="int8",
+        cpu_threads=cpu_threads
+    )
+
+
+def _transcribe_piece(offset: float, audio: np.ndarray, beam_size: int) -> List[Segment]:
+    segments, _ = _worker_model.transcribe(audio, beam_size=beam_size)
+    return [Segment(offset + seg.start, offset + seg.end, seg.text) for seg in segments]
+
+
+def split_at_silences(audio: np.ndarray, piece_seconds: float = TRANSCRIBE_PIECE_SECONDS,
+                      sampling_rate: int = SAMPLE_RATE) -> List[Tuple[int, int]]:
+    """
+    Découpe l’audio en morceaux contigus d’environ `piece_seconds`, en coupant
+    uniquement au milieu des silences détectés par le VAD (Silero) de faster-whisper.
+    Retourne des bornes (début, fin) en échantillons qui couvrent tout l’audio.
+    """
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    total = len(audio)
+    target = int(piece_seconds * sampling_rate)
+    if total <= target:
+        return [(0, total)]
+
+    speech = get_speech_timestamps(audio, VadOptions(min_silence_duration_ms=300), sampling_rate=sampling_rate)
+    cuts = [0]
+    for current, following in zip(speech, speech[1:]):
+        if current["end"] - cuts[-1] >= target:
+            cuts.append((current["end"] + following["start"]) // 2)
+    cuts.append(total)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+def _get_pool(workers: int, model_size: str, cpu_threads: int) -> ProcessPoolExecutor:
+    # Pool persistant : les modèles ne sont chargés qu’une fois par worker
+    global _POOL, _POOL_KEY
+    key = (workers, model_size, cpu_threads)
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_KEY != key:
+            if _POOL is not None:
+                _POOL.shutdown(wait=False)
+            logger.info(f"Démarrage de {workers} workers whisper ({model_size}, {cpu_threads} threads chacun)")
+            _POOL = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model_size, cpu_threads)
+            )
+            _POOL_KEY = key
+        return _POOL
+
+
+def transcribe_parallel(
+    audio_path: str,
+    beam_size: int = 5,
+    workers: int = TRANSCRIBE_WORKERS,
+    cpu_threads: int = WHISPER_CPU_THREADS,
+    piece_seconds: float = TRANSCRIBE_PIECE_SECONDS,
+    model_size: str = WHISPER_MODEL_SIZE
+) -> Tuple[Iterator[Segment], float]:
+    """
+    Transcrit `audio_path` en répartissant des morceaux (coupés aux silences) sur un pool
+    de process whisper. Renvoie (générateur de segments dans l’ordre, durée en secondes) :
+    les segments d’un morceau sont émis dès que ce morceau et les précédents sont prêts,
+    avec des timestamps recalés sur l’audio complet.
+    """
+    from faster_whisper.audio import decode_audio
+
+    audio = decode_audio(audio_path, sampling_rate=SAMPLE_RATE)
+    duration = len(audio) / SAMPLE_RATE
+    pieces = split_at_silences(audio, piece_seconds)
+    logger.info(f"Transcription parallèle de {audio_path} : {duration:.0f}s d’audio, "
+                f"{len(pieces)} morceaux, {workers} workers")
+
+    pool = _get_pool(workers, model_size, cpu_threads)
+    futures = [
+        pool.submit(_transcribe_piece, start / SAMPLE_RATE, audio[start:end], beam_size)
+        for start, end in pieces
+    ]
+
+    def ordered_segments() -> Iterator[Segment]:
+        start_time = time.perf_counter()
+        for future in futures:
+            yield from future.result()
+        elapsed = time.perf_counter() - start_time
+        logger.info(f"Transcription parallèle terminée : {duration / max(elapsed, 1e-9):.1f} s d’audio / s")
+
+    return ordered_segments(), duration
@@ -1,24 +1,48 @@
 
 import os
+import time
+import asyncio
 import logging
-from typing import Any
+from typing import Any, Iterator, List, Optional
 from langchain.schema.runnable import RunnableLambda
 from langchain.prompts import PromptTemplate
 
 from hf_router import HuggingFaceRouterLLM
 
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from answer_cache import get_answer_cache
+from embedding import get_embedder
+from vectorstore import DEFAULT_COLLECTION, open_vectorstore, search_by_vectors
 
-from langchain_chroma import Chroma
 logger = logging.getLogger(__name__)
 
+# Nombre de chunks injectés dans le contexte
+RAG_TOP_K = 3
+
+QA_TEMPLATE = """You are an AI assistant for a podcast transcript. Use the context below to answer the question as clearly and concisely as possible.
+
+Context:
+{context}
+
+Question: {question}
+
+Answer:"""
+
+
+def format_docs(docs: List[Any]) -> str:
+    """Contexte du prompt : contenu des chunks retrouvés, séparés par une ligne vide."""
+    return "\n\n".join(doc.page_content for doc in docs)
+
 
 def get_rag_chain(
-    persist_dir: str = "data/vectorstores/chunks"
+    persist_dir: str = "data/vectorstores/chunks",
+    collection: str = DEFAULT_COLLECTION
 ) -> Any:
     """
-    Charge le VectorStore Chroma depuis `persist_dir` et
+    Charge la collection `collection` du VectorStore Chroma de `persist_dir` et
     construit le pipeline RAG (Runnable). Retourne (chain, retriever).
+
+    `chain.invoke({"question": ...})` renvoie {"answer", "docs", "timings"} : la recherche
+    n’est faite qu’une fois, et les durées (secondes) des étapes embed / search / llm sont mesurées.
     """
     if not os.path.isdir(persist_dir):
         raise FileNotFoundError(
@@ -26,24 +50,15 @@ def get_rag_chain(
             "Veuillez d’abord exécuter get_vectorstore() pour indexer vos chunks."
         )
 
-    logger.info(f"Chargement du VectorStore depuis : {persist_dir}")
-
-    # 1) Ré-instancier l’embedder identique à get_vectorstore()
-    hf_emb = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2",
-        model_kwargs={"device": "cpu"}
-    )
+    logger.info(f"Chargement du VectorStore depuis : {persist_dir} (collection {collection})")
 
-    # 2) Recharger la base Chroma : on passe l’embedder ici aussi,
-    #    afin qu’il sache comment créer l’embedding de la query.
-    vectordb = Chroma(
-         embedding_function=hf_emb,
-        persist_directory=persist_dir
-    )
+    # 1-2) Recharger la collection Chroma avec l’embedder partagé, identique à get_vectorstore(),
+    #      afin qu’elle sache comment créer l’embedding de la query.
+    vectordb = open_vectorstore(persist_dir, collection)
     logger.info("VectorStore Chroma rechargé avec succès (embedding fourni).")
 
-    # 3) Construire le retriever (top‐k similarité)
-    retriever = vectordb.as_retriever(search_kwargs={"k": 3})
+    # 3) Construire le retriever (top‐k similarité), conservé pour les appelants existants
+    retriever = vectordb.as_retriever(search_kwargs={"k": RAG_TOP_K})
     logger.info("Retriever top‐k construit.")
 
     # 4) Instancier ensuite le LLM
@@ -51,43 +66,159 @@ def get_rag_chain(
     logger.info("LLM HuggingFaceRouterLLM instancié.")
 
     # 5) Préparer le prompt pour la génération de réponse
-    qa_prompt = PromptTemplate.from_template(
-        """You are an AI assistant for a podcast transcript. Use the context below to answer the question as clearly and concisely as possible.
+    qa_prompt = PromptTemplate.from_template(QA_TEMPLATE)
+
+    # 6) Recherche en un seul passage : la query est embeddée une fois, puis cherchée par vecteur.
+    #    Une question proche d’une question déjà posée sur ce transcript est servie par le cache sémantique.
+    embedder = get_embedder()
+    answer_cache = get_answer_cache()
+
+    def retrieve(data):
+        question = data["question"]
+        start = time.perf_counter()
+        version = answer_cache.version(collection)
+        query_vector = embedder.embed_query(question)
+        embedded = time.perf_counter()
+        cached = answer_cache.lookup(collection, query_vector)
+        if cached is not None:
+            docs = cached["docs"]
+        else:
+            docs = vectordb.similarity_search_by_vector(query_vector, k=RAG_TOP_K)
+        searched = time.perf_counter()
+        return {
+            "question": question,
+            "docs": docs,
+            "query_vector": query_vector,
+            "scope": collection,
+            "version": version,
+            "cached": cached,
+            "timings": {"embed": round(embedded - start, 4), "search": round(searched - embedded, 4)}
+        }
 
-Context:
-{context}
+    # 7) Génération : les documents retrouvés servent de contexte et sont renvoyés avec la réponse
+    def generate(data):
+        if data["cached"] is not None:
+            timings = dict(data["timings"], llm=0.0)
+            return {"answer": data["cached"]["answer"], "docs": data["docs"], "timings": timings, "cached": True}
+        prompt = qa_prompt.format(context=format_docs(data["docs"]), question=data["question"])
+        start = time.perf_counter()
+        answer = llm.invoke(prompt)
+        timings = dict(data["timings"], llm=round(time.perf_counter() - start, 4))
+        answer_cache.put(collection, data["query_vector"], data["question"], answer, data["docs"],
+                         version=data["version"])
+        return {"answer": answer, "docs": data["docs"], "timings": timings, "cached": False}
+
+    # 8) Chaîne RAG : {"question"} → {"answer", "docs", "timings", "cached"}
+    #    (chain.first est l’étape de recherche, réutilisée par stream_rag_answer)
+    chain = RunnableLambda(retrieve, name="retrieve") | RunnableLambda(generate, name="generate")
 
-Question: {question}
+    logger.info("Pipeline RAG (Runnable) construit avec embedding_function.")
+    return chain, retriever
 
-Answer:"""
-    )
 
-    # 6) Créer un Runnable pour extraire uniquement la partie "question" de l’input
-    question_extractor = RunnableLambda(lambda data: data["question"])
-
-    # 7) Construire la chaîne de traitement RAG
-    #    - "context": (question → retriever → liste de docs)
-    #    - "question": question pure
-    #    → on injecte ces deux champs dans `qa_prompt`, puis dans le LLM
-    chain = (
-        {
-            "context": question_extractor | retriever,
-            "question": question_extractor
-        }
-        | qa_prompt
-        | llm
+def stream_rag_answer(chain: Any, question: str) -> Iterator[dict]:
+    """
+    Variante streaming de `chain.invoke` : même recherche (étape `chain.first`), puis
+    génération token par token. Produit successivement :
+      - {"docs": [...], "timings": {"embed", "search"}}
+      - {"token": "..."} pour chaque fragment de la réponse
+      - {"answer": "...", "timings": {..., "llm_first_token", "llm"}, "cached": bool}
+    """
+    data = chain.first.invoke({"question": question})
+    yield {"docs": data["docs"], "timings": data["timings"]}
+
+    if data["cached"] is not None:
+        # Réponse du cache sémantique : envoyée d’un bloc
+        answer = data["cached"]["answer"]
+        yield {"token": answer}
+        yield {"answer": answer, "timings": dict(data["timings"], llm_first_token=0.0, llm=0.0), "cached": True}
+        return
+
+    prompt = PromptTemplate.from_template(QA_TEMPLATE).format(
+        context=format_docs(data["docs"]), question=question
     )
+    start = time.perf_counter()
+    first_token = None
+    parts = []
+    for token in HuggingFaceRouterLLM().stream(prompt):
+        if first_token is None:
+            first_token = round(time.perf_counter() - start, 4)
+        parts.append(token)
+        yield {"token": token}
+    timings = dict(data["timings"], llm_first_token=first_token, llm=round(time.perf_counter() - start, 4))
+    answer = "".join(parts)
+    get_answer_cache().put(data["scope"], data["query_vector"], question, answer, data["docs"],
+                           version=data["version"])
+    yield {"answer": answer, "timings": timings, "cached": False}
+
+
+def retrieve_many(vectordb: Any, questions: List[str], k: int = RAG_TOP_K):
+    """
+    Recherche pour plusieurs questions : un seul forward batché de l’embedder,
+    puis une seule recherche matricielle.
+    Retourne (vecteurs des questions, listes de docs, durées embed / search).
+    """
+    start = time.perf_counter()
+    vectors = get_embedder().encode(questions)
+    embedded = time.perf_counter()
+    docs = search_by_vectors(vectordb, vectors, k=k)
+    searched = time.perf_counter()
+    return vectors, docs, {"embed": round(embedded - start, 4), "search": round(searched - embedded, 4)}
 
-    logger.info("Pipeline RAG (Runnable) construit avec embedding_function.")
-    return chain, retriever
+
+async def aanswer_questions(retriever: Any, questions: List[str], scope: Optional[str] = None) -> dict:
+    """
+    Répond à plusieurs questions en un passage : recherche groupée (retrieve_many),
+    cache sémantique du transcript `scope`, puis appels LLM concurrents pour les questions
+    restantes (HuggingFaceRouterLLM.abatch, concurrence bornée).
+    Retourne {"results": [{"question", "answer", "docs", "error", "cached"}], "timings": {...}}.
+    """
+    answer_cache = get_answer_cache()
+    version = answer_cache.version(scope)
+    vectors, docs_per_question, timings = retrieve_many(retriever.vectorstore, questions)
+    cached = [answer_cache.lookup(scope, vector) for vector in vectors]
+    docs_per_question = [c["docs"] if c else docs for c, docs in zip(cached, docs_per_question)]
+
+    qa_prompt = PromptTemplate.from_template(QA_TEMPLATE)
+    pending = [i for i, c in enumerate(cached) if c is None]
+    prompts = [
+        qa_prompt.format(context=format_docs(docs_per_question[i]), question=questions[i])
+        for i in pending
+    ]
+    start = time.perf_counter()
+    generated = await HuggingFaceRouterLLM().abatch(prompts, return_exceptions=True) if prompts else []
+    timings["llm"] = round(time.perf_counter() - start, 4)
+    answers = [c["answer"] if c else None for c in cached]
+    for i, answer in zip(pending, generated):
+        answers[i] = answer
+
+    results = []
+    for i, (question, docs, answer) in enumerate(zip(questions, docs_per_question, answers)):
+        failed = isinstance(answer, Exception)
+        if failed:
+            logger.error(f"Échec de la génération pour « {question} » : {answer}")
+        elif cached[i] is None:
+            answer_cache.put(scope, vectors[i], question, answer, docs, version=version)
+        results.append({
+            "question": question,
+            "answer": None if failed else answer,
+            "docs": docs,
+            "error": "Erreur pendant la génération de la réponse." if failed else None,
+            "cached": cached[i] is not None
+        })
+    return {"results": results, "timings": timings}
+
+
+def answer_questions(retriever: Any, questions: List[str], scope: Optional[str] = None) -> dict:
+    """Version synchrone de aanswer_questions (routes Flask, boucles console)."""
+    return asyncio.run(aanswer_questions(retriever, questions, scope))
 
 
 def ask_loop(chain: Any, retriever: Any) -> None:
     """
     Boucle interactive en console pour poser des questions en RAG :
       - on lit la question utilisateur
-      - on récupère les documents pertinents
-      - on invoque la chaîne RAG pour générer la réponse
+      - on invoque la chaîne RAG (documents pertinents + réponse en un seul passage)
       - on affiche la réponse + extraits sources
     Tapez 'exit' pour quitter.
     """
@@ -101,14 +232,12 @@ def ask_loop(chain: Any, retriever: Any) -> None:
 
         logger.info(f"Question reçue : {question}")
 
-        # 1) Récupérer les documents pertinents
-        docs = retriever.get_relevant_documents(question)
-        logger.info(f"{len(docs)} document(s) récupéré(s).")
-
-        # 2) Générer la réponse via la chaîne RAG
+        # 1-2) Récupérer les documents pertinents et générer la réponse en un seul passage
         result = chain.invoke({"question": question})
+        docs = result["docs"]
+        logger.info(f"{len(docs)} document(s) récupéré(s) ; durées : {result['timings']}")
         print("\n=== Réponse ===")
-        print(result)
+        print(result["answer"])
 
         # 3) Afficher les extraits sources
         print("\n=== Extraits Sources ===")
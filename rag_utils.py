@@ -8,7 +8,8 @@ from transcription import download_audio_from_youtube, transcribe_file
 
 # 2) Importer vos modules de prétraitement (chunking + vectorstore)
 from chunking import get_text_chunks
-from vectorstore import get_vectorstore
+from vectorstore import DEFAULT_COLLECTION, collection_name, get_vectorstore
+from artifacts import transcript_hash
 
 # 3) Importer la fonction qui construit la chaîne RAG
 from rag_chat import get_rag_chain
@@ -113,27 +114,31 @@ def ingest_transcript() -> str:
         return ""
 
 
-def process_transcript(raw_text: str, persist_dir: str = "data/vectorstores/chunks") -> None:
+def process_transcript(raw_text: str, persist_dir: str = "data/vectorstores/chunks") -> str:
     """
-    Découpe le texte (raw_text) en chunks puis crée ou recharge le VectorStore Chroma 
-    dans le dossier `persist_dir`. Affiche un message si raw_text est vide.
+    Découpe le texte (raw_text) en chunks puis les indexe dans la collection Chroma
+    propre à ce transcript (dossier `persist_dir`). Retourne le nom de la collection,
+    ou '' (avec un message) si raw_text est vide.
     """
     if not raw_text:
         print("Aucun texte à traiter. Veuillez ingérer un podcast d’abord.")
-        return
+        return ""
 
     print("\nÉtape 2) Découpage en chunks & indexation du VectorStore Chroma…")
     # 1) Découper en chunks
     chunks = get_text_chunks(raw_text)
     logger.info(f"{len(chunks)} chunks générés.")
 
-    # 2) Création (ou recharge) du VectorStore Chroma
+    # 2) Création (ou recharge) de la collection Chroma du transcript
     os.makedirs(persist_dir, exist_ok=True)
-    vectordb = get_vectorstore(chunks, persist_dir=persist_dir)
+    collection = collection_name(transcript_hash(raw_text))
+    vectordb = get_vectorstore(chunks, persist_dir=persist_dir, collection=collection)
     logger.info(f"VectorStore Chroma persistant dans : {persist_dir}")
+    return collection
 
 
-def build_and_get_rag_chain(persist_dir: str = "data/vectorstores/chunks") -> Any:
+def build_and_get_rag_chain(persist_dir: str = "data/vectorstores/chunks",
+                            collection: str = DEFAULT_COLLECTION) -> Any:
     """
     Recharge le VectorStore Chroma existant (créé par process_transcript) puis 
     construit la pipeline RAG (Runnable). Retourne (chain, retriever).
@@ -146,14 +151,14 @@ def build_and_get_rag_chain(persist_dir: str = "data/vectorstores/chunks") -> An
         )
 
     print("\nÉtape 3) Construction de la chaîne RAG…")
-    chain, retriever = get_rag_chain(persist_dir=persist_dir)
+    chain, retriever = get_rag_chain(persist_dir=persist_dir, collection=collection)
     return chain, retriever
 
 
 def ask_questions_loop(chain: Any, retriever: Any) -> None:
     """
     Boucle interactive de questions/réponses (RAG).
-    Lit la question, récupère les docs pertinents, invoque la chaîne RAG et affiche la réponse + sources.
+    Lit la question, invoque la chaîne RAG (docs pertinents + réponse en un passage) et affiche la réponse + sources.
     Tapez 'exit' ou 'quit' pour quitter.
     """
     print("\nPipeline RAG prêt. Posez vos questions (tapez 'exit' pour quitter).\n")
@@ -166,12 +171,12 @@ def ask_questions_loop(chain: Any, retriever: Any) -> None:
             continue
 
         logger.info(f"Question reçue : {question}")
-        docs = retriever.get_relevant_documents(question)
-        logger.info(f"{len(docs)} document(s) récupéré(s).")
+        result = chain.invoke({"question": question})
+        docs = result["docs"]
+        logger.info(f"{len(docs)} document(s) récupéré(s) ; durées : {result['timings']}")
 
-        answer = chain.invoke({"question": question})
         print("\n--- Réponse ---")
-        print(answer)
+        print(result["answer"])
 
         print("\n--- Extraits Sources ---")
         for doc in docs:
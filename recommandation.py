@@ -1,46 +1,51 @@
-from sentence_transformers import SentenceTransformer
 import json
-from sklearn.metrics.pairwise import cosine_similarity
-from embedding import get_embeddings 
-import numpy as np
-from langchain.vectorstores import Chroma
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.schema import Document
-import os
 import time
 
+from embedding import get_embedder
+from artifacts import get_artifact_store
+from recommendation_index import RECO_INDEX_DIR, get_recommendation_index
 
 
-def load_global_summary(filepath='./data/summaries.json'):
-    with open(filepath, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+
+def load_global_summary(transcript_id=None, filepath='./data/summaries.json'):
+    """
+    Résumé global d’un transcript, lu dans le store d’artefacts (voir artifacts.py).
+    Sans transcript_id, lit le fichier JSON écrit par app.py.
+    """
+    if transcript_id is None:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    else:
+        data = get_artifact_store().get(transcript_id, "summaries")
+        if data is None:
+            raise FileNotFoundError(f"aucun résumé pour le transcript {transcript_id[:12]}")
     return data['global_summary']
 
-def run_recommendation_from_summary_chroma(top_k=5, persist_dir="data/vectorstores/podcast_eps"):
+def run_recommendation_from_summary(top_k=5, index_dir=RECO_INDEX_DIR):
+    """
+    Démo console : recommandations pour le résumé global écrit par app.py, depuis l’index
+    du catalogue (voir recommendation_index.py, construit par build_podcast_vectorstore.py).
+    """
     query_text = load_global_summary()
 
-    embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    vectorstore = Chroma(persist_directory=persist_dir, embedding_function=embedding_model)
+    index = get_recommendation_index(index_dir)
+    query_vector = get_embedder().encode([query_text])[0]
 
-    start_time = time.time() 
+    start_time = time.time()
 
-    results = vectorstore.similarity_search_with_relevance_scores(query_text, k=top_k)
+    results = index.search(query_vector, k=top_k)
 
     elapsed = time.time() - start_time
     print(f"\n⚡ Temps de réponse pour la requête : {elapsed:.4f} secondes\n")
 
     print(f"\n📌 Résultats pour le résumé global :\n\"{query_text}\"\n")
-    for i, (doc, score) in enumerate(results, 1):
-        meta = doc.metadata
-        print(f"--- Recommandation {i} ---")
-        print(f"🎙️ Podcast       : {meta.get('podcast_title', 'Unknown')}")
-        print(f"🎧 Épisode       : {meta.get('episode_title', 'Unknown')}")
-        print(f"📝 Description   : {doc.page_content}")
-        print(f"🔗 Lien          : {meta.get('episode_link', 'N/A')}")
+    for result in results:
+        print(f"--- Recommandation {result['rank']} ---")
+        print(f"🎙️ Podcast       : {result['podcast_title']}")
+        print(f"🎧 Épisode       : {result['episode_title']}")
+        print(f"📝 Description   : {result['description']}")
+        print(f"🔗 Lien          : {result['episode_link']}")
         print()
 
 if __name__ == "__main__":
-    run_recommendation_from_summary_chroma()
-
-
-
+    run_recommendation_from_summary()
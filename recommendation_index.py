@@ -0,0 +1,313 @@
+import os
+import json
+import time
+import hashlib
+import uuid
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from numpy_index import top_k
+from ann_index import ANN_NPROBE, RECO_INDEX_BACKEND, load_ann_index
+
+logger = logging.getLogger(__name__)
+
+# —————— Config ——————
+RECO_INDEX_DIR = os.getenv("RECO_INDEX_DIR", os.path.join("data", "recommendation_index"))
+RECO_TOP_K = int(os.getenv("RECO_TOP_K", "5"))
+# Borne de top_k par requête (la diversification compare k × RECO_FETCH_FACTOR candidats deux à deux)
+RECO_MAX_TOP_K = int(os.getenv("RECO_MAX_TOP_K", "100"))
+# Diversification : poids de la pertinence dans le MMR (1 = désactivé) et épisodes max par podcast
+# (0 = sans limite ; ignoré quand la requête filtre elle-même par podcast)
+RECO_MMR_LAMBDA = float(os.getenv("RECO_MMR_LAMBDA", "0.7"))
+RECO_PER_PODCAST = int(os.getenv("RECO_PER_PODCAST", "2"))
+# Candidats considérés par le MMR et le plafond par podcast (× k)
+RECO_FETCH_FACTOR = int(os.getenv("RECO_FETCH_FACTOR", "5"))
+
+VECTORS_FILE = "vectors.f32"
+METADATA_FILE = "metadata.json"
+# Colonnes de métadonnées conservées pour chaque épisode (plus episode_id et description_hash,
+# qui servent aux mises à jour incrémentales, voir catalog_ingest.py)
+COLUMNS = ("podcast_title", "episode_title", "episode_description", "episode_link", "language", "published_at")
+# Champs filtrables par valeur exacte (index inversé : valeur normalisée → lignes) ; published_at par intervalle
+FILTER_FIELDS = ("podcast_title", "language")
+# Au-delà de cette fraction du catalogue, un filtre est appliqué sur les scores complets plutôt qu’en extrayant les lignes
+_GATHER_FRACTION = 0.25
+_NO_ROWS = np.zeros(0, dtype=np.int64)
+
+
+def _filter_key(value: Any) -> Optional[str]:
+    if value is None or value == "":
+        return None
+    return str(value).strip().lower()
+
+
+def parse_day(value: Any) -> np.datetime64:
+    try:
+        return np.datetime64(str(value)[:10], "D")
+    except ValueError:
+        return np.datetime64("NaT")
+
+
+def build_postings(columns: Dict[str, List[Any]], fields=FILTER_FIELDS) -> Dict[str, Dict[str, np.ndarray]]:
+    """Index inversé des champs filtrables : {champ: {valeur normalisée: lignes triées}}."""
+    postings = {}
+    for field in fields:
+        rows = defaultdict(list)
+        for i, value in enumerate(columns.get(field) or []):
+            key = _filter_key(value)
+            if key is not None:
+                rows[key].append(i)
+        postings[field] = {key: np.asarray(ids, dtype=np.int64) for key, ids in rows.items()}
+    return postings
+
+
+def _best(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions des k meilleurs scores, triées par score décroissant."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return _NO_ROWS
+    top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def description_hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()[:16]
+
+
+def _atomic_replace(path: str, write) -> None:
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+class RecommendationIndex:
+    """
+    Index des épisodes du catalogue pour les recommandations : embeddings normalisés
+    dans une matrice float32 contiguë (`vectors.f32`) et métadonnées en colonnes
+    (`metadata.json`, une liste par champ). Chargé une fois en mémoire ; un top-k
+    est un produit matrice-vecteur suivi d’un argpartition, ou une recherche approchée
+    dans l’index IVF `ann` s’il est présent (voir ann_index.py).
+
+    Les filtres de métadonnées sont résolus avant le calcul des scores grâce à un index
+    inversé construit au chargement ; les candidats sont ensuite diversifiés (MMR sur leurs
+    embeddings, plafond d’épisodes par podcast).
+    """
+
+    def __init__(self, matrix: np.ndarray, columns: Dict[str, List[Any]], meta: Dict[str, Any], ann=None):
+        self.matrix = matrix
+        self.columns = columns
+        self.meta = meta
+        self.ann = ann
+        self.postings = build_postings(columns)
+        self.published = np.array([parse_day(v) for v in columns.get("published_at") or [None] * len(matrix)],
+                                  dtype="datetime64[D]")
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1]
+
+    @classmethod
+    def load(cls, index_dir: str = RECO_INDEX_DIR, mmap: bool = False) -> "RecommendationIndex":
+        """Charge l’index en mémoire, ou en memmap lecture seule (`mmap=True`, mises à jour incrémentales)."""
+        with open(os.path.join(index_dir, METADATA_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        count, dim = int(meta["count"]), int(meta["dim"])
+        path = os.path.join(index_dir, VECTORS_FILE)
+        if mmap:
+            matrix = np.memmap(path, dtype=np.float32, mode="r") if count * dim else np.zeros(0, np.float32)
+        else:
+            matrix = np.fromfile(path, dtype=np.float32)
+        if matrix.size != count * dim:
+            raise ValueError(f"Index de recommandation incohérent ({matrix.size} floats pour {count}×{dim})")
+        columns = meta.pop("columns")
+        return cls(matrix.reshape(count, dim), columns, meta)
+
+    def row(self, i: int) -> Dict[str, Any]:
+        return {name: values[i] for name, values in self.columns.items()}
+
+    def filter_rows(self, filters: Dict[str, Any]) -> Optional[np.ndarray]:
+        """
+        Lignes satisfaisant les filtres (None = pas de filtre). Valeurs exactes (liste = OU) sur
+        FILTER_FIELDS via l’index inversé, intervalle `published_after` / `published_before` (AAAA-MM-JJ).
+        """
+        rows = None
+        for field in FILTER_FIELDS:
+            wanted = filters.get(field)
+            if not wanted:
+                continue
+            if isinstance(wanted, str):
+                wanted = [wanted]
+            postings = self.postings.get(field, {})
+            lists = [postings[key] for key in map(_filter_key, wanted) if key in postings]
+            matched = np.unique(np.concatenate(lists)) if len(lists) > 1 else (lists[0] if lists else _NO_ROWS)
+            rows = matched if rows is None else np.intersect1d(rows, matched, assume_unique=True)
+
+        after, before = filters.get("published_after"), filters.get("published_before")
+        if after or before:
+            dates = self.published if rows is None else self.published[rows]
+            mask = ~np.isnat(dates)
+            if after:
+                mask &= dates >= parse_day(after)
+            if before:
+                mask &= dates <= parse_day(before)
+            rows = np.flatnonzero(mask) if rows is None else rows[mask]
+        return rows
+
+    def _diversify(self, query: np.ndarray, idx: np.ndarray, scores: np.ndarray, k: int,
+                   mmr_lambda: float, per_podcast: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sélection gloutonne MMR parmi les candidats : λ·sim(requête) − (1 − λ)·max sim(déjà choisis),
+        en sautant les épisodes d’un podcast qui a déjà `per_podcast` épisodes retenus.
+        """
+        vectors = np.asarray(self.matrix[idx], dtype=np.float32)
+        similarity = vectors @ vectors.T
+        podcasts = self.columns.get("podcast_title") or [None] * len(self)
+        available = np.ones(len(idx), dtype=bool)
+        redundancy = np.zeros(len(idx), dtype=np.float32)
+        per_show: Dict[Optional[str], int] = defaultdict(int)
+        chosen: List[int] = []
+        while len(chosen) < k and available.any():
+            mmr = mmr_lambda * scores - (1.0 - mmr_lambda) * redundancy
+            mmr[~available] = -np.inf
+            best = int(np.argmax(mmr))
+            available[best] = False
+            show = _filter_key(podcasts[idx[best]])
+            if per_podcast > 0 and show is not None:
+                if per_show[show] >= per_podcast:
+                    continue
+                per_show[show] += 1
+            chosen.append(best)
+            redundancy = similarity[best] if len(chosen) == 1 else np.maximum(redundancy, similarity[best])
+        return idx[chosen], scores[chosen]
+
+    def search(self, query_vector, k: int = RECO_TOP_K, nprobe: int = ANN_NPROBE,
+               filters: Optional[Dict[str, Any]] = None, mmr_lambda: float = RECO_MMR_LAMBDA,
+               per_podcast: int = RECO_PER_PODCAST) -> List[Dict[str, Any]]:
+        """
+        Top-k par similarité cosinus : [{rank, podcast_title, episode_title, description, episode_link, score}].
+        `filters` restreint le catalogue avant le calcul des scores (voir filter_rows) ; avec
+        `mmr_lambda < 1` ou `per_podcast > 0`, les k résultats sont choisis parmi k × RECO_FETCH_FACTOR candidats.
+        Le plafond par podcast ne s’applique pas quand `filters` porte sur podcast_title : l’appelant
+        a choisi les podcasts, les k résultats peuvent tous venir du même.
+        """
+        if k > RECO_MAX_TOP_K:
+            raise ValueError(f"top_k doit être ≤ {RECO_MAX_TOP_K}")
+        query = np.asarray(query_vector, dtype=np.float32).ravel()
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        if filters and filters.get("podcast_title"):
+            per_podcast = 0
+        diversify = mmr_lambda < 1.0 or per_podcast > 0
+        fetch = min(k * max(RECO_FETCH_FACTOR, 1) if diversify else k, len(self))
+        rows = self.filter_rows(filters) if filters else None
+
+        if rows is None:
+            if self.ann is not None:
+                idx, scores = self.ann.search(query, fetch, nprobe=nprobe, full_vectors=self.matrix)
+            else:
+                idx, scores = top_k(self.matrix, query, fetch)
+        else:
+            # Pré-filtrage : seules les lignes retenues sont scorées (recherche exacte, même avec un index ANN)
+            if len(rows) <= _GATHER_FRACTION * len(self):
+                row_scores = np.asarray(self.matrix[rows]) @ query
+            else:
+                row_scores = (self.matrix @ query)[rows]
+            best = _best(row_scores, fetch)
+            idx, scores = rows[best], row_scores[best]
+
+        if diversify and len(idx):
+            idx, scores = self._diversify(query, idx, scores, k, mmr_lambda, per_podcast)
+        results = []
+        for rank, (i, score) in enumerate(zip(idx, scores), start=1):
+            row = self.row(int(i))
+            results.append({
+                "rank": rank,
+                "podcast_title": row.get("podcast_title") or "Unknown",
+                "episode_title": row.get("episode_title") or "Unknown",
+                "description": row.get("episode_description") or "",
+                "episode_link": row.get("episode_link") or "N/A",
+                "language": row.get("language"),
+                "published_at": row.get("published_at"),
+                "score": float(score)
+            })
+        return results
+
+
+def write_metadata(index_dir: str, count: int, dim: int, columns: Dict[str, List[Any]],
+                   meta: Dict[str, Any]) -> None:
+    # Version du catalogue, nouvelle à chaque écriture : l’index ANN garde celle des vecteurs
+    # sur lesquels il a été entraîné (un catalogue modifié à nombre d’épisodes égal est détecté)
+    payload = dict(meta, count=int(count), dim=int(dim), version=uuid.uuid4().hex, columns=columns)
+
+    def write_meta(path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+    _atomic_replace(os.path.join(index_dir, METADATA_FILE), write_meta)
+
+
+def write_index(index_dir: str, vectors: np.ndarray, columns: Dict[str, List[Any]], meta: Dict[str, Any]) -> None:
+    """
+    Écrit la matrice puis les métadonnées, chacune de façon atomique. Les métadonnées
+    (écrites en dernier) portent le nombre de lignes : un index lu pendant l’écriture
+    est détecté comme incohérent plutôt que mal aligné.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    _atomic_replace(os.path.join(index_dir, VECTORS_FILE), lambda p: vectors.tofile(p))
+    write_metadata(index_dir, vectors.shape[0], vectors.shape[1], columns, meta)
+
+
+# Index chargé une fois par process, remplacé après une reconstruction
+_INDEX: Optional[RecommendationIndex] = None
+_INDEX_LOCK = threading.Lock()
+_STATS = {"loads": 0, "load_seconds": None, "queries": 0}
+
+
+def get_recommendation_index(index_dir: str = RECO_INDEX_DIR) -> RecommendationIndex:
+    global _INDEX
+    with _INDEX_LOCK:
+        if _INDEX is None:
+            start = time.perf_counter()
+            # Avec IVF-PQ, la matrice complète reste sur disque (memmap) : seuls les candidats re-scorés sont lus
+            _INDEX = RecommendationIndex.load(index_dir, mmap=RECO_INDEX_BACKEND == "ivfpq")
+            _INDEX.ann = load_ann_index(index_dir, len(_INDEX), version=_INDEX.meta.get("version", ""))
+            _STATS["loads"] += 1
+            _STATS["load_seconds"] = round(time.perf_counter() - start, 3)
+            logger.info(f"Index de recommandation chargé : {len(_INDEX)} épisodes en {_STATS['load_seconds']}s")
+        return _INDEX
+
+
+def reload_recommendation_index(index_dir: str = RECO_INDEX_DIR) -> RecommendationIndex:
+    global _INDEX
+    with _INDEX_LOCK:
+        _INDEX = None
+    return get_recommendation_index(index_dir)
+
+
+def recommend(text: str, k: int = RECO_TOP_K, embedder=None, **search_kwargs) -> List[Dict[str, Any]]:
+    """
+    Recommandations pour un texte (ex. résumé global) : un embedding puis un top-k matriciel.
+    `search_kwargs` : nprobe, filters, mmr_lambda, per_podcast (voir RecommendationIndex.search).
+    """
+    if embedder is None:
+        from embedding import get_embedder
+        embedder = get_embedder()
+    index = get_recommendation_index()
+    with _INDEX_LOCK:
+        _STATS["queries"] += 1
+    return index.search(embedder.encode([text])[0], k, **search_kwargs)
+
+
+def get_stats() -> dict:
+    with _INDEX_LOCK:
+        return {
+            "episodes": len(_INDEX) if _INDEX is not None else None,
+            "backend": RECO_INDEX_BACKEND if _INDEX is not None and _INDEX.ann is not None else "exact",
+            **_STATS
+        }
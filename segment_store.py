@@ -0,0 +1,167 @@
+
+import os
+import threading
+import logging
+from collections import OrderedDict
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Longueur du préfixe utilisé pour retrouver un extrait (chapitre, source RAG) dans le transcript
+LOCATE_PREFIX_CHARS = 80
+_LOADED_ITEMS = 32
+
+
+def normalize(text: str) -> str:
+    """Même normalisation que chaptering.split_into_chunks : espaces compactés."""
+    return " ".join(text.split())
+
+
+def segments_path(audio_path: str) -> str:
+    """Les timestamps sont rangés à côté de l’audio : <audio>.segments.npz"""
+    return audio_path + ".segments.npz"
+
+
+class SegmentStore:
+    """
+    Index temporel compact d’un transcript whisper :
+      - starts / ends : float32, début et fin de chaque segment (secondes)
+      - offsets       : int64, position du début de chaque segment dans `text`
+      - text          : un seul buffer, texte normalisé des segments joints par des espaces
+    `text` est identique au transcript normalisé utilisé par la segmentation en chapitres,
+    donc un extrait de chapitre ou de chunk s’y retrouve par simple recherche.
+    """
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, offsets: np.ndarray, text: str):
+        self.starts = np.asarray(starts, dtype=np.float32)
+        self.ends = np.asarray(ends, dtype=np.float32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.text = text
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @classmethod
+    def from_segments(cls, segments: Iterable) -> "SegmentStore":
+        starts, ends, offsets, parts = [], [], [], []
+        position = 0
+        for seg in segments:
+            piece = normalize(seg.text)
+            if not piece:
+                continue
+            if parts:
+                position += 1  # espace de jointure
+            starts.append(seg.start)
+            ends.append(seg.end)
+            offsets.append(position)
+            parts.append(piece)
+            position += len(piece)
+        return cls(np.array(starts), np.array(ends), np.array(offsets), " ".join(parts))
+
+    # ---------- recherche ----------
+    def segment_at(self, char_offset: int) -> int:
+        """Indice du segment contenant `char_offset` (recherche dichotomique)."""
+        idx = int(np.searchsorted(self.offsets, char_offset, side="right")) - 1
+        return min(max(idx, 0), len(self.offsets) - 1)
+
+    def time_at(self, char_offset: int) -> Optional[float]:
+        """Timestamp (secondes) du segment contenant `char_offset`."""
+        if not len(self):
+            return None
+        return float(self.starts[self.segment_at(char_offset)])
+
+    def find(self, snippet: str, start: int = 0) -> int:
+        """
+        Position de `snippet` dans le buffer (via son préfixe normalisé), en cherchant
+        d’abord à partir de `start` puis depuis le début. -1 si introuvable.
+        """
+        prefix = normalize(snippet)[:LOCATE_PREFIX_CHARS]
+        if not prefix:
+            return -1
+        pos = self.text.find(prefix, start)
+        if pos < 0 and start > 0:
+            pos = self.text.find(prefix)
+        return pos
+
+    def locate(self, snippet: str, start: int = 0) -> Optional[float]:
+        """Timestamp de début d’un extrait du transcript, ou None."""
+        pos = self.find(snippet, start)
+        return self.time_at(pos) if pos >= 0 else None
+
+    def locate_sequence(self, snippets: List[str]) -> List[Optional[float]]:
+        """
+        Timestamps d’extraits qui se suivent dans le transcript (ex. chapitres) :
+        chaque recherche repart de la position du précédent.
+        """
+        times, cursor = [], 0
+        for snippet in snippets:
+            pos = self.find(snippet, cursor)
+            if pos >= 0:
+                cursor = pos
+                times.append(self.time_at(pos))
+            else:
+                times.append(None)
+        return times
+
+    # ---------- persistance ----------
+    def save(self, path: str) -> None:
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            starts=self.starts,
+            ends=self.ends,
+            offsets=self.offsets,
+            text=np.frombuffer(self.text.encode("utf-8"), dtype=np.uint8)
+        )
+        os.replace(tmp_path, path)
+        logger.info(f"{len(self)} segments horodatés enregistrés dans {path}")
+
+    @classmethod
+    def load(cls, path: str) -> "SegmentStore":
+        with np.load(path) as data:
+            return cls(data["starts"], data["ends"], data["offsets"], data["text"].tobytes().decode("utf-8"))
+
+
+class SegmentRecorder:
+    """
+    Enveloppe un générateur de segments whisper : les segments passent tels quels
+    (pour la pipeline streaming) et sont mémorisés pour construire le SegmentStore.
+    """
+
+    def __init__(self):
+        self.segments = []
+
+    def record(self, segments: Iterable) -> Iterator:
+        for seg in segments:
+            self.segments.append(seg)
+            yield seg
+
+    def build(self) -> SegmentStore:
+        return SegmentStore.from_segments(self.segments)
+
+
+_LOADED: "OrderedDict[tuple, SegmentStore]" = OrderedDict()
+_LOADED_LOCK = threading.Lock()
+
+
+def load_segment_store(path: Optional[str]) -> Optional[SegmentStore]:
+    """
+    Charge (avec un petit cache mémoire, invalidé par mtime) le SegmentStore de `path`.
+    None si le fichier n’existe pas.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    key = (path, os.path.getmtime(path))
+    with _LOADED_LOCK:
+        store = _LOADED.get(key)
+        if store is not None:
+            _LOADED.move_to_end(key)
+            return store
+    store = SegmentStore.load(path)
+    with _LOADED_LOCK:
+        _LOADED[key] = store
+        while len(_LOADED) > _LOADED_ITEMS:
+            _LOADED.popitem(last=False)
+    return store
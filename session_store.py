@@ -0,0 +1,293 @@
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# —————— Config ——————
+SESSION_DIR = os.getenv("SESSION_DIR", os.path.join("data", "sessions"))
+# Sessions gardées en mémoire (LRU) et inactivité maximale avant éviction
+SESSION_MAX_ITEMS = int(os.getenv("SESSION_MAX_ITEMS", "500"))
+SESSION_IDLE_TTL_SECONDS = float(os.getenv("SESSION_IDLE_TTL_SECONDS", str(2 * 3600)))
+# Budget mémoire des transcripts des sessions chargées
+SESSION_MAX_MB = float(os.getenv("SESSION_MAX_MB", "256"))
+# Les sessions et transcripts persistés non relus depuis N jours sont supprimés du disque
+SESSION_DISK_TTL_DAYS = float(os.getenv("SESSION_DISK_TTL_DAYS", "30"))
+
+# Champs légers persistés sur disque ; raw_text est rangé à part (un fichier par transcript)
+PERSISTED_FIELDS = ("transcript_id", "audio_filename", "segments_path", "collection", "rag_ready", "job_id")
+# Champs lourds reconstruits à la demande après une éviction
+LAZY_FIELDS = ("raw_text", "chain", "retriever")
+_PURGE_INTERVAL = 3600.0
+
+
+def empty_state() -> Dict[str, Any]:
+    return {
+        "raw_text": None,
+        "transcript_id": None,
+        "audio_filename": None,
+        "segments_path": None,
+        "collection": None,
+        "rag_ready": False,
+        "chain": None,
+        "retriever": None,
+        "job_id": None
+    }
+
+
+class SessionState(dict):
+    """
+    État d’une session (même interface qu’un dict). Après une éviction, `raw_text` est relu
+    depuis le disque et `chain` / `retriever` sont reconstruits depuis la collection
+    au premier accès.
+    """
+
+    def __init__(self, uid: str, store: "SessionStore", fields: Dict[str, Any]):
+        super().__init__(fields)
+        self.uid = uid
+        self._store = store
+
+    def __getitem__(self, key):
+        value = dict.get(self, key)
+        if value is None and key in LAZY_FIELDS and dict.get(self, "transcript_id"):
+            value = self._store._restore(self, key)
+        elif value is None and key not in self:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        try:
+            value = self[key]
+        except KeyError:
+            return default
+        return default if value is None else value
+
+    def __setitem__(self, key, value):
+        if key == "raw_text":
+            self._store._resize(self, dict.get(self, "raw_text"), value)
+        super().__setitem__(key, value)
+
+
+def _text_bytes(text: Optional[str]) -> int:
+    return sys.getsizeof(text) if text else 0
+
+
+class SessionStore:
+    """
+    États de session bornés : LRU sur `max_items`, éviction après `idle_ttl` secondes
+    d’inactivité, et budget `max_bytes` sur la taille des transcripts en mémoire.
+
+    Une session évincée est persistée (champs légers en JSON, transcript dans un fichier
+    par hash) puis relue au besoin ; la chaîne RAG est reconstruite par `rebuild_chain(collection)`.
+    Les sessions dont un job d’ingestion est en cours sont épinglées et jamais évincées.
+    """
+
+    def __init__(
+        self,
+        rebuild_chain: Optional[Callable[[str], Tuple[Any, Any]]] = None,
+        session_dir: str = SESSION_DIR,
+        max_items: int = SESSION_MAX_ITEMS,
+        idle_ttl: float = SESSION_IDLE_TTL_SECONDS,
+        max_mb: float = SESSION_MAX_MB
+    ):
+        self.rebuild_chain = rebuild_chain
+        self.dir = session_dir
+        self._transcripts_dir = os.path.join(session_dir, "transcripts")
+        os.makedirs(self._transcripts_dir, exist_ok=True)
+        self.max_items = max_items
+        self.idle_ttl = idle_ttl
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.RLock()
+        self._states: "OrderedDict[str, SessionState]" = OrderedDict()
+        self._last_seen: Dict[str, float] = {}
+        self._pinned: Dict[str, int] = {}
+        self._bytes = 0
+        self._last_purge = 0.0
+        self._counters = {"created": 0, "restored": 0, "evicted": 0, "rebuilt": 0}
+
+    # ---------- disque ----------
+    def _session_path(self, uid: str) -> str:
+        return os.path.join(self.dir, f"{uid}.json")
+
+    def _transcript_path(self, transcript_id: str) -> str:
+        return os.path.join(self._transcripts_dir, f"{transcript_id}.txt")
+
+    @staticmethod
+    def _atomic_write(path: str, text: str) -> None:
+        tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def persist(self, state: SessionState) -> None:
+        """Écrit les champs légers de la session et son transcript (une fois par hash)."""
+        transcript_id = dict.get(state, "transcript_id")
+        raw_text = dict.get(state, "raw_text")
+        try:
+            if transcript_id and raw_text:
+                path = self._transcript_path(transcript_id)
+                if os.path.exists(path):
+                    os.utime(path)
+                else:
+                    self._atomic_write(path, raw_text)
+            fields = {key: dict.get(state, key) for key in PERSISTED_FIELDS}
+            self._atomic_write(self._session_path(state.uid), json.dumps(fields))
+        except OSError as e:
+            logger.error(f"Impossible de persister la session {state.uid} : {e}")
+
+    def _load(self, uid: str) -> Optional[SessionState]:
+        try:
+            with open(self._session_path(uid), "r", encoding="utf-8") as f:
+                fields = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        state = empty_state()
+        state.update({key: fields.get(key, state[key]) for key in PERSISTED_FIELDS})
+        return SessionState(uid, self, state)
+
+    def _restore(self, state: SessionState, key: str) -> Any:
+        """Reconstruit un champ lourd (appelé par SessionState.__getitem__)."""
+        transcript_id = dict.get(state, "transcript_id")
+        if key == "raw_text":
+            try:
+                with open(self._transcript_path(transcript_id), "r", encoding="utf-8") as f:
+                    text = f.read()
+            except FileNotFoundError:
+                return None
+            with self._lock:
+                state["raw_text"] = text
+            return text
+
+        collection = dict.get(state, "collection")
+        if not dict.get(state, "rag_ready") or not collection or self.rebuild_chain is None:
+            return None
+        try:
+            chain, retriever = self.rebuild_chain(collection)
+        except Exception as e:
+            logger.error(f"Reconstruction de la chaîne RAG impossible ({collection}) : {e}")
+            return None
+        dict.__setitem__(state, "chain", chain)
+        dict.__setitem__(state, "retriever", retriever)
+        with self._lock:
+            self._counters["rebuilt"] += 1
+        logger.info(f"Chaîne RAG reconstruite pour la session {state.uid}")
+        return chain if key == "chain" else retriever
+
+    def _purge_disk(self, now: float) -> None:
+        if now - self._last_purge < _PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        cutoff = now - SESSION_DISK_TTL_DAYS * 86400
+        for folder in (self.dir, self._transcripts_dir):
+            for name in os.listdir(folder):
+                path = os.path.join(folder, name)
+                try:
+                    if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except OSError:
+                    continue
+
+    # ---------- mémoire ----------
+    def _resize(self, state: SessionState, old: Optional[str], new: Optional[str]) -> None:
+        with self._lock:
+            if self._states.get(state.uid) is state:
+                self._bytes += _text_bytes(new) - _text_bytes(old)
+
+    def _evict(self, uid: str) -> None:
+        state = self._states.pop(uid)
+        self._last_seen.pop(uid, None)
+        self._bytes -= _text_bytes(dict.get(state, "raw_text"))
+        self.persist(state)
+        self._counters["evicted"] += 1
+
+    def _sweep(self, now: float) -> None:
+        # Ordre LRU : les plus anciennes sessions sont en tête
+        for uid in list(self._states):
+            if now - self._last_seen.get(uid, now) <= self.idle_ttl:
+                break
+            if uid not in self._pinned:
+                self._evict(uid)
+        for uid in list(self._states):
+            if len(self._states) <= self.max_items and self._bytes <= self.max_bytes:
+                break
+            if uid not in self._pinned:
+                self._evict(uid)
+
+    # ---------- API ----------
+    def get(self, uid: str) -> SessionState:
+        """État de la session `uid` : en mémoire, relu depuis le disque, ou créé vide."""
+        now = time.time()
+        with self._lock:
+            state = self._states.get(uid)
+            if state is None:
+                state = self._load(uid)
+                if state is not None:
+                    self._counters["restored"] += 1
+                else:
+                    state = SessionState(uid, self, empty_state())
+                    self._counters["created"] += 1
+                self._states[uid] = state
+                self._bytes += _text_bytes(dict.get(state, "raw_text"))
+            self._states.move_to_end(uid)
+            self._last_seen[uid] = now
+            self._sweep(now)
+            self._purge_disk(now)
+            # La session courante reste accessible même si elle dépasse seule le budget
+            if uid not in self._states:
+                self._states[uid] = state
+                self._last_seen[uid] = now
+                self._bytes += _text_bytes(dict.get(state, "raw_text"))
+            return state
+
+    def pin(self, state: SessionState) -> None:
+        """Empêche l’éviction de la session (job d’ingestion en cours)."""
+        with self._lock:
+            self._pinned[state.uid] = self._pinned.get(state.uid, 0) + 1
+
+    def release(self, state: SessionState) -> None:
+        """Fin du job : désépingle et persiste la session."""
+        with self._lock:
+            count = self._pinned.get(state.uid, 0) - 1
+            if count > 0:
+                self._pinned[state.uid] = count
+            else:
+                self._pinned.pop(state.uid, None)
+        self.persist(state)
+
+    def collections(self) -> Set[str]:
+        """
+        Collections référencées par une session, en mémoire ou persistée sur disque
+        (à exclure du GC des collections : une session relue reconstruit sa chaîne depuis elle).
+        """
+        with self._lock:
+            names = {dict.get(state, "collection") for state in self._states.values()}
+        try:
+            files = [name for name in os.listdir(self.dir) if name.endswith(".json")]
+        except FileNotFoundError:
+            files = []
+        for name in files:
+            try:
+                with open(os.path.join(self.dir, name), "r", encoding="utf-8") as f:
+                    names.add(json.load(f).get("collection"))
+            except (OSError, ValueError, AttributeError):
+                continue
+        names.discard(None)
+        return names
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._states),
+                "pinned": len(self._pinned),
+                "bytes": self._bytes,
+                "max_items": self.max_items,
+                "max_bytes": self.max_bytes,
+                "idle_ttl_seconds": self.idle_ttl,
+                **self._counters
+            }
@@ -0,0 +1,126 @@
+
+import os
+import time
+import logging
+import threading
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from chunking import IncrementalChunker
+from vectorstore import add_chunks
+
+logger = logging.getLogger(__name__)
+
+# —————— Config ——————
+STREAMING_INGEST = os.getenv("STREAMING_INGEST", "1") != "0"
+# Nombre de chunks accumulés avant un upsert Chroma
+STREAMING_BATCH_CHUNKS = int(os.getenv("STREAMING_BATCH_CHUNKS", "8"))
+# Avancement minimal entre deux appels à on_progress pour une même étape
+_PROGRESS_STEP = 0.01
+
+# Dernières mesures, exposées sur /metrics
+_STATS_LOCK = threading.Lock()
+_STATS = {"runs": 0, "last": None}
+
+
+def stream_ingest(
+    segments: Iterable,
+    duration: float,
+    vectordb,
+    on_ready: Optional[Callable[[str], None]] = None,
+    on_text: Optional[Callable[[str], None]] = None,
+    on_progress: Optional[Callable[[str, float], None]] = None,
+    batch_chunks: int = STREAMING_BATCH_CHUNKS,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200
+) -> Tuple[str, dict]:
+    """
+    Pipeline générateur : segments whisper → découpage incrémental → upserts Chroma par lots.
+
+    - on_text(texte_partiel)  : appelé après chaque lot avec le transcript reçu jusque-là
+    - on_ready(texte_partiel) : appelé une seule fois, dès que le premier lot est indexé
+                                (la pipeline RAG peut alors être interrogée)
+    - on_progress(étape, fraction) : avancement propre à chaque étape, en fraction de la durée audio :
+                                "transcribe" (audio décodé), "chunk" (audio découpé en chunks),
+                                "index" (audio dont les chunks sont indexés)
+
+    `time_to_first_queryable` mesure le délai jusqu’à la fin de on_ready (chaîne prête),
+    pas la génération d’une première réponse.
+
+    Retourne (transcript complet, rapport de mesures).
+    """
+    start = time.perf_counter()
+    chunker = IncrementalChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    parts: List[str] = []
+    pending: List[str] = []
+    report = {
+        "audio_seconds": round(duration, 1),
+        "segments": 0,
+        "chunks": 0,
+        "time_to_first_segment": None,
+        "time_to_first_index": None,
+        "time_to_first_queryable": None,
+        "total_seconds": None
+    }
+    position = 0.0
+    chunked_position = 0.0
+    reported = {}
+
+    def progress(stage: str, seconds: float):
+        if on_progress is None or duration <= 0:
+            return
+        fraction = min(1.0, seconds / duration)
+        if fraction - reported.get(stage, 0.0) >= _PROGRESS_STEP or (fraction == 1.0 and reported.get(stage) != 1.0):
+            reported[stage] = fraction
+            on_progress(stage, fraction)
+
+    def flush_batch():
+        if not pending:
+            return
+        add_chunks(vectordb, pending)
+        report["chunks"] += len(pending)
+        pending.clear()
+        text = "\n".join(parts)
+        if report["time_to_first_index"] is None:
+            report["time_to_first_index"] = round(time.perf_counter() - start, 3)
+            if on_ready is not None:
+                on_ready(text)
+            report["time_to_first_queryable"] = round(time.perf_counter() - start, 3)
+            logger.info(f"Premier lot indexé : pipeline RAG interrogeable après "
+                        f"{report['time_to_first_queryable']:.1f}s ({position:.0f}s d’audio)")
+        if on_text is not None:
+            on_text(text)
+        progress("index", chunked_position)
+
+    for seg in segments:
+        if report["time_to_first_segment"] is None:
+            report["time_to_first_segment"] = round(time.perf_counter() - start, 3)
+        report["segments"] += 1
+        position = float(seg.end)
+        parts.append(seg.text)
+        progress("transcribe", position)
+        chunks = chunker.feed(seg.text)
+        if chunks:
+            pending.extend(chunks)
+            chunked_position = position
+            progress("chunk", chunked_position)
+        if len(pending) >= batch_chunks:
+            flush_batch()
+
+    pending.extend(chunker.flush())
+    chunked_position = position
+    progress("chunk", chunked_position)
+    flush_batch()
+
+    raw_text = "\n".join(parts)
+    report["total_seconds"] = round(time.perf_counter() - start, 3)
+    logger.info(f"Ingestion streaming terminée : {report}")
+
+    with _STATS_LOCK:
+        _STATS["runs"] += 1
+        _STATS["last"] = dict(report)
+    return raw_text, report
+
+
+def get_stats() -> dict:
+    with _STATS_LOCK:
+        return {"enabled": STREAMING_INGEST, "runs": _STATS["runs"], "last": _STATS["last"]}
@@ -0,0 +1,39 @@
+import numpy as np
+
+from answer_cache import AnswerCacheRegistry
+
+SCOPE = "tr-test"
+
+
+def _vector(seed):
+    return np.random.default_rng(seed).normal(size=32).astype(np.float32)
+
+
+def test_answer_from_partial_index_is_not_reused_after_more_chunks():
+    registry = AnswerCacheRegistry()
+    question = _vector(0)
+
+    # Premier lot indexé : une réponse est produite et mise en cache
+    version = registry.version(SCOPE)
+    registry.put(SCOPE, question, "Q ?", "réponse partielle", [], version=version)
+    assert registry.lookup(SCOPE, question)["answer"] == "réponse partielle"
+
+    # Nouveaux chunks indexés : la même question (ou une question voisine) n’est plus servie
+    registry.invalidate(SCOPE)
+    assert registry.lookup(SCOPE, question) is None
+    assert registry.lookup(SCOPE, question + 0.01) is None
+
+
+def test_answer_generated_before_invalidation_is_dropped():
+    registry = AnswerCacheRegistry()
+    question = _vector(1)
+
+    # Recherche sur l’index partiel, puis indexation d’un lot pendant la génération
+    version = registry.version(SCOPE)
+    registry.invalidate(SCOPE)
+    registry.put(SCOPE, question, "Q ?", "réponse partielle", [], version=version)
+    assert registry.lookup(SCOPE, question) is None
+
+    # Une réponse produite sur l’index à jour est bien enregistrée
+    registry.put(SCOPE, question, "Q ?", "réponse complète", [], version=registry.version(SCOPE))
+    assert registry.lookup(SCOPE, question)["answer"] == "réponse complète"
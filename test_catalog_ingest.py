@@ -0,0 +1,45 @@
+import io
+import json
+import random
+
+import pytest
+
+from catalog_ingest import iter_json_array
+
+
+def _random_value(rng, depth=0):
+    kind = rng.choice(["int", "float", "exp", "str", "literal", "list", "dict"] if depth < 2 else
+                      ["int", "float", "exp", "str", "literal"])
+    if kind == "int":
+        return rng.randint(-10 ** 6, 10 ** 6)
+    if kind == "float":
+        return round(rng.uniform(-1000, 1000), rng.randint(1, 6))
+    if kind == "exp":
+        return float(f"{rng.uniform(1, 9):.3f}e{rng.randint(-20, 20)}")
+    if kind == "str":
+        return "".join(rng.choice("abc é,]\"\\ {}[") for _ in range(rng.randint(0, 12)))
+    if kind == "literal":
+        return rng.choice([True, False, None])
+    if kind == "list":
+        return [_random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return {f"k{i}": _random_value(rng, depth + 1) for i in range(rng.randint(0, 4))}
+
+
+@pytest.mark.parametrize("text", ["[1.5]", "[0.25, 1]", "[2e10,3.5E-3 , -0.0]", "[true,false,null]", "[]"])
+def test_numbers_split_by_chunk_boundary(text):
+    for chunk_size in range(1, len(text) + 2):
+        assert list(iter_json_array(io.StringIO(text), chunk_size)) == json.loads(text)
+
+
+def test_chunk_size_fuzz():
+    rng = random.Random(0)
+    for _ in range(200):
+        items = [_random_value(rng) for _ in range(rng.randint(0, 8))]
+        text = json.dumps(items, ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, 1]))
+        for chunk_size in (1, 2, 3, 5, 7, 16):
+            assert list(iter_json_array(io.StringIO(text), chunk_size)) == items
+
+
+def test_truncated_array_is_rejected():
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO("[1, 2"), 2))
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from http_client import PooledHttpClient
+
+RETRY_AFTER = 1
+
+
+@pytest.fixture
+def upstream():
+    """Serveur local qui répond selon une liste de statuts et note l’heure de chaque requête."""
+    calls = []
+    script = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            calls.append(time.monotonic())
+            status = script[min(len(calls), len(script)) - 1]
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", str(RETRY_AFTER))
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/", script, calls
+    server.shutdown()
+    server.server_close()
+
+
+def test_retries_429_then_5xx_until_success(upstream):
+    url, script, calls = upstream
+    script.extend([429, 503, 503, 200])
+    client = PooledHttpClient(max_retries=3, backoff_base=0.01, backoff_max=5)
+
+    response = client.post(url, json={})
+
+    assert response.status_code == 200
+    assert len(calls) == 4
+    assert client.stats()["retries"] == 3
+    # Retry-After respecté entre la réponse 429 et la tentative suivante
+    assert calls[1] - calls[0] >= RETRY_AFTER - 0.05
+    # Backoff exponentiel court sur les 503 (pas de Retry-After)
+    assert calls[3] - calls[1] < RETRY_AFTER
+
+
+def test_gives_up_after_retry_budget(upstream):
+    url, script, calls = upstream
+    script.append(503)
+    client = PooledHttpClient(max_retries=2, backoff_base=0.01, backoff_max=5)
+
+    with pytest.raises(requests.HTTPError):
+        client.post(url, json={})
+
+    assert len(calls) == 3
+    assert client.stats()["retries"] == 2
+    assert client.stats()["errors"] == 1
+
+
+def test_async_batches_share_the_process_concurrency_budget():
+    """Plusieurs lots asynchrones simultanés (et un appel synchrone) restent sous max_concurrency."""
+    lock = threading.Lock()
+    active = [0]
+    peak = [0]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.1)
+            with lock:
+                active[0] -= 1
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/"
+    client = PooledHttpClient(max_concurrency=2)
+
+    async def batch():
+        async with client.async_session() as aclient:
+            return await asyncio.gather(*(client.apost(aclient, url, json={}) for _ in range(4)))
+
+    async def main():
+        return await asyncio.gather(batch(), batch(), asyncio.to_thread(client.post, url, json={}))
+
+    try:
+        first, second, single = asyncio.run(main())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert len(first) == len(second) == 4 and single.status_code == 200
+    assert peak[0] <= 2
+    assert client.stats()["in_flight"] == 0
@@ -0,0 +1,67 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from model import generate_batched, length_sorted_batches
+
+PAD = 0
+
+
+class _Batch(dict):
+    def to(self, device):
+        return self
+
+
+class StubTokenizer:
+    """Un caractère = un token ; le padding (à droite) est retiré au décodage."""
+
+    def __call__(self, texts, truncation=True, max_length=None):
+        ids = [[ord(c) for c in text][:max_length] for text in texts]
+        return {"input_ids": ids, "attention_mask": [[1] * len(row) for row in ids]}
+
+    def pad(self, features, padding="longest", return_tensors="pt"):
+        width = max(len(f["input_ids"]) for f in features)
+        return _Batch(
+            input_ids=torch.tensor([f["input_ids"] + [PAD] * (width - len(f["input_ids"])) for f in features]),
+            attention_mask=torch.tensor([f["attention_mask"] + [0] * (width - len(f["input_ids"])) for f in features])
+        )
+
+    def batch_decode(self, sequences, skip_special_tokens=True):
+        return ["".join(chr(i) for i in row.tolist() if i != PAD) for row in sequences]
+
+
+class StubModel:
+    """`generate` renvoie l’entrée à l’envers : la sortie dépend de la ligne, pas de sa position dans le batch."""
+    device = "cpu"
+
+    def __init__(self):
+        self.calls = []
+
+    def generate(self, input_ids, attention_mask, **kwargs):
+        self.calls.append(len(input_ids))
+        return torch.stack([
+            torch.cat([row[mask.bool()].flip(0), row[~mask.bool()]]) for row, mask in zip(input_ids, attention_mask)
+        ])
+
+
+TEXTS = ["court", "un texte nettement plus long", "moyen texte", "x", "encore un texte de taille moyenne"]
+
+
+def test_generate_batched_matches_one_call_per_text():
+    batched_model = StubModel()
+    batched = generate_batched(TEXTS, StubTokenizer(), batched_model, token_budget=64,
+                               max_input_tokens=512, generation_kwargs={})
+    single = [generate_batched([t], StubTokenizer(), StubModel(), token_budget=64,
+                               max_input_tokens=512, generation_kwargs={})[0] for t in TEXTS]
+
+    assert batched == single == [t[::-1] for t in TEXTS]
+    # Plusieurs textes par appel `generate`, dans un ordre différent de l’entrée
+    assert len(batched_model.calls) < len(TEXTS)
+
+
+def test_length_sorted_batches_covers_each_index_once():
+    lengths = [5, 28, 11, 1, 33]
+    batches = length_sorted_batches(lengths, token_budget=64)
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    assert all(max(lengths[i] for i in batch) * len(batch) <= 64 or len(batch) == 1 for batch in batches)
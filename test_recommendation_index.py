@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from ann_index import ANN_FILE, build_ann_index, load_ann_index
+from numpy_index import _normalize_rows
+from recommendation_index import RECO_MAX_TOP_K, RecommendationIndex, write_index
+
+
+@pytest.fixture
+def index(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 200
+    columns = {
+        "podcast_title": [f"Podcast {i % 4}" for i in range(n)],
+        "episode_title": [f"Épisode {i}" for i in range(n)],
+        "episode_description": [""] * n,
+        "episode_link": [""] * n,
+        "language": ["fr" if i % 2 else "en" for i in range(n)],
+        "published_at": [f"2024-{1 + i % 12:02d}-01" for i in range(n)]
+    }
+    write_index(str(tmp_path), _normalize_rows(rng.normal(size=(n, 16))), columns, {})
+    return RecommendationIndex.load(str(tmp_path))
+
+
+def test_per_podcast_cap_applies_without_podcast_filter(index):
+    results = index.search(index.matrix[0], 5, per_podcast=1)
+    assert len({r["podcast_title"] for r in results}) == len(results) == 4
+
+
+def test_podcast_filter_disables_per_podcast_cap(index):
+    results = index.search(index.matrix[0], 5, filters={"podcast_title": "podcast 2"}, per_podcast=2)
+    assert len(results) == 5
+    assert {r["podcast_title"] for r in results} == {"Podcast 2"}
+
+
+def test_top_k_is_bounded(index):
+    with pytest.raises(ValueError):
+        index.search(index.matrix[0], RECO_MAX_TOP_K + 1)
+    # k plus grand que le catalogue filtré : pas d’erreur, autant de résultats que de lignes
+    assert len(index.search(index.matrix[0], RECO_MAX_TOP_K, filters={"podcast_title": "Podcast 1"})) == 50
+
+
+def test_ann_index_is_stale_after_catalog_rewrite_with_same_count(index, tmp_path):
+    index_dir = str(tmp_path)
+    build_ann_index(index.matrix, index_dir, backend="ivf", nlist=4, version=index.meta["version"])
+    assert load_ann_index(index_dir, len(index), backend="ivf", version=index.meta["version"]) is not None
+
+    # Même nombre d’épisodes, vecteurs différents : nouvelle version du catalogue
+    write_index(index_dir, index.matrix[::-1], index.columns, {})
+    rewritten = RecommendationIndex.load(index_dir)
+    assert len(rewritten) == len(index)
+    assert load_ann_index(index_dir, len(rewritten), backend="ivf", version=rewritten.meta["version"]) is None
+
+
+def test_ivf_scores_on_catalog_matrix_without_copy(index, tmp_path):
+    ann = build_ann_index(index.matrix, str(tmp_path), backend="ivf", nlist=4)
+    with np.load(tmp_path / ANN_FILE) as data:
+        assert "vectors" not in data.files
+    # Toutes les listes visitées : même top-k que la recherche exacte
+    query = index.matrix[7]
+    ids, scores = ann.search(query, 10, nprobe=ann.nlist, full_vectors=index.matrix)
+    exact = np.argsort(-(index.matrix @ query), kind="stable")[:10]
+    assert ids.tolist() == exact.tolist()
+    np.testing.assert_allclose(scores, index.matrix[exact] @ query, rtol=1e-5)
@@ -0,0 +1,147 @@
+
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from typing import Optional
+
+from segment_store import SegmentStore
+
+logger = logging.getLogger(__name__)
+
+# —————— Config ——————
+TRANSCRIPT_CACHE_DIR = os.getenv("TRANSCRIPT_CACHE_DIR", os.path.join("data", "cache", "transcripts"))
+TRANSCRIPT_CACHE_MAX_MB = float(os.getenv("TRANSCRIPT_CACHE_MAX_MB", "512"))
+
+_YOUTUBE_ID = re.compile(r"(?:v=|/shorts/|/embed/|/live/|youtu\.be/)([A-Za-z0-9_-]{11})")
+
+
+def youtube_video_id(url: str) -> Optional[str]:
+    """Extrait l’identifiant (11 caractères) d’une URL YouTube, sans appel réseau."""
+    match = _YOUTUBE_ID.search(url)
+    return match.group(1) if match else None
+
+
+def _settings_tag(model_size: str, beam_size: int) -> str:
+    return f"whisper={model_size}|int8|beam={beam_size}"
+
+
+def audio_cache_key(audio_path: str, model_size: str, beam_size: int) -> str:
+    """Clé de contenu : SHA-256 des octets audio + réglages whisper."""
+    h = hashlib.sha256()
+    with open(audio_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    h.update(_settings_tag(model_size, beam_size).encode("utf-8"))
+    return "audio-" + h.hexdigest()
+
+
+def youtube_cache_key(video_id: str, model_size: str, beam_size: int) -> str:
+    """Clé YouTube : identifiant de vidéo + réglages whisper (connue avant tout téléchargement)."""
+    h = hashlib.sha256(f"{video_id}|{_settings_tag(model_size, beam_size)}".encode("utf-8"))
+    return "yt-" + h.hexdigest()
+
+
+class TranscriptCache:
+    """
+    Cache disque des transcriptions : une entrée par clé, dans un dossier contenant
+    `transcript.txt`, `segments.npz` (timestamps) et `meta.json`.
+
+    La date de modification de `meta.json` sert d’horodatage LRU (mise à jour à chaque hit) ;
+    au-delà de `max_bytes`, les entrées les moins récemment utilisées sont supprimées.
+    """
+
+    def __init__(self, cache_dir: str = TRANSCRIPT_CACHE_DIR, max_mb: float = TRANSCRIPT_CACHE_MAX_MB):
+        self.dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        os.makedirs(self.dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.dir, key)
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Retourne {"text", "segments_path", **meta} ou None. Un hit rafraîchit l’entrée (LRU).
+        """
+        entry = self._entry(key)
+        meta_path = os.path.join(entry, "meta.json")
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(os.path.join(entry, "transcript.txt"), "r", encoding="utf-8") as f:
+                text = f.read()
+            os.utime(meta_path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        segments_file = os.path.join(entry, "segments.npz")
+        meta["text"] = text
+        meta["segments_path"] = segments_file if os.path.exists(segments_file) else None
+        logger.info(f"Transcript servi depuis le cache ({key[:20]}…)")
+        return meta
+
+    def put(self, key: str, text: str, store: Optional[SegmentStore] = None, **meta) -> None:
+        """
+        Enregistre une transcription (écriture dans un dossier temporaire puis renommage atomique).
+        """
+        entry = self._entry(key)
+        tmp = f"{entry}.tmp-{os.getpid()}-{threading.get_ident()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        with open(os.path.join(tmp, "transcript.txt"), "w", encoding="utf-8") as f:
+            f.write(text)
+        if store is not None:
+            store.save(os.path.join(tmp, "segments.npz"))
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(dict(meta, created_at=time.time()), f, ensure_ascii=False)
+        with self._lock:
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(tmp, entry)
+            self._evict(keep=entry)
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        entries = []
+        total = 0
+        for name in os.listdir(self.dir):
+            path = self._entry(name)
+            meta_path = os.path.join(path, "meta.json")
+            if ".tmp-" in name or not os.path.exists(meta_path):
+                continue
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            total += size
+            if path == keep:
+                # L’entrée qui vient d’être écrite n’est jamais évincée
+                continue
+            entries.append((os.path.getmtime(meta_path), size, path))
+        entries.sort()
+        while total > self.max_bytes and entries:
+            _, size, path = entries.pop(0)
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            logger.info(f"Cache transcripts : éviction de {os.path.basename(path)[:20]}…")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "max_mb": round(self.max_bytes / 1024 / 1024, 1)}
+
+
+_CACHE: Optional[TranscriptCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_transcript_cache() -> TranscriptCache:
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = TranscriptCache()
+    return _CACHE
@@ -3,14 +3,18 @@
 import os
 import tempfile
 import logging
+from typing import Iterator, Tuple
 from faster_whisper import WhisperModel
 from yt_dlp import YoutubeDL
 
+from parallel_transcription import TRANSCRIBE_WORKERS, WHISPER_MODEL_SIZE, transcribe_parallel
+from segment_store import SegmentStore
+
 logger = logging.getLogger(__name__)
 
 # 1) Initialiser UNE SEULE instance WhisperModel (small, int8)
 _whisper_model = WhisperModel(
-    model_size_or_path="tiny",
+    model_size_or_path=WHISPER_MODEL_SIZE,
     device="cpu",
     compute_type="int8"
 )
@@ -41,14 +45,39 @@ def download_audio_from_youtube(url: str, out_dir: str = "data/raw_audio") -> st
         logger.info(f"Audio téléchargé et converti → {wav_path}")
         return wav_path
 
-def transcribe_file(audio_path: str, beam_size: int = 5) -> str:
+def transcribe_stream(audio_path: str, beam_size: int = 5) -> Tuple[Iterator, float]:
     """
-    Transcrit un fichier audio local (WAV ou MP3) avec FastWhisper
-    et renvoie le texte complet concaténé.
+    Lance la transcription FastWhisper sans attendre la fin : renvoie le générateur
+    de segments (décodés au fur et à mesure qu’on l’itère) et la durée de l’audio en secondes.
+    """
+    logger.info(f"Début de la transcription (streaming) pour : {audio_path}")
+    if TRANSCRIBE_WORKERS > 1:
+        return transcribe_parallel(audio_path, beam_size=beam_size)
+    segments, info = _whisper_model.transcribe(audio_path, beam_size=beam_size)
+    return segments, float(info.duration)
+
+
+def transcribe_file_with_segments(audio_path: str, beam_size: int = 5) -> Tuple[str, SegmentStore]:
+    """
+    Transcrit un fichier audio local (WAV ou MP3) avec FastWhisper et renvoie
+    le texte complet concaténé ainsi que l’index temporel des segments.
     """
     logger.info(f"Début de la transcription pour : {audio_path}")
-    segments, _ = _whisper_model.transcribe(audio_path, beam_size=beam_size)
+    if TRANSCRIBE_WORKERS > 1:
+        segments, _ = transcribe_parallel(audio_path, beam_size=beam_size)
+    else:
+        segments, _ = _whisper_model.transcribe(audio_path, beam_size=beam_size)
+    segments = list(segments)
     transcript = "\n".join(seg.text for seg in segments)
     logger.info("Transcription terminée")
+    return transcript, SegmentStore.from_segments(segments)
+
+
+def transcribe_file(audio_path: str, beam_size: int = 5) -> str:
+    """
+    Transcrit un fichier audio local (WAV ou MP3) avec FastWhisper
+    et renvoie le texte complet concaténé.
+    """
+    transcript, _ = transcribe_file_with_segments(audio_path, beam_size=beam_size)
     return transcript
 
@@ -1,41 +1,216 @@
 
 import os
+import json
+import time
+import hashlib
 import logging
-from typing import List
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import shutil
+import threading
+from typing import Iterable, List, Optional
+import numpy as np
 from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+from embedding import get_embedder
+from numpy_index import drop_numpy_index, get_numpy_index
 
 logger = logging.getLogger(__name__)
 
+# —————— Config ——————
+VECTORSTORE_DIR = os.getenv("VECTORSTORE_DIR", os.path.join("data", "vectorstores", "chunks"))
+# "chroma" (persistance Chroma) ou "numpy" (matrice float32 en memmap, top-k exact ; voir numpy_index.py)
+RETRIEVER_BACKEND = os.getenv("RETRIEVER_BACKEND", "chroma").lower()
+# Collections non utilisées depuis plus de N jours supprimées par gc_collections()
+COLLECTION_TTL_DAYS = float(os.getenv("VECTORSTORE_COLLECTION_TTL_DAYS", "30"))
+# Intervalle minimal entre deux passages du GC déclenchés par maybe_gc()
+GC_INTERVAL_SECONDS = float(os.getenv("VECTORSTORE_GC_INTERVAL", "3600"))
+
+# Collection partagée historique (nom par défaut de langchain_chroma)
+DEFAULT_COLLECTION = "langchain"
+_USAGE_FILE = "collections_usage.json"
+# Base SQLite créée par Chroma dans persist_dir
+_CHROMA_DB_FILE = "chroma.sqlite3"
+# On ne réécrit la date d’utilisation qu’au-delà de ce délai (évite une écriture par question)
+_TOUCH_RESOLUTION = 3600.0
+
+_USAGE_LOCK = threading.Lock()
+_LAST_GC = {}
+
+
+def collection_name(content_key: str) -> str:
+    """
+    Nom de collection Chroma déterministe dérivé d’une clé de contenu
+    (hash du transcript ou de l’audio) : un transcript = une collection.
+    """
+    return "tr-" + hashlib.sha256(content_key.encode("utf-8")).hexdigest()[:40]
+
+
+def chunk_ids(text_chunks: List[str]) -> List[str]:
+    """Identifiants déterministes (SHA-256 du chunk) : ré-indexer les mêmes chunks est idempotent."""
+    return [hashlib.sha256(chunk.encode("utf-8")).hexdigest() for chunk in text_chunks]
+
+
+def _numpy_dir(persist_dir: str, collection: str) -> str:
+    return os.path.join(persist_dir, "numpy", collection)
+
+
+# ---------- suivi d’utilisation ----------
+def _usage_path(persist_dir: str) -> str:
+    return os.path.join(persist_dir, _USAGE_FILE)
+
+
+def _read_usage(persist_dir: str) -> dict:
+    try:
+        with open(_usage_path(persist_dir), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_usage(persist_dir: str, usage: dict) -> None:
+    path = _usage_path(persist_dir)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(usage, f)
+    os.replace(tmp_path, path)
+
+
+def touch_collection(name: str, persist_dir: str = VECTORSTORE_DIR) -> None:
+    """Enregistre l’utilisation de la collection `name` (date utilisée par le GC)."""
+    if not name or name == DEFAULT_COLLECTION:
+        return
+    now = time.time()
+    with _USAGE_LOCK:
+        usage = _read_usage(persist_dir)
+        if now - usage.get(name, 0.0) < _TOUCH_RESOLUTION:
+            return
+        usage[name] = now
+        _write_usage(persist_dir, usage)
+
+
+def gc_collections(
+    persist_dir: str = VECTORSTORE_DIR,
+    max_age_days: float = COLLECTION_TTL_DAYS,
+    keep: Iterable[str] = ()
+) -> List[str]:
+    """
+    Supprime les collections par transcript non utilisées depuis `max_age_days` jours
+    (sauf celles de `keep`, p. ex. les collections des sessions), qu’elles soient stockées
+    dans Chroma ou en index NumPy. Retourne les noms supprimés.
+    """
+    cutoff = time.time() - max_age_days * 86400
+    keep = set(keep)
+    with _USAGE_LOCK:
+        usage = _read_usage(persist_dir)
+        stale = [name for name, last_used in usage.items() if last_used < cutoff and name not in keep]
+        removed = []
+        for name in stale:
+            try:
+                numpy_dir = _numpy_dir(persist_dir, name)
+                if os.path.isdir(numpy_dir):
+                    drop_numpy_index(numpy_dir)
+                    shutil.rmtree(numpy_dir, ignore_errors=True)
+                # Le backend a pu changer depuis l’indexation : on supprime selon le stockage présent
+                if os.path.exists(os.path.join(persist_dir, _CHROMA_DB_FILE)):
+                    Chroma(collection_name=name, persist_directory=persist_dir).delete_collection()
+                removed.append(name)
+            except Exception as e:
+                logger.error(f"Suppression de la collection {name} impossible : {e}")
+                continue
+            usage.pop(name, None)
+        if removed:
+            _write_usage(persist_dir, usage)
+    if removed:
+        logger.info(f"GC VectorStore : {len(removed)} collection(s) supprimée(s) dans {persist_dir}")
+    return removed
+
+
+def maybe_gc(persist_dir: str = VECTORSTORE_DIR, keep: Iterable[str] = ()) -> List[str]:
+    """gc_collections(), au plus une fois par GC_INTERVAL_SECONDS et par dossier."""
+    now = time.time()
+    with _USAGE_LOCK:
+        if now - _LAST_GC.get(persist_dir, 0.0) < GC_INTERVAL_SECONDS:
+            return []
+        _LAST_GC[persist_dir] = now
+    return gc_collections(persist_dir, keep=keep)
+
+
+def get_stats(persist_dir: str = VECTORSTORE_DIR) -> dict:
+    with _USAGE_LOCK:
+        usage = _read_usage(persist_dir)
+    return {"backend": RETRIEVER_BACKEND, "collections": len(usage), "ttl_days": COLLECTION_TTL_DAYS}
+
+
+# ---------- création / ouverture ----------
 def get_vectorstore(
     text_chunks: List[str],
-    persist_dir: str = "data/vectorstores/chunks"
-) -> Chroma:
+    persist_dir: str = VECTORSTORE_DIR,
+    collection: str = DEFAULT_COLLECTION
+):
     """
-    Crée (ou recharge) un Chroma DB VectorStore à partir d'une liste de chunks de texte.
+    Crée (ou recharge) la collection `collection` (Chroma ou index NumPy, selon RETRIEVER_BACKEND)
+    et y indexe une liste de chunks de texte.
 
     - text_chunks : liste de segments (strings) à indexer.
     - persist_dir  : dossier où stocker (ou charger) l'index Chroma.
+    - collection   : nom de la collection (voir collection_name()).
     """
-    logger.info("Création du VectorStore Chroma pour les chunks…")
+    logger.info(f"Indexation des chunks dans la collection {collection} ({RETRIEVER_BACKEND})…")
 
-    # 1) Instancier l’embedder HuggingFace (all-MiniLM)
-    hf_emb = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2",
-        model_kwargs={"device": "cpu"}
-    )
+    vectordb = open_vectorstore(persist_dir, collection)
+    add_chunks(vectordb, text_chunks)
+
+    logger.info(f"VectorStore Chroma persistant dans : {persist_dir}")
+
+    return vectordb
 
-    # 2) On s’assure que le dossier de persistance existe
-    os.makedirs(persist_dir, exist_ok=True)
 
-    # 3) Créer la base (ou la recharger si elle existe déjà)
-    vectordb = Chroma.from_texts(
-        texts=text_chunks,
-        embedding=hf_emb,
+def open_vectorstore(persist_dir: str = VECTORSTORE_DIR, collection: str = DEFAULT_COLLECTION,
+                     backend: Optional[str] = None):
+    """
+    Ouvre (ou crée vide) la collection `collection` de `persist_dir`, pour y ajouter
+    des chunks au fil de l’eau avec add_chunks(). Selon `backend` (défaut RETRIEVER_BACKEND),
+    retourne un VectorStore Chroma ou un NumpyVectorIndex ; les deux exposent
+    add_texts() et as_retriever().
+    """
+    os.makedirs(persist_dir, exist_ok=True)
+    touch_collection(collection, persist_dir)
+    # Embedder partagé (all-MiniLM, chargé une seule fois)
+    if (backend or RETRIEVER_BACKEND) == "numpy":
+        return get_numpy_index(_numpy_dir(persist_dir, collection), get_embedder())
+    return Chroma(
+        collection_name=collection,
+        embedding_function=get_embedder(),
         persist_directory=persist_dir
     )
 
-    
-    logger.info(f"VectorStore Chroma persistant dans : {persist_dir}")
 
-    return vectordb
+def search_by_vectors(vectordb, vectors, k: int = 4) -> List[List[Document]]:
+    """
+    Recherche groupée de plusieurs vecteurs requêtes : un seul produit matriciel pour l’index NumPy,
+    une seule requête Chroma (query_embeddings multiples) sinon. Une liste de documents par vecteur.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if len(vectors) == 0:
+        return []
+    if hasattr(vectordb, "similarity_search_by_vectors"):
+        return vectordb.similarity_search_by_vectors(vectors, k=k)
+    result = vectordb._collection.query(
+        query_embeddings=vectors.tolist(), n_results=k, include=["documents", "metadatas"]
+    )
+    return [
+        [Document(page_content=text, metadata=meta or {}) for text, meta in zip(texts, metas)]
+        for texts, metas in zip(result["documents"], result["metadatas"])
+    ]
+
+
+def add_chunks(vectordb, text_chunks: List[str]) -> None:
+    """
+    Ajoute un lot de chunks (embeddings calculés en un seul passage batché).
+    Les ids sont déterministes : un chunk déjà présent est écrasé, pas dupliqué.
+    """
+    # Un même chunk ne peut apparaître qu’une fois par upsert
+    unique = list(dict.fromkeys(text_chunks))
+    if unique:
+        vectordb.add_texts(texts=unique, ids=chunk_ids(unique))
+        logger.info(f"{len(unique)} chunks ajoutés au VectorStore")